@@ -9,6 +9,8 @@ class Fifo:
     When used from ISR, the ISR should call put() to add data to fifo and
     the main program must read data from fifo by calling get() often enough
     to prevent fifo from getting full.
+    Blocks of data can be moved with put_many() and get_into(). When size is
+    a power of two indices wrap with a bit mask instead of a modulo.
     """
     def __init__(self, size, typecode = 'H'):
         """Parameters
@@ -22,11 +24,16 @@ class Fifo:
         self.head = 0
         self.tail = 0
         self.size = size
+        self.mask = size - 1 if size & (size - 1) == 0 else 0
         self.dc = 0
+        self.hw = 0
         
     def put(self, value):
         """Put one item into the fifo. Raises an exception if the fifo is full."""
-        nh = (self.head + 1) % self.size
+        if self.mask:
+            nh = (self.head + 1) & self.mask
+        else:
+            nh = (self.head + 1) % self.size
         if nh != self.tail:
             self.data[self.head] = value
             self.head = nh
@@ -39,14 +46,85 @@ class Fifo:
         val = self.data[self.tail]
         if self.empty():
             raise RuntimeError("Fifo is empty")
+        elif self.mask:
+            self.tail = (self.tail + 1) & self.mask
         else:
             self.tail = (self.tail + 1) % self.size
         return val
+
+    def put_many(self, values, count=None):
+        """Put count items (default all) from values into the fifo. Items that don't fit are dropped.
+        Returns the number of items stored. Doesn't raise an exception when the fifo is full."""
+        if count is None:
+            count = len(values)
+        data = self.data
+        size = self.size
+        head = self.head
+        free = self.tail - head - 1
+        if free < 0:
+            free += size
+        n = count if count < free else free
+        mask = self.mask
+        if mask:
+            for i in range(n):
+                data[head] = values[i]
+                head = (head + 1) & mask
+        else:
+            for i in range(n):
+                data[head] = values[i]
+                head += 1
+                if head == size:
+                    head = 0
+        self.head = head
+        self.dc += count - n
+        return n
+
+    def get_into(self, buf, count=None):
+        """Move up to count items (default len(buf)) from the fifo into the start of buf.
+        Returns the number of items moved. Doesn't raise an exception when the fifo is empty."""
+        if count is None:
+            count = len(buf)
+        data = self.data
+        tail = self.tail
+        available = self.head - tail
+        if available < 0:
+            available += self.size
+        if available > self.hw:
+            self.hw = available
+        n = count if count < available else available
+        mask = self.mask
+        if mask:
+            for i in range(n):
+                buf[i] = data[tail]
+                tail = (tail + 1) & mask
+        else:
+            size = self.size
+            for i in range(n):
+                buf[i] = data[tail]
+                tail += 1
+                if tail == size:
+                    tail = 0
+        self.tail = tail
+        return n
+
+    def count(self):
+        """Returns the number of items in the fifo"""
+        n = self.head - self.tail
+        return n + self.size if n < 0 else n
     
     def dropped(self):
         """Return number of dropped items. A return value that is greater than zero means that fifo is emptied too slowly.""" 
         return self.dc
 
+    def high_water(self):
+        """Return the highest number of items seen in the fifo by get_into(). Shows how close the fifo has been to overflowing."""
+        return self.hw
+
+    def reset_counters(self):
+        """Resets the dropped item count and the high water mark, e.g. when a new measurement starts."""
+        self.dc = 0
+        self.hw = 0
+
     def has_data(self):
         """Returns True if there is data in the fifo"""
         return self.head != self.tail
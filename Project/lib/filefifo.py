@@ -1,3 +1,11 @@
+import array
+import struct
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
 
 class Filefifo:
     """Mock version of Interrupt safe fifo implementation
@@ -55,3 +63,127 @@ class Filefifo:
     def empty(self):
         """Returns True if the fifo is empty. Mock always returns False."""
         return False
+
+
+# Binary capture format: header followed by little-endian uint16 samples
+CAPTURE_MAGIC = b'PPGB'
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = '<4sHHI'  # magic, version, sample rate, sample count
+CAPTURE_HEADER_SIZE = struct.calcsize(CAPTURE_HEADER)
+
+
+def write_capture(name, samples, rate):
+    """Writes samples (array('H') or a list of ints) to a binary capture file with the given sample rate."""
+    if not isinstance(samples, array.array) or samples.typecode != 'H':
+        samples = array.array('H', samples)
+    with open(name, 'wb') as f:
+        f.write(struct.pack(CAPTURE_HEADER, CAPTURE_MAGIC, CAPTURE_VERSION, rate, len(samples)))
+        f.write(samples)
+
+
+class BinFilefifo:
+    """Mock fifo that reads a binary capture file.
+
+    Implements the same interface as Filefifo and adds block reads and
+    random access. The file starts with a header that holds the sample
+    rate and the number of samples. On CPython the file is memory mapped,
+    on MicroPython it is read with readinto().
+    """
+    def __init__(self, size, typecode = 'H', name = 'data.bin', repeat = True):
+        """Parameters
+        size (integer): Not used - fifo size in the real implementation
+        typecode(string): Not used - type of stored values in real implementation
+        name (string): Name of the binary capture file to read data from.
+        repeat (boolean): End of file behaviour. True means start over from beginning.
+        """
+        self._file = open(name, 'rb')
+        self._repeat = repeat
+        magic, version, rate, length = struct.unpack(CAPTURE_HEADER, self._file.read(CAPTURE_HEADER_SIZE))
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            raise RuntimeError("Not a binary capture file")
+        self.rate = rate
+        self.length = length
+        self._pos = 0
+        self._one = array.array('H', [0])
+        self._view = None
+        if mmap is not None and length > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            end = CAPTURE_HEADER_SIZE + 2 * length
+            self._view = memoryview(self._map)[CAPTURE_HEADER_SIZE:end].cast('H')
+
+    def put(self, value):
+        """Put one item into the fifo. In the mock this function does nothing since data comes from a file."""
+        pass
+
+    def get(self):
+        """Get one item from the fifo. If repeat is set to False and file ends raises an exception."""
+        if self._pos >= self.length:
+            if not self._repeat or self.length == 0:
+                raise RuntimeError("Out of data")
+            self.seek(0)
+        if self._view is not None:
+            value = self._view[self._pos]
+        else:
+            self._file.readinto(self._one)
+            value = self._one[0]
+        self._pos += 1
+        return value
+
+    def readinto(self, buf, count=None):
+        """Read up to count samples (default len(buf)) into the start of buf. Returns the number of samples read.
+        Wraps to the beginning of the file if repeat is set."""
+        if count is None:
+            count = len(buf)
+        target = memoryview(buf)
+        n = 0
+        while n < count:
+            if self._pos >= self.length:
+                if not self._repeat or self.length == 0:
+                    break
+                self.seek(0)
+            chunk = min(count - n, self.length - self._pos)
+            if self._view is not None:
+                target[n:n + chunk] = self._view[self._pos:self._pos + chunk]
+            else:
+                self._file.readinto(target[n:n + chunk])
+            self._pos += chunk
+            n += chunk
+        return n
+
+    def read_block(self, n):
+        """Read up to n samples and return them as a new array('H')."""
+        block = array.array('H', [0] * n)
+        count = self.readinto(block)
+        return block if count == n else block[:count]
+
+    def seek(self, sample_index):
+        """Move to the given sample index."""
+        if not 0 <= sample_index <= self.length:
+            raise ValueError("Sample index out of range")
+        self._pos = sample_index
+        if self._view is None:
+            self._file.seek(CAPTURE_HEADER_SIZE + 2 * sample_index)
+
+    def tell(self):
+        """Returns the index of the next sample."""
+        return self._pos
+
+    def close(self):
+        """Closes the capture file."""
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+            self._map.close()
+        self._file.close()
+
+    def dropped(self):
+        """Return number of dropped items. Mock always returns zero."""
+        return 0
+
+    def has_data(self):
+        """Returns True if there is data in the fifo."""
+        return self.length > 0 and (self._repeat or self._pos < self.length)
+
+    def empty(self):
+        """Returns True if the fifo is empty."""
+        return not self.has_data()
@@ -0,0 +1,243 @@
+import array
+
+
+class RunningSum:
+    """Sum and mean of the last size values.
+    Values are kept in a ring allocated when the object is instantiated, each
+    update replaces the oldest value and adjusts the sum, so the cost per value
+    does not depend on the window size. Methods don't allocate memory as long
+    as the sum stays within the small int range.
+    """
+    def __init__(self, size, typecode='H'):
+        """Parameters
+
+        size (int): Number of values in the window
+        typecode (char): Type of the stored values as defined in array (Default is 'H' - unsigned short)
+        """
+        self.size = size
+        self.data = array.array(typecode, [0] * size)
+        self.reset()
+
+    def reset(self):
+        """Empties the window."""
+        data = self.data
+        for i in range(self.size):
+            data[i] = 0
+        self.index = 0
+        self.count = 0
+        self.total = 0
+
+    def update(self, x):
+        """Adds one value, dropping the oldest one when the window is full. Returns the sum."""
+        index = self.index
+        self.total += x - self.data[index]
+        self.data[index] = x
+        index += 1
+        if index == self.size:
+            index = 0
+        self.index = index
+        if self.count < self.size:
+            self.count += 1
+        return self.total
+
+    def update_block(self, block, count=None, sums=None):
+        """Adds count values (default all) from block. Returns the sum.
+        When sums is given the sum after each value is written to it, e.g. to
+        compare every value with the window it completes."""
+        if count is None:
+            count = len(block)
+        data = self.data
+        size = self.size
+        index = self.index
+        total = self.total
+        if sums is None:
+            for i in range(count):
+                x = block[i]
+                total += x - data[index]
+                data[index] = x
+                index += 1
+                if index == size:
+                    index = 0
+        else:
+            for i in range(count):
+                x = block[i]
+                total += x - data[index]
+                data[index] = x
+                index += 1
+                if index == size:
+                    index = 0
+                sums[i] = total
+        self.index = index
+        self.total = total
+        self.count = self.count + count if self.count + count < size else size
+        return total
+
+    def mean(self):
+        """Returns the integer mean of the values in the window, 0 when it is empty."""
+        return self.total // self.count if self.count else 0
+
+    def full(self):
+        """Returns True once size values have been added."""
+        return self.count == self.size
+
+
+class RunningMinMax:
+    """Minimum and maximum of the last size values.
+    Two monotonic queues hold the ring positions of the values that can still
+    become the minimum or the maximum. Each value enters and leaves a queue at
+    most once, so an update costs a constant amount of work on average and
+    min() and max() are a single lookup. All storage is allocated when the
+    object is instantiated.
+    """
+    def __init__(self, size, typecode='H'):
+        """Parameters
+
+        size (int): Number of values in the window
+        typecode (char): Type of the stored values as defined in array (Default is 'H' - unsigned short)
+        """
+        self.size = size
+        self.data = array.array(typecode, [0] * size)
+        # Queues of ring positions, each a ring of size entries with a head and a length
+        self.low = array.array('H', [0] * size)
+        self.high = array.array('H', [0] * size)
+        self.reset()
+
+    def reset(self):
+        """Empties the window."""
+        self.index = 0
+        self.count = 0
+        self.low_head = 0
+        self.low_len = 0
+        self.high_head = 0
+        self.high_len = 0
+
+    def update(self, x):
+        """Adds one value, dropping the oldest one when the window is full."""
+        data = self.data
+        size = self.size
+        index = self.index
+        low = self.low
+        high = self.high
+        low_head = self.low_head
+        low_len = self.low_len
+        high_head = self.high_head
+        high_len = self.high_len
+        # The value being overwritten is the oldest, it can only be at the front of a queue
+        if self.count == size:
+            if low_len and low[low_head] == index:
+                low_head = low_head + 1 if low_head + 1 < size else 0
+                low_len -= 1
+            if high_len and high[high_head] == index:
+                high_head = high_head + 1 if high_head + 1 < size else 0
+                high_len -= 1
+        else:
+            self.count += 1
+        data[index] = x
+        while low_len:
+            back = low_head + low_len - 1
+            if back >= size:
+                back -= size
+            if data[low[back]] < x:
+                break
+            low_len -= 1
+        back = low_head + low_len
+        low[back - size if back >= size else back] = index
+        low_len += 1
+        while high_len:
+            back = high_head + high_len - 1
+            if back >= size:
+                back -= size
+            if data[high[back]] > x:
+                break
+            high_len -= 1
+        back = high_head + high_len
+        high[back - size if back >= size else back] = index
+        high_len += 1
+
+        index += 1
+        self.index = index if index < size else 0
+        self.low_head = low_head
+        self.low_len = low_len
+        self.high_head = high_head
+        self.high_len = high_len
+
+    def drop_oldest(self):
+        """Removes the oldest value from the window, e.g. to keep a window of varying length."""
+        count = self.count
+        if count == 0:
+            return
+        size = self.size
+        oldest = self.index - count
+        if oldest < 0:
+            oldest += size
+        if self.low_len and self.low[self.low_head] == oldest:
+            self.low_head = self.low_head + 1 if self.low_head + 1 < size else 0
+            self.low_len -= 1
+        if self.high_len and self.high[self.high_head] == oldest:
+            self.high_head = self.high_head + 1 if self.high_head + 1 < size else 0
+            self.high_len -= 1
+        self.count = count - 1
+
+    def update_block(self, block, count=None):
+        """Adds count values (default all) from block."""
+        if count is None:
+            count = len(block)
+        update = self.update
+        for i in range(count):
+            update(block[i])
+
+    def min(self):
+        """Returns the smallest value in the window. Raises an exception if the window is empty."""
+        if not self.count:
+            raise RuntimeError("Window is empty")
+        return self.data[self.low[self.low_head]]
+
+    def max(self):
+        """Returns the largest value in the window. Raises an exception if the window is empty."""
+        if not self.count:
+            raise RuntimeError("Window is empty")
+        return self.data[self.high[self.high_head]]
+
+
+class ExpAverage:
+    """Exponential moving average with a weight of 1 / 2**shift for each new value.
+    The average is kept as an integer scaled by 2**shift, so updates use only
+    integer additions and shifts and don't allocate memory on MicroPython,
+    unlike a float average.
+    """
+    def __init__(self, shift=3, initial=0):
+        """Parameters
+
+        shift (int): Weight of a new value is 1 / 2**shift, a larger shift averages over more values
+        initial (int): Starting value of the average
+        """
+        self.shift = shift
+        self.reset(initial)
+
+    def reset(self, initial=0):
+        """Restarts the average from initial."""
+        self.acc = initial << self.shift
+
+    def update(self, x):
+        """Adds one value. Returns the average."""
+        shift = self.shift
+        self.acc += x - (self.acc >> shift)
+        return self.acc >> shift
+
+    def update_block(self, block, count=None, out=None):
+        """Adds count values (default all) from block. Returns the average.
+        When out is given the average after each value is written to it."""
+        if count is None:
+            count = len(block)
+        shift = self.shift
+        acc = self.acc
+        for i in range(count):
+            acc += block[i] - (acc >> shift)
+            if out is not None:
+                out[i] = acc >> shift
+        self.acc = acc
+        return acc >> shift
+
+    def value(self):
+        """Returns the average."""
+        return self.acc >> self.shift
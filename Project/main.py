@@ -1,11 +1,31 @@
 from machine import Pin, ADC, PWM
+import machine
+import ubinascii
 from piotimer import Piotimer as Timer
-from fifo import Fifo
 import time
 import array  # Import the array module
+import uasyncio as asyncio
+from modules.async_fifo import AsyncFifo
 from modules.kubios_mqtt import KubiosMQTT
 from modules.display_manager import DisplayManager
-from modules.hrv_analyzer import HRVAnalyzer
+from modules.hrv_analyzer import HRVStream
+from modules.hrv_spectrum import HRVSpectrum
+from modules.peak_detector import PeakDetector
+from modules.bandpass import BandPassFilter
+from modules.ppi_collector import PPICollector
+from modules.readiness import ReadinessEstimator
+from modules.frame_governor import FrameGovernor
+from modules.outbox import Outbox
+from modules.telemetry import Telemetry
+from modules.history import HistoryStore
+
+# The application runs as asyncio tasks:
+#   acquisition_task  takes the samples from the sampling timer and detects the beats
+#   beat_task         turns the detected beats into the HR and HRV readouts
+#   render_task       sends the live waveform to the display at the governed frame rate
+#   ui_task           handles the rotary encoder and runs the screens
+#   network_task      keeps the connection up and sends the Kubios analyses
+# Interrupt handlers and tasks hand data over in AsyncFifos, so no task polls.
 
 # Initialize hardware
 adc = ADC(26)
@@ -20,280 +40,528 @@ rot_push = Pin(12, Pin.IN, Pin.PULL_UP)
 
 # Initialize other components
 samplerate = 250
-samples = Fifo(50)
+max_stall_ms = 1000  # longest time the sample consumer may stall without losing samples
+
+def fifo_size(items):
+    """Returns the smallest power of two that can hold the given number of items in a Fifo."""
+    size = 2
+    while size - 1 < items:
+        size *= 2
+    return size
+
+samples = AsyncFifo(fifo_size(samplerate * max_stall_ms // 1000))
+
+# UI events are kept apart from the samples so that sampling never delays or drops input
+EVENT_NEXT = 0
+EVENT_PREV = 1
+EVENT_PRESS = 2
+events = AsyncFifo(16, 'B')
+
+# Beat intervals from the acquisition task to the beat task, 0 ends a PPI collection
+END_OF_COLLECTION = 0
+beats = AsyncFifo(32)
+collection_done = asyncio.Event()
+
+# What the acquisition task does with the samples
+MODE_IDLE = 0
+MODE_LIVE = 1
+MODE_COLLECT = 2
+mode = MODE_IDLE
+
 current_selection = 0
 menu_items = ["MEASURE HR", "HRV ANALYSIS", "KUBIOS", "HISTORY"]
-history = []
-max_history = 250
+max_history = 100  # analyses kept on flash
+history = HistoryStore("history.bin", capacity=max_history)
+ppi_duration = 10  # seconds of signal per HRV/Kubios measurement, None to only use ppi_beats
+ppi_beats = None  # number of beats per measurement, None to only use ppi_duration
+min_ppi_count = 3
+spectrum_min_seconds = 30  # HRV ANALYSIS adds an LF/HF page for measurements at least this long
 last_button_press = 0  # debouncing
 
+# Live HR measurement state, written by the acquisition and beat tasks
+live_ppi = []
+live_samples = 0
+
 # Initialize managers
 display = DisplayManager()
-hrv_analyzer = HRVAnalyzer()
+# Band-pass 0.5-5 Hz in front of the detector removes baseline wander and noise
+notch_hz = None  # e.g. 50 to also remove mains hum
+bandpass = BandPassFilter(samplerate, low_hz=0.5, high_hz=5, notch_hz=notch_hz)
+detector = PeakDetector(samplerate, prefilter=bandpass)
+ppi_collector = PPICollector(detector)
+hrv_stream = HRVStream()
+hrv_spectrum = HRVSpectrum()
+readiness = ReadinessEstimator()
+display_fps = 25  # live waveform refresh rate, lower it for lower-power sessions
+governor = FrameGovernor(display_fps, max_backlog=samplerate // 10)
+kubios_refine = True  # send the measurement to Kubios Cloud after showing the local estimate
+outbox = Outbox("outbox.jsonl")  # analyses and results waiting for a connection
+flush_retry_ms = 30000  # wait after a failed outbox flush
+# Beats are streamed to group4/<device id>/ppi, Kubios results are published to group4/<device id>/result
+device_id = ubinascii.hexlify(machine.unique_id()).decode()
 kubios_mqtt = KubiosMQTT(
-    "KME751_Group_4", 
+    "KME751_Group_4",
     "takapenkinpojat",
     "192.168.4.57",
     "pbZRUi49X48I56oL1Lq8y8NDjq6rPfzX3AQeNo3a",
     "3pjgjdmamlj759te85icf0lucv",
     "111fqsli1eo7mejcrlffbklvftcnfl4keoadrdv1o45vt9pndlef",
-    "https://kubioscloud.auth.eu-west-1.amazoncognito.com/oauth2/token"
+    "https://kubioscloud.auth.eu-west-1.amazoncognito.com/oauth2/token",
+    token_file="kubios_token.json",
+    outbox=outbox,
+    device_id=device_id
 )
+# The WLAN and MQTT sessions are kept alive between analyses by the network task
+connection = kubios_mqtt.connection
+telemetry_batch = 8  # beats per message, more beats per message keeps the radio off longer
+telemetry_qos = 0
+telemetry = Telemetry(connection, device_id, batch=telemetry_batch, qos=telemetry_qos)
+uploads = []  # Kubios analyses waiting for the network task
 
 def read_adc(tid):
     """
     Callback function to read ADC value and put it into the samples FIFO.
-    Triggered by the timer at the specified sample rate.
+    Triggered by the timer at the specified sample rate. Samples that don't fit are counted by the FIFO.
     """
-    samples.put(adc.read_u16())
+    try:
+        samples.put(adc.read_u16())
+    except:
+        pass
 
-tmr = Timer(freq=samplerate, callback=read_adc)
+tmr = None
+
+def start_sampling():
+    """
+    Starts the sampling timer. Samples are only taken during measurements.
+    """
+    global tmr
+    if tmr is None:
+        tmr = Timer(freq=samplerate, callback=read_adc)
+
+def stop_sampling():
+    """
+    Stops the sampling timer.
+    """
+    global tmr
+    if tmr is not None:
+        tmr.deinit()
+        tmr = None
+
+def set_mode(new_mode):
+    """
+    Selects what the acquisition task does with the samples. Sampling runs only outside MODE_IDLE.
+    """
+    global mode
+    if new_mode == MODE_IDLE:
+        stop_sampling()
+        led21.duty_u16(0)
+    else:
+        # Samples and beats queued before the measurement started are stale
+        samples.clear()
+        beats.clear()
+        # The counters shown by report_samples() cover one measurement
+        samples.reset_counters()
+        start_sampling()
+    mode = new_mode
 
 def encoder_turn_callback(pin):
     """
     Callback function for rotary encoder turn events.
-    Puts a value into the samples FIFO based on the direction of the turn.
+    Puts an event into the events FIFO based on the direction of the turn.
     """
     try:
-        val = 0 if rota.value() == rotb.value() else 1
-        samples.put(val)
+        val = EVENT_NEXT if rota.value() == rotb.value() else EVENT_PREV
+        events.put(val)
     except:
         pass
 
 def button_callback(pin):
     """
     Callback function for button press events.
-    Implements debouncing and puts a value into the samples FIFO when the button is pressed.
+    Implements debouncing and puts an event into the events FIFO when the button is pressed.
     """
     global last_button_press
     current_time = time.ticks_ms()
     if time.ticks_diff(current_time, last_button_press) > 200:  # 200 ms debounce
         last_button_press = current_time
         try:
-            samples.put(2)
+            events.put(EVENT_PRESS)
         except:
             pass
 
 rota.irq(trigger=Pin.IRQ_RISING, handler=encoder_turn_callback)
 rot_push.irq(trigger=Pin.IRQ_FALLING, handler=button_callback)
 
-# Initial menu display
-display.display_menu(menu_items, current_selection)
-
-def collect_ppi_data(duration=10):
-    """
-    Collects PPI (Pulse-to-Pulse Interval) data for a specified duration.
-    Returns a list of ADC readings taken at 0.1-second intervals.
-    """
-    ppi_data = []
-    start_time = time.ticks_ms()
-    while time.ticks_diff(time.ticks_ms(), start_time) < duration * 1000:
-        ppi_data.append(adc.read_u16())
-        time.sleep(0.1)
-    return ppi_data
-
-def measure_hr():
-    def PPI_calc(data):
-        sumPPI = sum(data)
-        rounded_PPI = round(sumPPI / len(data), 0)
-        return int(rounded_PPI)
-
-    def HR(PPI):
-        rounded_HR = round(60 * 1000 / PPI, 0)
-        return int(rounded_HR)
-
-    x1 = -1
-    y1 = 32
-    m0 = 65535 / 2
-    a = 1 / 10
-
-    disp_div = samplerate / 25
-    disp_count = 0
-
-    index = 0
-    capture_count = 0
-    subtract_old_sample = 0
-    sample_sum = 0
-
-    min_bpm = 30
-    max_bpm = 200
-    sample_peak = 0
-    sample_index = 0
-    previous_peak = 0
-    previous_index = 0
-    interval_ms = 0
-    PPI_array = []
-    
+def report_samples():
+    """
+    Prints the sample FIFO overflow and high-watermark counters of the measurement that just ended.
+    """
+    print("Samples dropped:", samples.dropped(), "high water:", samples.high_water(), "/", samples.size - 1)
+
+def put_beat(interval):
+    """
+    Hands a beat interval to the beat task. Beats that don't fit are counted by the FIFO.
+    """
+    try:
+        beats.put(interval)
+    except:
+        pass
+
+def PPI_calc(data):
+    sumPPI = sum(data)
+    rounded_PPI = round(sumPPI / len(data), 0)
+    return int(rounded_PPI)
+
+def HR(PPI):
+    rounded_HR = round(60 * 1000 / PPI, 0)
+    return int(rounded_HR)
+
+async def acquisition_task():
+    """
+    Takes the samples in blocks as the sampling timer produces them. In MODE_LIVE
+    the waveform is drawn and the beats are detected, in MODE_COLLECT the samples
+    are fed to the PPI collector. The beats are handed to the beat task.
+    """
+    global live_samples
+    block = array.array('H', [0] * 32)
+    found = array.array('H', [0] * 8)
     brightness = 0
 
-    avg_size = 128  # originally: int(samplerate * 0.5)
-    buffer = array.array('H', [0] * avg_size)
+    while True:
+        await samples.wait()
+        n = samples.get_into(block)
+
+        if mode == MODE_COLLECT:
+            if ppi_collector.done:
+                # END_OF_COLLECTION has been sent, blocks that were still queued are dropped
+                continue
+            added = ppi_collector.feed(block, n)
+            intervals = ppi_collector.intervals
+            for i in range(ppi_collector.count - added, ppi_collector.count):
+                put_beat(intervals[i])
+            if ppi_collector.done:
+                # The beat task still needs MODE_COLLECT for the queued beats, collect_ppi_data ends the mode
+                stop_sampling()
+                put_beat(END_OF_COLLECTION)
+
+        elif mode == MODE_LIVE:
+            # The display reduces every samplerate // 25 samples to one envelope column
+            display.feed_waveform(block, n)
+
+            found_count = detector.feed_block(block, found, n)
+            for i in range(found_count):
+                put_beat(found[i])
+            if found_count:
+                brightness = 5
+                led21.duty_u16(4000)
+            elif brightness > 0:
+                brightness -= n
+                if brightness <= 0:
+                    led21.duty_u16(0)
+
+            seconds = live_samples // samplerate
+            live_samples += n
+            if live_samples // samplerate != seconds:
+                display.set_footer(f'Timer: {live_samples // samplerate}s')
+
+async def beat_task():
+    """
+    Updates the live BPM during MEASURE HR and the HRV values during a PPI collection.
+    """
+    while True:
+        await beats.wait()
+        interval = beats.get()
+
+        if mode == MODE_LIVE:
+            live_ppi.append(interval)
+            bpm = 0
+            if len(live_ppi) > 3:
+                bpm = HR(PPI_calc(live_ppi))
+                display.set_header(f'BPM: {bpm}')
+            telemetry.add(interval, bpm)
+
+        elif mode != MODE_COLLECT:
+            pass  # beats left over from a measurement that has ended
+
+        elif interval == END_OF_COLLECTION:
+            telemetry.end()
+            collection_done.set()
+
+        else:
+            hrv_stream.add(interval)
+            count = hrv_stream.count
+            telemetry.add(interval, hrv_stream.mean_hr())
+            if count < min_ppi_count:
+                display.show_message(["Collecting data...", f"Beats: {count}"])
+            else:
+                display.show_message([
+                    "Collecting data...",
+                    f"Beats: {count}",
+                    f"HR: {hrv_stream.mean_hr()} bpm",
+                    f"RMSSD: {hrv_stream.rmssd()} ms"
+                ])
+
+async def render_task():
+    """
+    Sends the live waveform. Frames are sent only when the governor allows it,
+    columns drawn in between are merged into the next frame.
+    """
+    while True:
+        await asyncio.sleep_ms(max(governor.delay_ms(), 1))
+        if mode == MODE_LIVE and governor.due(samples.count()):
+            display.show()
+            governor.frame_done()
+
+async def network_task():
+    """
+    Keeps the connection up, sends the Kubios analyses requested by the UI and
+    flushes the outbox once the connection is back. Connecting to the broker
+    and flushing the outbox can block, so they wait until no measurement is running.
+    """
+    next_flush = time.ticks_ms()
+    connection.start()
+    while True:
+        idle = mode == MODE_IDLE
+        online = connection.poll(open_session=idle)
+        if uploads:
+            job = uploads.pop(0)
+            job["result"] = await kubios_mqtt.analyze_data(job["data"])
+            job["queued"] = kubios_mqtt.queued
+            job["rejected"] = kubios_mqtt.rejected
+            job["done"].set()
+        elif idle and online and len(outbox) and time.ticks_diff(time.ticks_ms(), next_flush) >= 0:
+            # Queued work is sent in batches as soon as the connection is back
+            display.set_status(f"send {len(outbox)}")
+            if await kubios_mqtt.flush() == 0:
+                next_flush = time.ticks_add(time.ticks_ms(), flush_retry_ms)
+        display.set_status(connection.status())
+        await asyncio.sleep_ms(100)
+
+def request_analysis(ppi_data):
+    """
+    Hands a Kubios analysis to the network task. The done event of the returned job is set when it has finished.
+    """
+    job = {"data": ppi_data, "result": (None, None), "queued": False, "rejected": False, "done": asyncio.Event()}
+    uploads.append(job)
+    return job
 
-    tmr = Timer(freq=samplerate, callback=read_adc)
+async def next_event(timeout_ms=None):
+    """
+    Waits for the next UI event. Returns None if timeout_ms passes first.
+    """
+    try:
+        await asyncio.wait_for_ms(events.wait(), timeout_ms)
+    except asyncio.TimeoutError:
+        return None
+    return events.get()
 
-    graph_points = []
+async def wait_for_press():
+    """
+    Waits until the button is pressed. Turn events are discarded.
+    """
+    while await next_event() != EVENT_PRESS:
+        pass
 
+async def collect_ppi_data():
+    """
+    Collects PPI (Pulse-to-Pulse Interval) data for the configured duration or beat count.
+    The beat task updates hrv_stream and shows live HRV values while collecting.
+    Returns the intervals in ms as an array, or None if the button was pressed to stop the collection.
+    """
+    hrv_stream.reset()
+    collection_done.clear()
+    ppi_collector.start(duration=ppi_duration, beats=ppi_beats)
+    set_mode(MODE_COLLECT)
+    # A press stops the collection, e.g. when no pulse is found and the beat count is never reached
+    event = None
+    while event != EVENT_PRESS and not collection_done.is_set():
+        event = await next_event(100)
+    stopped = not collection_done.is_set()
+    if stopped:
+        ppi_collector.stop()
+        telemetry.end()
+    set_mode(MODE_IDLE)
+    report_samples()
+    # Discard e.g. turn events made during the collection
+    events.clear()
+    return None if stopped else ppi_collector.data()
+
+async def measure_hr():
+    """
+    Shows the live waveform and BPM until the button is pressed.
+    """
+    global live_samples
+    live_ppi.clear()
+    live_samples = 0
+    detector.reset()
+
+    display.start_waveform(10, 53, header="BPM: --", footer="Timer: 0s", step=samplerate // 25)
+    governor.reset()
+    set_mode(MODE_LIVE)
+    await wait_for_press()
+    set_mode(MODE_IDLE)
+    # Beats that are still queued for the beat task are not counted or sent
+    telemetry.end()
+
+    report_samples()
+    print("Display fps:", governor.fps(), "skipped:", governor.skipped, "overruns:", governor.overruns)
+
+    if len(live_ppi) >= 3:
+        actual_PPI = PPI_calc(live_ppi)
+        actual_HR = HR(actual_PPI)
+        display.show_message([f'HR: {actual_HR} bpm'])
+
+async def browse_history():
+    """
+    Scrolls through the stored analyses with the encoder. A press shows the
+    selected analysis, or returns to the menu on the back row.
+    """
+    display.display_history(history)
     while True:
-        if not samples.empty():
-            x = samples.get()
-            disp_count += 1
-
-            if disp_count >= disp_div:
-                disp_count = 0
-                m0 = (1 - a) * m0 + a * x
-                y2 = int(32 * (m0 - x) / 14000 + 35)
-                y2 = max(10, min(53, y2))
-                x2 = x1 + 1
-                graph_points.append((x2, y2))
-
-                display.oled.fill(0)
-                display.oled.fill_rect(0, 0, 128, 9, 1)
-                display.oled.fill_rect(0, 55, 128, 64, 1)
-                if len(PPI_array) > 3:
-                    actual_PPI = PPI_calc(PPI_array)
-                    actual_HR = HR(actual_PPI)
-                    display.oled.text(f'BPM: {actual_HR}', 2, 1, 0)
-                display.oled.text(f'Timer: {int(capture_count / samplerate)}s', 18, 56, 0)
-                
-                # Draw the entire graph
-                for i in range(1, len(graph_points)):
-                    display.oled.line(graph_points[i-1][0], graph_points[i-1][1], graph_points[i][0], graph_points[i][1], 1)
-                
-                display.oled.show()
-
-                x1 = x2 if x2 <= 127 else -1
-                if x1 == -1:
-                    graph_points = []
-                y1 = y2
-
-            old_sample = buffer[index] if subtract_old_sample else 0
-            sample_sum = sample_sum + x - old_sample
-
-            if subtract_old_sample:
-                sample_avg = sample_sum / avg_size
-                if x > (sample_avg * 1.05):
-                    if x > sample_peak:
-                        sample_peak = x
-                        sample_index = capture_count
-                else:
-                    if sample_peak > 0:
-                        if (sample_index - previous_index) > (60 * samplerate / min_bpm):
-                            previous_peak = 0
-                            previous_index = sample_index
-                        elif sample_peak >= (previous_peak * 0.8):
-                            if (sample_index - previous_index) > (60 * samplerate / max_bpm):
-                                if previous_peak > 0:
-                                    interval = sample_index - previous_index
-                                    interval_ms = int(interval * 1000 / samplerate)
-                                    PPI_array.append(interval_ms)
-                                    brightness = 5
-                                    led21.duty_u16(4000)
-                                previous_peak = sample_peak
-                                previous_index = sample_index
-                    sample_peak = 0
-
-                if brightness > 0:
-                    brightness -= 1
-                    if brightness == 0:
-                        led21.duty_u16(0)
-
-            buffer[index] = x
-            capture_count += 1
-            index = 0 if index >= avg_size - 1 else index + 1
-            if index == 0:
-                subtract_old_sample = 1
-
-            # Check for button press to exit
-            if rot_push.value() == 0:
-                break
-
-    tmr.deinit()
-
-    while not samples.empty():
-        samples.get()
-
-    if len(PPI_array) >= 3:
-        try:
-            actual_PPI = PPI_calc(PPI_array)
-            actual_HR = HR(actual_PPI)
-            display.show_message([f'HR: {actual_HR} bpm'])
-        except KeyboardInterrupt:
-            machine.reset()
-
-# Main loop
-while True:
-    if not samples.empty():
-        event = samples.get()
-    
-        if event == 0:
+        event = await next_event()
+        if event == EVENT_NEXT:
+            display.scroll_history(1)
+        elif event == EVENT_PREV:
+            display.scroll_history(-1)
+        elif event == EVENT_PRESS:
+            index = display.history_selection()
+            if index is None:
+                return
+            display.display_history_record(history, index)
+            await wait_for_press()
+            display.display_history(history, reset=False)
+
+async def ui_task():
+    """
+    Runs the menu and the screens behind it.
+    """
+    global current_selection
+    display.display_menu(menu_items, current_selection)
+
+    while True:
+        event = await next_event()
+
+        if event == EVENT_NEXT:
             current_selection = (current_selection + 1) % len(menu_items)
             display.display_menu(menu_items, current_selection)
-            
-        elif event == 1:
+
+        elif event == EVENT_PREV:
             current_selection = (current_selection - 1) % len(menu_items)
             display.display_menu(menu_items, current_selection)
-        
-        elif event == 2:
+
+        elif event == EVENT_PRESS:
             led_onboard.value(1)
-            time.sleep(0.15)
+            await asyncio.sleep_ms(150)
             led_onboard.value(0)
-            
+
             if current_selection == 0:  # "MEASURE HR"
                 display.show_message(["Real-time HR", "Press to stop"])
-                measure_hr()
-                display.display_menu(menu_items, current_selection)
-            
+                await measure_hr()
+
             elif current_selection == 1:  # "HRV ANALYSIS"
-                display.show_message(["Collecting data..."])
-                ppi_data = collect_ppi_data()
-                
-                mean_ppi = hrv_analyzer.meanPPI_calculator(ppi_data)
-                sdnn = hrv_analyzer.SDNN_calculator(ppi_data, mean_ppi)
-                rmssd = hrv_analyzer.RMSSD_calculator(ppi_data)
-                mean_hr = hrv_analyzer.meanHR_calculator(mean_ppi)
-                
-                history.append(f"Mean PPI: {mean_ppi} ms")
-                history.append(f"Mean HR: {mean_hr} bpm")
-                history.append(f"SDNN: {sdnn} ms")
-                history.append(f"RMSSD: {rmssd} ms")
-                if len(history) > max_history:
-                    history.pop(0)
-                
-                display.show_message([
-                    "HRV ANALYSIS:",
-                    f"Mean PPI: {mean_ppi} ms",
-                    f"Mean HR: {mean_hr} bpm",
-                    f"SDNN: {sdnn} ms",
-                    f"RMSSD: {rmssd} ms"
-                ])
-                
+                display.show_message(["Collecting data...", "Press to stop"])
+                ppi_data = await collect_ppi_data()
+
+                if ppi_data is None:
+                    pass  # stopped with the button, back to the menu
+                elif len(ppi_data) < min_ppi_count:
+                    display.show_message(["Not enough beats", f"Found: {len(ppi_data)}"])
+                else:
+                    # Statistics were updated beat by beat during the collection
+                    mean_ppi = hrv_stream.mean_ppi()
+                    sdnn = hrv_stream.sdnn()
+                    rmssd = hrv_stream.rmssd()
+                    mean_hr = hrv_stream.mean_hr()
+
+                    history.append(mean_ppi, mean_hr, sdnn, rmssd)
+
+                    # The extended metrics come from the running sums as well, without a pass over ppi_data
+                    extended = hrv_stream.time_domain()
+
+                    display.show_message([
+                        "HRV ANALYSIS:",
+                        f"Mean PPI: {mean_ppi} ms",
+                        f"Mean HR: {mean_hr} bpm",
+                        f"SDNN: {sdnn} ms",
+                        f"RMSSD: {rmssd} ms",
+                        f"pNN50: {extended['pnn50']} %",
+                        f"SD1/2: {extended['sd1']}/{extended['sd2']}",
+                        f"SI: {extended['stress_index']}"
+                    ], [i * 8 for i in range(8)])
+
+                    # The LF band needs a longer series, shorter measurements show the time domain only
+                    if hrv_stream.total >= spectrum_min_seconds * 1000:
+                        await wait_for_press()
+                        spectrum = hrv_spectrum.analyze(ppi_data)
+                        display.show_message([
+                            "FREQUENCY:",
+                            f"LF: {spectrum['lf']:.0f} ms2",
+                            f"HF: {spectrum['hf']:.0f} ms2",
+                            f"LF/HF: {spectrum['lf_hf']}",
+                            f"LF: {spectrum['lf_nu']} nu",
+                            f"HF: {spectrum['hf_nu']} nu"
+                        ])
+
                 # Wait for button press to continue
-                while True:
-                    if not samples.empty() and samples.get() == 2:
-                        break
-                
+                if ppi_data is not None:
+                    await wait_for_press()
+
             elif current_selection == 2:  # "KUBIOS"
-                display.show_message(["KUBIOS CLOUD", "Measuring..."])
-                ppi_data = collect_ppi_data()
-                
-                sns, pns = kubios_mqtt.analyze_data(ppi_data)
-                if sns is not None and pns is not None:
-                    display.show_message(["Results:", f"SNS: {sns}", f"PNS: {pns}"])
+                display.show_message(["KUBIOS CLOUD", "Measuring...", "Press to stop"])
+                ppi_data = await collect_ppi_data()
+                event = None
+
+                if ppi_data is None:
+                    pass  # stopped with the button, back to the menu
+                elif len(ppi_data) < min_ppi_count:
+                    display.show_message(["Not enough beats", f"Found: {len(ppi_data)}"])
                 else:
-                    display.show_message(["Request failed"])
-                
+                    local_sns, local_pns = readiness.estimate(hrv_stream.time_domain())
+                    local_result = ["Local results:", f"SNS: {local_sns}", f"PNS: {local_pns}"]
+
+                    if kubios_refine:
+                        display.show_message(local_result + ["Cloud: waiting"])
+                        # The network task sends the data, a press returns to the menu without waiting
+                        job = request_analysis(list(ppi_data))
+                        while event != EVENT_PRESS and not job["done"].is_set():
+                            event = await next_event(100)
+                        sns, pns = job["result"]
+                        # A result without both indices is not stored as a cloud result
+                        cloud = isinstance(sns, (int, float)) and isinstance(pns, (int, float))
+                        if not job["done"].is_set():
+                            pass  # left while waiting, the result is published by the network task
+                        elif cloud:
+                            display.show_message(["Cloud results:", f"SNS: {sns}", f"PNS: {pns}"])
+                        elif job["queued"]:
+                            display.show_message(local_result + ["Cloud: queued"])
+                        elif job["rejected"]:
+                            # Retrying won't help, e.g. the credentials are wrong
+                            display.show_message(local_result + ["Cloud: rejected"])
+                        else:
+                            display.show_message(local_result + ["Cloud: failed"])
+                    else:
+                        cloud = False
+                        display.show_message(local_result)
+
+                    if not cloud:
+                        sns, pns = local_sns, local_pns
+                    history.append(hrv_stream.mean_ppi(), hrv_stream.mean_hr(), hrv_stream.sdnn(),
+                                   hrv_stream.rmssd(), sns, pns, cloud)
+
                 # Wait for button press to continue
-                while True:
-                    if not samples.empty() and samples.get() == 2:
-                        break
-                
+                if ppi_data is not None and event != EVENT_PRESS:
+                    await wait_for_press()
+
             elif current_selection == 3:  # "HISTORY"
-                display.display_history(history)
-                while True:
-                    if not samples.empty() and samples.get() == 2:
-                        break
-            
+                await browse_history()
+
             display.display_menu(menu_items, current_selection)
-    
-    time.sleep(0.01)
 
+async def main():
+    asyncio.create_task(acquisition_task())
+    asyncio.create_task(beat_task())
+    asyncio.create_task(render_task())
+    asyncio.create_task(network_task())
+    await ui_task()
+
+asyncio.run(main())
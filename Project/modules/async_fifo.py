@@ -0,0 +1,34 @@
+import uasyncio as asyncio
+from fifo import Fifo
+
+
+class AsyncFifo(Fifo):
+    """Fifo that an asyncio task can wait on.
+
+    put() is called from an interrupt handler or another task and sets a
+    ThreadSafeFlag, wait() returns once the fifo has data. Setting the flag
+    does not allocate memory, so put() stays usable from hard interrupts.
+    Only one task may wait on a fifo at a time.
+    """
+    def __init__(self, size, typecode='H'):
+        """Parameters
+
+        size (int): Fifo size. The maximum number of items stored is one less than the given size
+        typecode (char): Type of data stored in fifo. (Default is 'H' - unsigned short)
+        """
+        super().__init__(size, typecode)
+        self.flag = asyncio.ThreadSafeFlag()
+
+    def put(self, value):
+        """Put one item into the fifo and wake the waiting task. Raises an exception if the fifo is full."""
+        super().put(value)
+        self.flag.set()
+
+    async def wait(self):
+        """Waits until the fifo has data."""
+        while self.head == self.tail:
+            await self.flag.wait()
+
+    def clear(self):
+        """Discards all items."""
+        self.tail = self.head
@@ -0,0 +1,92 @@
+import uasyncio as asyncio
+import ubinascii
+import ujson
+
+
+class Response:
+    """HTTP response with the same attributes as a urequests response."""
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode()
+
+    def json(self):
+        return ujson.loads(self.content)
+
+    def close(self):
+        pass
+
+
+async def request(method, url, data=None, json=None, headers=None, auth=None, timeout_ms=15000):
+    """
+    Sends an HTTP/1.0 request over an asyncio stream so that other tasks keep
+    running while the request waits for the network. Takes the same arguments
+    as urequests.request(). Raises OSError on network errors and when no
+    answer arrives within timeout_ms.
+    """
+    try:
+        return await asyncio.wait_for_ms(_request(method, url, data, json, headers, auth), timeout_ms)
+    except asyncio.TimeoutError:
+        raise OSError("Request timed out")
+
+
+async def post(url, **kwargs):
+    return await request("POST", url, **kwargs)
+
+
+async def _request(method, url, data, json, headers, auth):
+    proto, _, address = url.split("/", 2)
+    host, _, path = address.partition("/")
+    ssl = proto == "https:"
+    port = 443 if ssl else 80
+    if ":" in host:
+        host, port = host.split(":", 1)
+        port = int(port)
+
+    lines = ["{} /{} HTTP/1.0".format(method, path), "Host: {}".format(host)]
+    if json is not None:
+        data = ujson.dumps(json)
+        lines.append("Content-Type: application/json")
+    if isinstance(data, str):
+        data = data.encode()
+    if data:
+        lines.append("Content-Length: {}".format(len(data)))
+    if auth:
+        credentials = ubinascii.b2a_base64("{}:{}".format(*auth).encode()).strip()
+        lines.append("Authorization: Basic {}".format(credentials.decode()))
+    if headers:
+        for name in headers:
+            lines.append("{}: {}".format(name, headers[name]))
+
+    reader, writer = await asyncio.open_connection(host, port, ssl=ssl)
+    try:
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        if data:
+            writer.write(data)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise OSError("Connection closed")
+        status_code = int(status_line.split(None, 2)[1])
+        length = -1
+        while True:
+            line = await reader.readline()
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+
+        chunks = []
+        received = 0
+        while length < 0 or received < length:
+            chunk = await reader.read(512 if length < 0 else min(512, length - received))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+        return Response(status_code, b"".join(chunks))
+    finally:
+        writer.close()
+        await writer.wait_closed()
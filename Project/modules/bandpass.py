@@ -0,0 +1,176 @@
+import array
+import math
+
+COEF_BITS = 14  # coefficients are Q14 integers, |c| < 2
+INPUT_SHIFT = 2  # samples are reduced to 14 bits so that every product stays a small int
+
+
+def biquad(kind, f0, samplerate, q=0.7071):
+    """
+    Returns the coefficients (b0, b1, b2, a1, a2) of a 'lowpass', 'highpass'
+    or 'notch' biquad with corner or centre frequency f0, normalised to a0 = 1.
+    """
+    w = 2 * math.pi * f0 / samplerate
+    cos_w = math.cos(w)
+    alpha = math.sin(w) / (2 * q)
+    if kind == 'lowpass':
+        b = ((1 - cos_w) / 2, 1 - cos_w, (1 - cos_w) / 2)
+    elif kind == 'highpass':
+        b = ((1 + cos_w) / 2, -(1 + cos_w), (1 + cos_w) / 2)
+    elif kind == 'notch':
+        b = (1, -2 * cos_w, 1)
+    else:
+        raise ValueError("Unknown biquad type: {}".format(kind))
+    a0 = 1 + alpha
+    return b[0] / a0, b[1] / a0, b[2] / a0, -2 * cos_w / a0, (1 - alpha) / a0
+
+
+class BandPassFilter:
+    """Fixed-point cascade of biquads that removes baseline wander and noise from PPG samples.
+
+    The default cascade is a 2nd order high-pass at low_hz followed by a
+    2nd order low-pass at high_hz, with an optional notch e.g. at the mains
+    frequency. Coefficients are Q14 integers and samples are centred and
+    reduced to 14 bits, so every multiply-accumulate stays within MicroPython
+    small ints and no memory is allocated per sample. The rounding error of
+    each section is fed back twice, which keeps the poles near DC of the
+    high-pass from amplifying it into a wandering output. The output is in ADC
+    units around offset, so it can be fed to PeakDetector instead of the raw
+    samples. The state is primed with the first sample to avoid a start-up
+    transient.
+    """
+    def __init__(self, samplerate=250, low_hz=0.5, high_hz=5, notch_hz=None, notch_q=5, offset=32768,
+                 block_size=32):
+        """Parameters
+
+        samplerate (int): Sample rate of the filtered data in Hz
+        low_hz (float): High-pass corner frequency, None to let the baseline through
+        high_hz (float): Low-pass corner frequency, None to let the noise through
+        notch_hz (float): Centre frequency of the notch, None for no notch
+        notch_q (float): Quality factor of the notch, higher is narrower
+        offset (int): Output value of a flat signal
+        block_size (int): Largest block given to process_block()
+        """
+        sections = []
+        if low_hz:
+            sections.append(biquad('highpass', low_hz, samplerate))
+        if high_hz:
+            sections.append(biquad('lowpass', high_hz, samplerate))
+        if notch_hz:
+            sections.append(biquad('notch', notch_hz, samplerate, notch_q))
+        scale = 1 << COEF_BITS
+        self.sections = len(sections)
+        self.coefs = array.array('i', [int(round(c * scale)) for section in sections for c in section])
+        # DC gain of each quantised section, used to prime the state
+        coefs = self.coefs
+        self.gains = [(coefs[c] + coefs[c + 1] + coefs[c + 2]) / (scale + coefs[c + 3] + coefs[c + 4])
+                      for c in range(0, len(coefs), 5)]
+        self.state = array.array('i', [0] * (6 * self.sections))  # x1, x2, y1, y2, e1, e2 per section
+        self.offset = offset
+        self._work = array.array('i', [0] * block_size)
+        self.primed = False
+
+    def reset(self):
+        """Clears the state. The next sample primes the filter again."""
+        self.primed = False
+
+    def prime(self, x):
+        """Sets the state as if x had been fed for a long time."""
+        value = (x - self.offset) >> INPUT_SHIFT
+        state = self.state
+        for s in range(self.sections):
+            out = int(round(value * self.gains[s]))
+            state[6 * s] = value
+            state[6 * s + 1] = value
+            state[6 * s + 2] = out
+            state[6 * s + 3] = out
+            state[6 * s + 4] = 0
+            state[6 * s + 5] = 0
+            value = out
+        self.primed = True
+
+    def process(self, x):
+        """Filters one sample and returns the filtered sample."""
+        if not self.primed:
+            self.prime(x)
+        coefs = self.coefs
+        state = self.state
+        value = (x - self.offset) >> INPUT_SHIFT
+        c = 0
+        s = 0
+        for _ in range(self.sections):
+            x1 = state[s]
+            y1 = state[s + 2]
+            e1 = state[s + 4]
+            acc = (coefs[c] * value + coefs[c + 1] * x1 + coefs[c + 2] * state[s + 1]
+                   - coefs[c + 3] * y1 - coefs[c + 4] * state[s + 3] + 2 * e1 - state[s + 5])
+            y = acc >> COEF_BITS
+            state[s] = value
+            state[s + 1] = x1
+            state[s + 2] = y
+            state[s + 3] = y1
+            state[s + 4] = acc - (y << COEF_BITS)
+            state[s + 5] = e1
+            value = y
+            c += 5
+            s += 6
+        out = (value << INPUT_SHIFT) + self.offset
+        return 0 if out < 0 else 65535 if out > 65535 else out
+
+    def process_block(self, src, dst=None, count=None):
+        """
+        Filters count samples (default all) of src into dst, by default in place.
+        The block is filtered one section at a time with the state kept in locals.
+        """
+        if count is None:
+            count = len(src)
+        if dst is None:
+            dst = src
+        if count == 0:
+            return
+        if not self.primed:
+            self.prime(src[0])
+        work = self._work
+        if len(work) < count:
+            work = self._work = array.array('i', [0] * count)
+        offset = self.offset
+        for i in range(count):
+            work[i] = (src[i] - offset) >> INPUT_SHIFT
+
+        coefs = self.coefs
+        state = self.state
+        for section in range(self.sections):
+            c = 5 * section
+            s = 6 * section
+            b0 = coefs[c]
+            b1 = coefs[c + 1]
+            b2 = coefs[c + 2]
+            a1 = coefs[c + 3]
+            a2 = coefs[c + 4]
+            x1 = state[s]
+            x2 = state[s + 1]
+            y1 = state[s + 2]
+            y2 = state[s + 3]
+            e1 = state[s + 4]
+            e2 = state[s + 5]
+            for i in range(count):
+                x = work[i]
+                acc = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2 + 2 * e1 - e2
+                y = acc >> COEF_BITS
+                work[i] = y
+                e2 = e1
+                e1 = acc - (y << COEF_BITS)
+                x2 = x1
+                x1 = x
+                y2 = y1
+                y1 = y
+            state[s] = x1
+            state[s + 1] = x2
+            state[s + 2] = y1
+            state[s + 3] = y2
+            state[s + 4] = e1
+            state[s + 5] = e2
+
+        for i in range(count):
+            out = (work[i] << INPUT_SHIFT) + offset
+            dst[i] = 0 if out < 0 else 65535 if out > 65535 else out
@@ -0,0 +1,195 @@
+import network
+import time
+import uasyncio as asyncio
+from umqtt.simple import MQTTClient, MQTTException
+
+
+class ConnectionManager:
+    """Keeps the WLAN and MQTT sessions open between analyses.
+
+    poll() is called from the main loop: it follows the WLAN association,
+    opens the MQTT session once the network is up and sends keep-alive
+    pings. Only opening the session waits, for up to timeout_ms, and the
+    caller can defer it. A failed attempt or a lost connection is
+    retried after a delay that doubles up to backoff_max_ms. connect()
+    is awaited when a session is needed right away and waits up to
+    timeout_ms for it while other tasks keep running.
+    """
+    OFFLINE = 0
+    CONNECTING = 1
+    ONLINE = 2
+    WAITING = 3
+    STATUS_TEXT = ("offline", "wifi...", "online", "retry")
+
+    def __init__(self, ssid, password, mqtt_server, client_id="pico", keepalive=60,
+                 timeout_ms=10000, backoff_min_ms=1000, backoff_max_ms=60000):
+        """Parameters
+
+        ssid (str): WLAN name
+        password (str): WLAN password
+        mqtt_server (str): MQTT broker address
+        client_id (str): MQTT client id
+        keepalive (int): MQTT keep-alive period in seconds, pings are sent at half of it
+        timeout_ms (int): Time allowed for the WLAN association and socket operations
+        backoff_min_ms (int): Delay before the first retry after a failure
+        backoff_max_ms (int): Longest delay between retries
+        """
+        self.ssid = ssid
+        self.password = password
+        self.mqtt_server = mqtt_server
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.timeout_ms = timeout_ms
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.wlan = None
+        self.mqtt = None
+        self.state = self.OFFLINE
+        self.enabled = False
+        self.backoff_ms = backoff_min_ms
+        self.deadline = 0
+        self.last_ping = 0
+        self.failures = 0
+
+    def start(self):
+        """Starts connecting in the background, poll() does the rest."""
+        self.enabled = True
+        if self.state == self.OFFLINE:
+            self._associate()
+
+    def poll(self, open_session=True):
+        """Advances the connection. Returns True when the MQTT session is open.
+
+        Opening the MQTT session blocks until the broker answers or timeout_ms
+        passes, everything else returns at once. With open_session False a new
+        session is not opened, e.g. while a measurement is running.
+        """
+        if not self.enabled:
+            return False
+        now = time.ticks_ms()
+        state = self.state
+        if state == self.OFFLINE:
+            self._associate()
+        elif state == self.WAITING:
+            if time.ticks_diff(now, self.deadline) >= 0:
+                self._associate()
+        elif state == self.CONNECTING:
+            if self.wlan.isconnected():
+                if open_session:
+                    self._open_session()
+            elif time.ticks_diff(now, self.deadline) >= 0:
+                print("WiFi connect timed out")
+                self._fail()
+        elif state == self.ONLINE:
+            if not self.wlan.isconnected():
+                print("WiFi connection lost")
+                self._fail()
+            elif time.ticks_diff(now, self.last_ping) >= self.keepalive * 500:
+                try:
+                    # Reads the answer to the previous ping before sending the next one
+                    self.mqtt.check_msg()
+                    self._set_timeout()
+                    self.mqtt.ping()
+                    self.last_ping = now
+                except (OSError, MQTTException) as e:
+                    print("MQTT connection lost:", e)
+                    self._fail()
+        return self.state == self.ONLINE
+
+    async def connect(self, timeout_ms=None):
+        """
+        Waits up to timeout_ms (default the connection timeout) for the MQTT session.
+        Failed attempts are retried without the backoff delay. Returns True when connected.
+        """
+        self.enabled = True
+        if timeout_ms is None:
+            timeout_ms = self.timeout_ms
+        start = time.ticks_ms()
+        while True:
+            if self.state == self.WAITING:
+                self.deadline = time.ticks_ms()
+            if self.poll():
+                return True
+            if time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+                return False
+            await asyncio.sleep_ms(100)
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        """Publishes msg on the open session. Raises OSError when there is no connection."""
+        if self.state != self.ONLINE:
+            raise OSError("Not connected")
+        try:
+            self.mqtt.publish(topic, msg, retain, qos)
+        except OSError:
+            self._fail()
+            raise
+        self.last_ping = time.ticks_ms()
+
+    def disconnect(self):
+        """Closes the MQTT session and the WLAN and stops reconnecting."""
+        self.enabled = False
+        self._close()
+        if self.wlan:
+            try:
+                self.wlan.disconnect()
+                self.wlan.active(False)
+            except OSError:
+                pass
+        self.state = self.OFFLINE
+        self.backoff_ms = self.backoff_min_ms
+
+    def status(self):
+        """Returns the connection state as short text for the display."""
+        return self.STATUS_TEXT[self.state]
+
+    def _associate(self):
+        if self.wlan is None:
+            self.wlan = network.WLAN(network.STA_IF)
+        self.wlan.active(True)
+        self.state = self.CONNECTING
+        self.deadline = time.ticks_add(time.ticks_ms(), self.timeout_ms)
+        if not self.wlan.isconnected():
+            print("Connecting to WiFi...")
+            try:
+                self.wlan.connect(self.ssid, self.password)
+            except OSError as e:
+                print("WiFi error:", e)
+                self._fail()
+
+    def _open_session(self):
+        print("Network connected")
+        try:
+            self.mqtt = MQTTClient(self.client_id, self.mqtt_server, keepalive=self.keepalive)
+            # The timeout is set on the socket before it connects (umqtt.simple 1.4, MicroPython 1.23 and later)
+            self.mqtt.connect(timeout=self.timeout_ms / 1000)
+            self._set_timeout()
+        except (OSError, IndexError, MQTTException) as e:
+            print("MQTT connect failed:", e)
+            self._fail()
+            return
+        self.state = self.ONLINE
+        self.backoff_ms = self.backoff_min_ms
+        self.failures = 0
+        self.last_ping = time.ticks_ms()
+
+    def _set_timeout(self):
+        # check_msg() makes the socket blocking again without a timeout,
+        # so the timeout for the other socket operations is set again here
+        sock = getattr(self.mqtt, "sock", None)
+        if sock is not None:
+            sock.settimeout(self.timeout_ms / 1000)
+
+    def _fail(self):
+        self._close()
+        self.failures += 1
+        self.state = self.WAITING
+        self.deadline = time.ticks_add(time.ticks_ms(), self.backoff_ms)
+        self.backoff_ms = min(self.backoff_ms * 2, self.backoff_max_ms)
+
+    def _close(self):
+        if self.mqtt:
+            try:
+                self.mqtt.disconnect()
+            except OSError:
+                pass
+            self.mqtt = None
@@ -1,5 +1,6 @@
 from machine import I2C, Pin
 from ssd1306 import SSD1306_I2C
+from window import ExpAverage, RunningMinMax
 
 class DisplayManager:
     def __init__(self):
@@ -9,62 +10,437 @@ class DisplayManager:
         self.OLED_WIDTH = 128
         self.OLED_HEIGHT = 64
         self.GRAPH_TOP = 16
-        self.GRAPH_BUFFER_SIZE = 128
+        self.HEADER_HEIGHT = 9
+        self.FOOTER_TOP = 55
+        self.PAGES = self.OLED_HEIGHT // 8
         
         # Initialize I2C and OLED
         i2c = I2C(1, sda=Pin(14), scl=Pin(15))
         self.oled = SSD1306_I2C(self.OLED_WIDTH, self.OLED_HEIGHT, i2c)
-        self.graph_buffer = [0] * self.GRAPH_BUFFER_SIZE
+
+        # Dirty column range [lo, hi) of each 8 pixel high page, lo >= hi means the page is clean
+        self.dirty_lo = bytearray([self.OLED_WIDTH] * self.PAGES)
+        self.dirty_hi = bytearray(self.PAGES)
+        self._frame = memoryview(self.oled.buffer)
+        # The view currently on the screen and what it shows, used to redraw only what changed
+        self.view = None
+        self.menu_items = None
+        self.menu_selection = 0
+        self.messages = []
+        self.message_positions = []
+        self.status = ""
+
+        # History browser: row 0 of the list returns to the menu, rows 1..n are the analyses from the newest
+        self.HISTORY_ROWS = self.PAGES - 1
+        self.history = None
+        self.history_cursor = 0
+        self.history_version = -1
+        self.history_pages = {}  # formatted rows of recently shown pages by page number
+        self.history_cache_pages = 3
+
+        # Scrolling waveform state: the y of the last value of the newest column and the number of columns drawn
+        self.wave_last = 0
+        self.wave_count = 0
+        self.wave_top = self.GRAPH_TOP
+        self.wave_bottom = self.OLED_HEIGHT - 1
+        # The waveform is scaled to the range of the last wave_range.size values,
+        # two (minimum and maximum) per plot_envelope() column
+        self.wave_range = RunningMinMax(self.OLED_WIDTH, 'l')
+        # Envelope decimation of feed_waveform(): wave_step samples per column, the minimum and
+        # maximum of the env_count samples of the column being collected and the running baseline
+        self.wave_step = 10
+        self.env_count = 0
+        self.env_low = 0
+        self.env_high = 0
+        self.wave_baseline = ExpAverage(3)
+        self.header = ""
+        self.footer = ""
+        self.bars_changed = False
+
+    def mark_dirty(self, x, y, w, h):
+        """
+        Marks a rectangle of the frame as changed so that show() sends it to the display.
+        """
+        x0 = max(0, x)
+        x1 = min(self.OLED_WIDTH, x + w)
+        y0 = max(0, y)
+        y1 = min(self.OLED_HEIGHT, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        lo = self.dirty_lo
+        hi = self.dirty_hi
+        for page in range(y0 >> 3, ((y1 - 1) >> 3) + 1):
+            if x0 < lo[page]:
+                lo[page] = x0
+            if x1 > hi[page]:
+                hi[page] = x1
+
+    def invalidate(self):
+        """
+        Marks the whole frame as changed, e.g. after drawing directly on oled.
+        """
+        self.mark_dirty(0, 0, self.OLED_WIDTH, self.OLED_HEIGHT)
+
+    def show(self):
+        """
+        Sends the dirty parts of the frame to the display.
+        Consecutive fully dirty pages are sent in one transfer, other pages as their dirty column window.
+        """
+        lo = self.dirty_lo
+        hi = self.dirty_hi
+        width = self.OLED_WIDTH
+        pages = self.PAGES
+        page = 0
+        while page < pages:
+            if lo[page] >= hi[page]:
+                page += 1
+                continue
+            last = page
+            if lo[page] == 0 and hi[page] == width:
+                while last + 1 < pages and lo[last + 1] == 0 and hi[last + 1] == width:
+                    last += 1
+            self._send_window(lo[page], hi[page], page, last)
+            for clean in range(page, last + 1):
+                lo[clean] = width
+                hi[clean] = 0
+            page = last + 1
+
+    def _send_window(self, x0, x1, first_page, last_page):
+        """
+        Sends columns x0 - x1 (exclusive) of pages first_page - last_page.
+        Several pages are only sent together when they span the full width, so that the data is contiguous.
+        """
+        oled = self.oled
+        oled.write_cmd(0x21)  # column address
+        oled.write_cmd(x0)
+        oled.write_cmd(x1 - 1)
+        oled.write_cmd(0x22)  # page address
+        oled.write_cmd(first_page)
+        oled.write_cmd(last_page)
+        start = first_page * self.OLED_WIDTH
+        oled.write_data(self._frame[start + x0:last_page * self.OLED_WIDTH + x1])
 
     def display_menu(self, menu_items, current_selection):
         """
         Displays the menu items on the OLED screen, highlighting the current selection.
+        When only the selection changed, only the two affected rows are redrawn and sent.
+        """
+        if self.view == "menu" and menu_items is self.menu_items:
+            if current_selection != self.menu_selection:
+                self._draw_menu_row(menu_items, self.menu_selection, False)
+                self._draw_menu_row(menu_items, current_selection, True)
+        else:
+            self.oled.fill(0)
+            self.invalidate()
+            self._draw_status()
+            for i in range(len(menu_items)):
+                self._draw_menu_row(menu_items, i, i == current_selection)
+        self.view = "menu"
+        self.menu_items = menu_items
+        self.menu_selection = current_selection
+        self.show()
+
+    def _draw_menu_row(self, menu_items, i, selected):
+        """
+        Draws one menu row, inverted when it is selected.
         """
+        y_pos = (i + 1) * 12
+        self.oled.fill_rect(0, y_pos, 128, 12, 1 if selected else 0)
+        self.oled.text(menu_items[i], 10, y_pos + 2, 0 if selected else 1)
+        self.mark_dirty(0, y_pos, 128, 12)
+
+    def set_status(self, status):
+        """
+        Sets the connection status shown right-aligned above the menu. Only the status row is sent.
+        """
+        if status == self.status:
+            return
+        self.status = status
+        if self.view == "menu":
+            self._draw_status()
+            self.show()
+
+    def _draw_status(self):
+        """
+        Draws the status row of the menu.
+        """
+        self.oled.fill_rect(0, 0, self.OLED_WIDTH, 12, 0)
+        self.oled.text(self.status, self.OLED_WIDTH - 8 * len(self.status), 2, 1)
+        self.mark_dirty(0, 0, self.OLED_WIDTH, 12)
+
+    def start_waveform(self, top, bottom, header="", footer="", step=None):
+        """
+        Clears the screen and starts a scrolling waveform drawn between rows top and bottom.
+        A non-empty header or footer is drawn as inverted text on a bar above or below the waveform.
+        step sets the number of samples per column of feed_waveform().
+        """
+        self.wave_top = top
+        self.wave_bottom = bottom
+        self.wave_count = 0
+        self.wave_range.reset()
+        if step:
+            self.wave_step = step
+        self.env_count = 0
+        self.header = header
+        self.footer = footer
+        self.view = "waveform"
         self.oled.fill(0)
-        for i, item in enumerate(menu_items):
-            y_pos = (i + 1) * 12
-            if i == current_selection:
-                self.oled.fill_rect(0, y_pos, 128, 12, 1)
-                self.oled.text(item, 10, y_pos + 2, 0)
-            else:
-                self.oled.text(item, 10, y_pos + 2)
-        self.oled.show()
+        self._draw_bars()
+        self.invalidate()
 
-    def update_graph(self, adc_value):
+    def set_header(self, text):
         """
-        Updates the graph on the OLED screen with the latest ADC value.
+        Sets the waveform header text. It is drawn with the next column.
         """
-        scaled_value = int((adc_value / 65535) * self.OLED_HEIGHT)
-        self.graph_buffer.pop(0)
-        self.graph_buffer.append(scaled_value)
-        
-        self.oled.fill_rect(0, self.GRAPH_TOP, self.OLED_WIDTH, self.OLED_HEIGHT, 0)
-        for x in range(1, len(self.graph_buffer)):
-            self.oled.line(
-                x - 1, self.GRAPH_TOP + self.OLED_HEIGHT - self.graph_buffer[x - 1],
-                x, self.GRAPH_TOP + self.OLED_HEIGHT - self.graph_buffer[x],
-                1
-            )
-        self.oled.show()
+        if text != self.header:
+            self.header = text
+            self.bars_changed = True
+
+    def set_footer(self, text):
+        """
+        Sets the waveform footer text. It is drawn with the next column.
+        """
+        if text != self.footer:
+            self.footer = text
+            self.bars_changed = True
+
+    def feed_waveform(self, block, count=None):
+        """
+        Feeds count samples (default all) from block to the waveform. Every wave_step samples are
+        reduced to their minimum, maximum and last value as they arrive and drawn as one envelope
+        column, so peaks between columns are not lost at any step. Returns the number of columns drawn.
+        """
+        if count is None:
+            count = len(block)
+        step = self.wave_step
+        n = self.env_count
+        low = self.env_low
+        high = self.env_high
+        columns = 0
+        for i in range(count):
+            x = block[i]
+            if n == 0:
+                low = x
+                high = x
+            elif x < low:
+                low = x
+            elif x > high:
+                high = x
+            n += 1
+            if n == step:
+                self.plot_envelope(low, high, x)
+                n = 0
+                columns += 1
+        self.env_count = n
+        self.env_low = low
+        self.env_high = high
+        return columns
 
-    def display_history(self, history):
+    def plot_envelope(self, low, high, last):
         """
-        Displays the history of HRV analysis results on the OLED screen.
+        Plots the samples of one column as a bar from low to high joined to the last value of the
+        previous column. The values are drawn as deviations from a running baseline of the last
+        values and scaled so that the columns in wave_range span the waveform area. The range is
+        kept in a RunningMinMax, so autoscaling costs the same for every column.
         """
+        baseline = self.wave_baseline
+        if self.wave_count == 0:
+            baseline.reset(last)
+        base = baseline.update(last)
+        low -= base
+        high -= base
+        last -= base
+        wave_range = self.wave_range
+        wave_range.update(low)
+        wave_range.update(high)
+        range_low = wave_range.min()
+        range_high = wave_range.max()
+        top = self.wave_top
+        bottom = self.wave_bottom
+        if range_high > range_low:
+            span = bottom - top
+            scale = range_high - range_low
+            self._plot_bar(bottom - (high - range_low) * span // scale, bottom - (low - range_low) * span // scale,
+                           bottom - (last - range_low) * span // scale)
+        else:
+            middle = (top + bottom) // 2
+            self._plot_bar(middle, middle, middle)
+
+    def _plot_bar(self, y0, y1, y):
+        """
+        Scrolls the waveform one column to the left and draws a bar from row y0 down to row y1 in the
+        rightmost column, extended to the last y of the previous column so the trace stays joined.
+        y is the row of the last value of the new column.
+        """
+        oled = self.oled
+        top = self.wave_top
+        bottom = self.wave_bottom
+        y0 = max(top, min(bottom, y0))
+        y1 = max(top, min(bottom, y1))
+        y = max(top, min(bottom, y))
+        x = self.OLED_WIDTH - 1
+        if self.wave_count:
+            previous = self.wave_last
+            if previous < y0:
+                y0 = previous
+            elif previous > y1:
+                y1 = previous
+
+        oled.scroll(-1, 0)
+        oled.vline(x, top, bottom - top + 1, 0)
+        oled.vline(x, y0, y1 - y0 + 1, 1)
+        # The bars scrolled with the rest of the frame, redrawn they are unchanged unless their text changed
+        self._draw_bars()
+        self.mark_dirty(0, top, self.OLED_WIDTH, bottom - top + 1)
+        if self.bars_changed:
+            self.bars_changed = False
+            self.mark_dirty(0, 0, self.OLED_WIDTH, self.HEADER_HEIGHT)
+            self.mark_dirty(0, self.FOOTER_TOP, self.OLED_WIDTH, self.OLED_HEIGHT - self.FOOTER_TOP)
+
+        self.wave_last = y
+        if self.wave_count < self.OLED_WIDTH:
+            self.wave_count += 1
+
+    def _draw_bars(self):
+        """
+        Draws the waveform header and footer bars.
+        """
+        oled = self.oled
+        if self.header:
+            oled.fill_rect(0, 0, self.OLED_WIDTH, self.HEADER_HEIGHT, 1)
+            oled.text(self.header, 2, 1, 0)
+        if self.footer:
+            oled.fill_rect(0, self.FOOTER_TOP, self.OLED_WIDTH, self.OLED_HEIGHT - self.FOOTER_TOP, 1)
+            oled.text(self.footer, 18, self.FOOTER_TOP + 1, 0)
+
+    def display_history(self, history, reset=True):
+        """
+        Shows the analyses of history, a HistoryStore, as a list that is scrolled with scroll_history().
+        The list opens on the newest analysis, or where it was left when reset is False.
+        Only the page on the screen is read from flash and formatted, recent pages are cached.
+        """
+        if history is not self.history:
+            self.history = history
+            self.history_pages = {}
+        if reset:
+            self.history_cursor = 1 if len(history) else 0
+        self.history_cursor = min(self.history_cursor, len(history))
+        self._draw_history_page()
+
+    def scroll_history(self, step):
+        """
+        Moves the history cursor by step rows. When the cursor stays on its page only the two changed rows are sent.
+        """
+        rows = self.HISTORY_ROWS
+        old = self.history_cursor
+        cursor = min(max(old + step, 0), len(self.history))
+        if cursor == old:
+            return
+        self.history_cursor = cursor
+        if old // rows != cursor // rows:
+            self._draw_history_page()
+            return
+        page = self._history_page(cursor // rows)
+        self._draw_history_row(page, old % rows, False)
+        self._draw_history_row(page, cursor % rows, True)
+        self._draw_history_header()
+        self.show()
+
+    def history_selection(self):
+        """
+        Returns the history index of the analysis under the cursor, None when the cursor is on the back row.
+        """
+        if self.history_cursor == 0:
+            return None
+        return -self.history_cursor
+
+    def display_history_record(self, history, index):
+        """
+        Displays all values of one analysis of history.
+        """
+        self.view = "history_record"
         self.oled.fill(0)
+        self.oled.text(f"HISTORY {len(history) + index + 1}/{len(history)}", 0, 0, 1)
+        for i, line in enumerate(history.format(index)):
+            self.oled.text(line, 0, (i + 1) * 8, 1)
+        self.invalidate()
+        self.show()
+
+    def _history_page(self, page):
+        """
+        Returns the rows of a list page, reading and formatting the analyses only when the page is not cached.
+        """
+        history = self.history
+        pages = self.history_pages
+        if history.version != self.history_version:
+            pages.clear()
+            self.history_version = history.version
+        rows = pages.get(page)
+        if rows is None:
+            first = page * self.HISTORY_ROWS
+            if first == 0:
+                rows = ["< Back"] + history.rows(-1, self.HISTORY_ROWS - 1)
+            else:
+                rows = history.rows(-first, self.HISTORY_ROWS)
+            if len(pages) >= self.history_cache_pages:
+                # Scrolling moves one page at a time, the page furthest away is needed last
+                del pages[max(pages, key=lambda cached: abs(cached - page))]
+            pages[page] = rows
+        return rows
+
+    def _draw_history_page(self):
+        """
+        Draws the header and the list page that holds the cursor.
+        """
+        self.view = "history"
+        rows = self.HISTORY_ROWS
+        page = self._history_page(self.history_cursor // rows)
+        self.oled.fill(0)
+        self._draw_history_header()
+        for i in range(len(page)):
+            self._draw_history_row(page, i, i == self.history_cursor % rows)
+        self.invalidate()
+        self.show()
+
+    def _draw_history_header(self):
+        """
+        Draws the title and the cursor position.
+        """
+        position = f"{self.history_cursor}/{len(self.history)}"
+        self.oled.fill_rect(0, 0, self.OLED_WIDTH, 8, 0)
         self.oled.text("HISTORY", 0, 0, 1)
-        for i, item in enumerate(history[-4:]):
-            y_pos = (i + 1) * 8
-            self.oled.text(f"{i + 1}: {item}", 0, y_pos, 1)
-        self.oled.show()
+        self.oled.text(position, self.OLED_WIDTH - 8 * len(position), 0, 1)
+        self.mark_dirty(0, 0, self.OLED_WIDTH, 8)
+
+    def _draw_history_row(self, page, i, selected):
+        """
+        Draws one list row, inverted when it is selected.
+        """
+        y_pos = (i + 1) * 8
+        self.oled.fill_rect(0, y_pos, self.OLED_WIDTH, 8, 1 if selected else 0)
+        self.oled.text(page[i], 0, y_pos, 0 if selected else 1)
+        self.mark_dirty(0, y_pos, self.OLED_WIDTH, 8)
 
     def show_message(self, messages, positions=None):
         """
         Displays a list of messages on the OLED screen at specified positions.
+        When the previous message used the same positions, only the changed lines are redrawn and sent.
         """
-        self.oled.fill(0)
         if positions is None:
             positions = [i * 16 for i in range(len(messages))]
-        for message, pos in zip(messages, positions):
-            self.oled.text(message, 0, pos)
-        self.oled.show()
\ No newline at end of file
+        if self.view == "message" and positions == self.message_positions and len(messages) == len(self.messages):
+            old = self.messages
+            for i in range(len(messages)):
+                if messages[i] != old[i]:
+                    self.oled.fill_rect(0, positions[i], self.OLED_WIDTH, 8, 0)
+                    self.oled.text(messages[i], 0, positions[i])
+                    self.mark_dirty(0, positions[i], self.OLED_WIDTH, 8)
+        else:
+            self.oled.fill(0)
+            for message, pos in zip(messages, positions):
+                self.oled.text(message, 0, pos)
+            self.invalidate()
+        self.view = "message"
+        self.messages = list(messages)
+        self.message_positions = list(positions)
+        self.show()
@@ -0,0 +1,80 @@
+import time
+
+
+class FrameGovernor:
+    """Paces display refreshes independently of sample processing.
+
+    Drawing into the frame buffer is cheap, pushing a frame over I2C is not.
+    The governor tells the consumer loop when a frame may be sent: at most
+    fps times per second and only while the sample backlog is small. Frames
+    that are not sent are merged into the next one. When a frame takes
+    longer than its time budget the next frame is delayed by the overrun,
+    so sample processing keeps priority under load.
+    """
+    def __init__(self, fps=25, budget_ms=30, max_backlog=25):
+        """Parameters
+
+        fps (int): Target refresh rate
+        budget_ms (int): Time a frame push may take before the next frame is delayed
+        max_backlog (int): Number of queued samples above which frames are skipped
+        """
+        self.budget_us = budget_ms * 1000
+        self.max_backlog = max_backlog
+        self.set_fps(fps)
+        self.reset()
+
+    def set_fps(self, fps):
+        """Changes the target refresh rate, e.g. for a lower-power session."""
+        self.target_fps = fps
+        self.period_us = 1000000 // fps
+
+    def reset(self):
+        """Clears the statistics and allows a frame immediately."""
+        now = time.ticks_us()
+        self.next_frame = now
+        self.frame_start = now
+        self.frames = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.window_start = now
+        self.window_frames = 0
+        self.achieved_fps = 0
+
+    def due(self, backlog=0):
+        """Returns True when a frame should be sent now. backlog is the number of samples waiting."""
+        now = time.ticks_us()
+        if time.ticks_diff(now, self.next_frame) < 0:
+            return False
+        if backlog > self.max_backlog:
+            # Give the time slot to sample processing, the drawing is merged into the next frame
+            self.skipped += 1
+            self.next_frame = time.ticks_add(now, self.period_us)
+            return False
+        self.frame_start = now
+        return True
+
+    def delay_ms(self):
+        """Returns the time in ms until the next frame may be sent, 0 when it is due."""
+        delay = time.ticks_diff(self.next_frame, time.ticks_us())
+        return delay // 1000 if delay > 0 else 0
+
+    def frame_done(self):
+        """Called after the frame has been sent. Schedules the next frame and updates the achieved rate."""
+        now = time.ticks_us()
+        duration = time.ticks_diff(now, self.frame_start)
+        delay = self.period_us
+        if duration > self.budget_us:
+            self.overruns += 1
+            delay += duration - self.budget_us
+        self.next_frame = time.ticks_add(self.frame_start, delay)
+        self.frames += 1
+        self.window_frames += 1
+        elapsed = time.ticks_diff(now, self.window_start)
+        if elapsed >= 1000000:
+            self.achieved_fps = self.window_frames * 1000000 // elapsed
+            self.window_start = now
+            self.window_frames = 0
+
+    def fps(self):
+        """Returns the refresh rate achieved during the last full second."""
+        return self.achieved_fps
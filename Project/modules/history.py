@@ -0,0 +1,170 @@
+import os
+import struct
+import time
+
+HISTORY_MAGIC = b'HRVH'
+HISTORY_VERSION = 1
+HISTORY_HEADER = '<4sHHHH'  # magic, version, capacity, next slot, record count
+HISTORY_HEADER_SIZE = struct.calcsize(HISTORY_HEADER)
+# timestamp, mean PPI, mean HR, flags, SDNN, RMSSD, SNS * 100, PNS * 100
+HISTORY_RECORD = '<IHBBHHhh'
+HISTORY_RECORD_SIZE = struct.calcsize(HISTORY_RECORD)
+
+FLAG_READINESS = 0x01  # SNS and PNS are set
+FLAG_CLOUD = 0x02  # SNS and PNS come from Kubios Cloud, otherwise from the local estimate
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _clamp(value, lo, hi):
+    if not _is_number(value):
+        raise ValueError("Not a number: {}".format(value))
+    value = int(round(value))
+    return lo if value < lo else hi if value > hi else value
+
+
+class HistoryStore:
+    """Analysis results in a fixed-size ring of binary records on flash.
+
+    The file is a header followed by capacity records of HISTORY_RECORD_SIZE
+    bytes and is written at full size when it is created. Appending writes
+    one record slot and the header, reading a record seeks straight to its
+    slot, so both take the same time however full the ring is. When the ring
+    is full the oldest record is overwritten. Records are kept as numbers and
+    formatted only when they are shown. version changes whenever the records
+    change, so that text made from them can be cached.
+    """
+    def __init__(self, name="history.bin", capacity=100):
+        """Parameters
+
+        name (str): File the records are stored in
+        capacity (int): Number of records kept, a file with another capacity is started over
+        """
+        if not 0 < capacity < 65536:
+            raise ValueError("capacity must be between 1 and 65535")
+        self.name = name
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+        self.version = 0
+        self._record = bytearray(HISTORY_RECORD_SIZE)
+        try:
+            with open(name, "rb") as f:
+                magic, version, capacity, head, count = struct.unpack(HISTORY_HEADER, f.read(HISTORY_HEADER_SIZE))
+            if magic != HISTORY_MAGIC or version != HISTORY_VERSION or capacity != self.capacity:
+                raise ValueError("Incompatible history file")
+            if head >= capacity or count > capacity:
+                raise ValueError("Corrupt history file")
+            self.head = head
+            self.count = count
+        except (OSError, ValueError):
+            self.clear()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, mean_ppi, mean_hr, sdnn, rmssd, sns=None, pns=None, cloud=False, timestamp=None):
+        """
+        Stores the results of one analysis, overwriting the oldest record when the ring is full.
+        SNS and PNS are stored only when both are numbers, e.g. not when the cloud left them out.
+        """
+        flags = 0
+        if _is_number(sns) and _is_number(pns):
+            flags |= FLAG_READINESS
+            if cloud:
+                flags |= FLAG_CLOUD
+        else:
+            sns = pns = 0
+        if timestamp is None:
+            timestamp = time.time()
+        struct.pack_into(HISTORY_RECORD, self._record, 0,
+                         int(timestamp), _clamp(mean_ppi, 0, 65535), _clamp(mean_hr, 0, 255), flags,
+                         _clamp(sdnn, 0, 65535), _clamp(rmssd, 0, 65535),
+                         _clamp(sns * 100, -32768, 32767), _clamp(pns * 100, -32768, 32767))
+        head = self.head
+        with open(self.name, "r+b") as f:
+            f.seek(HISTORY_HEADER_SIZE + head * HISTORY_RECORD_SIZE)
+            f.write(self._record)
+            # The record only becomes visible once the header has been written
+            self.head = head + 1 if head + 1 < self.capacity else 0
+            if self.count < self.capacity:
+                self.count += 1
+            f.seek(0)
+            f.write(self._header())
+        self.version += 1
+
+    def get(self, index):
+        """
+        Returns record index, 0 is the oldest and -1 the newest, as a tuple
+        (timestamp, mean PPI, mean HR, SDNN, RMSSD, SNS, PNS, flags).
+        SNS and PNS are None when the analysis had no readiness values.
+        """
+        with open(self.name, "rb") as f:
+            return self._read(f, index)
+
+    def rows(self, index, count):
+        """
+        Returns one line of text with the date and mean HR for each of up to
+        count records, starting from record index and going towards the oldest.
+        """
+        rows = []
+        if index < 0:
+            index += self.count
+        with open(self.name, "rb") as f:
+            while len(rows) < count and 0 <= index < self.count:
+                timestamp, mean_ppi, mean_hr = self._read(f, index)[:3]
+                t = time.localtime(timestamp)
+                rows.append("{:02d}.{:02d} {:02d}:{:02d} {:>3}".format(t[2], t[1], t[3], t[4], mean_hr))
+                index -= 1
+        return rows
+
+    def _read(self, f, index):
+        count = self.count
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("history index out of range")
+        slot = self.head - count + index
+        if slot < 0:
+            slot += self.capacity
+        f.seek(HISTORY_HEADER_SIZE + slot * HISTORY_RECORD_SIZE)
+        f.readinto(self._record)
+        timestamp, mean_ppi, mean_hr, flags, sdnn, rmssd, sns, pns = struct.unpack(HISTORY_RECORD, self._record)
+        if flags & FLAG_READINESS:
+            return timestamp, mean_ppi, mean_hr, sdnn, rmssd, sns / 100, pns / 100, flags
+        return timestamp, mean_ppi, mean_hr, sdnn, rmssd, None, None, flags
+
+    def format(self, index):
+        """Returns record index as lines of text for the display."""
+        timestamp, mean_ppi, mean_hr, sdnn, rmssd, sns, pns, flags = self.get(index)
+        t = time.localtime(timestamp)
+        lines = [
+            "{:02d}.{:02d}.{} {:02d}:{:02d}".format(t[2], t[1], t[0], t[3], t[4]),
+            "Mean HR: {} bpm".format(mean_hr),
+            "Mean PPI: {} ms".format(mean_ppi),
+            "SDNN: {} ms".format(sdnn),
+            "RMSSD: {} ms".format(rmssd),
+        ]
+        if sns is not None:
+            source = "cloud" if flags & FLAG_CLOUD else "local"
+            lines.append("SNS: {} ({})".format(sns, source))
+            lines.append("PNS: {}".format(pns))
+        return lines
+
+    def clear(self):
+        """Removes all records and writes the file at full size."""
+        self.head = 0
+        self.count = 0
+        self.version += 1
+        empty = bytearray(HISTORY_RECORD_SIZE)
+        temp = self.name + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(self._header())
+            for _ in range(self.capacity):
+                f.write(empty)
+        os.rename(temp, self.name)
+
+    def _header(self):
+        return struct.pack(HISTORY_HEADER, HISTORY_MAGIC, HISTORY_VERSION, self.capacity, self.head, self.count)
@@ -1,4 +1,54 @@
+import array
+
+from window import RunningMinMax
+
+
+def _time_domain_result(count, mean_ppi, ppi_min, ppi_max, sdnn, rmssd, nn50, var_ppi, var_diff, histogram,
+                        bin_width):
+    """
+    Builds the time_domain() dict shared by HRVAnalyzer and HRVStream from the statistics of count intervals.
+    var_ppi and var_diff are the sample variances of the intervals and of their successive differences.
+    """
+    diffs = count - 1
+    sd1_sq = 0.5 * var_diff
+    sd2_sq = 2 * var_ppi - sd1_sq
+
+    mode_bin = 0
+    for i in range(1, len(histogram)):
+        if histogram[i] > histogram[mode_bin]:
+            mode_bin = i
+    amo = 100 * histogram[mode_bin] / count
+    mo = (mode_bin + 0.5) * bin_width / 1000
+    mxdmn = (ppi_max - ppi_min) / 1000
+    if mxdmn > 0:
+        stress_index = amo / (2 * mo * mxdmn)
+    else:
+        stress_index = 0.0
+
+    return {
+        'mean_ppi': mean_ppi,
+        'mean_hr': round(60 * 1000 / mean_ppi, 0),
+        'min_hr': round(60 * 1000 / ppi_max, 0),
+        'max_hr': round(60 * 1000 / ppi_min, 0),
+        'sdnn': sdnn,
+        'rmssd': rmssd,
+        'nn50': nn50,
+        'pnn50': round(100 * nn50 / diffs, 1),
+        'sd1': round(sd1_sq ** 0.5, 1),
+        'sd2': round(max(0.0, sd2_sq) ** 0.5, 1),
+        'stress_index': round(stress_index, 1),
+    }
+
+
 class HRVAnalyzer:
+    def __init__(self, bin_width=50, bins=40):
+        """
+        Initializes the HRVAnalyzer with a preallocated PPI histogram used for the stress index.
+        Intervals are binned in bin_width ms bins covering 0 - bin_width * bins ms.
+        """
+        self.bin_width = bin_width
+        self.histogram = array.array('H', [0] * bins)
+
     @staticmethod
     def meanPPI_calculator(data):
         """
@@ -27,4 +77,219 @@ class HRVAnalyzer:
         """
         Calculate the mean heart rate (HR) from the mean PPI.
         """
-        return round(60 * 1000 / mean_ppi, 0)
\ No newline at end of file
+        return round(60 * 1000 / mean_ppi, 0)
+
+    def time_domain(self, data, count=None):
+        """
+        Calculates the time-domain HRV metrics of the first count intervals (default all) in one pass.
+        Returns a dict with mean_ppi, mean_hr, min_hr, max_hr, sdnn, rmssd, nn50, pnn50, sd1, sd2 and
+        stress_index (Baevsky). mean_ppi, sdnn and rmssd match the separate calculators.
+        Raises ValueError if there are fewer than two intervals.
+        """
+        if count is None:
+            count = len(data)
+        if count < 2:
+            raise ValueError('Too few intervals for time-domain analysis')
+        histogram = self.histogram
+        bins = len(histogram)
+        bin_width = self.bin_width
+        for i in range(bins):
+            histogram[i] = 0
+
+        # Sums are taken of deviations from the first interval to keep the integers small
+        first = data[0]
+        ppi_min = first
+        ppi_max = first
+        sum_dev = 0
+        sum_dev_sq = 0
+        sum_diff = 0
+        sum_diff_sq = 0
+        nn50 = 0
+        previous = first
+        for i in range(count):
+            ppi = data[i]
+            if ppi < ppi_min:
+                ppi_min = ppi
+            elif ppi > ppi_max:
+                ppi_max = ppi
+            dev = ppi - first
+            sum_dev += dev
+            sum_dev_sq += dev * dev
+            diff = ppi - previous
+            sum_diff += diff
+            sum_diff_sq += diff * diff
+            if diff > 50 or diff < -50:
+                nn50 += 1
+            previous = ppi
+            b = ppi // bin_width
+            histogram[b if b < bins else bins - 1] += 1
+
+        diffs = count - 1
+        mean_ppi = int(round(first + sum_dev / count, 0))
+        # Squared deviations from the rounded mean, as in SDNN_calculator
+        offset = first - mean_ppi
+        sdnn_sq = (sum_dev_sq + 2 * offset * sum_dev + count * offset * offset) / diffs
+        var_ppi = (sum_dev_sq - sum_dev * sum_dev / count) / diffs
+        if diffs > 1:
+            var_diff = (sum_diff_sq - sum_diff * sum_diff / diffs) / (diffs - 1)
+        else:
+            var_diff = 0.0
+        return _time_domain_result(count, mean_ppi, ppi_min, ppi_max, int(round(sdnn_sq ** 0.5, 0)),
+                                   int(round((sum_diff_sq / diffs) ** 0.5, 0)), nn50, var_ppi, var_diff,
+                                   histogram, bin_width)
+
+
+class HRVStream:
+    """Online HRV statistics that are updated in O(1) per interval.
+
+    Keeps mean PPI, SDNN (Welford) and RMSSD up to date while intervals
+    arrive, so results can be shown during a measurement. The sums behind
+    the other HRVAnalyzer.time_domain() metrics, the NN50 count, the PPI
+    histogram and the window minimum and maximum are kept up to date too,
+    so time_domain() needs no pass over the intervals. Intervals are
+    stored in a preallocated ring. When window_ms is given the oldest
+    intervals are removed so that the window never spans more than
+    window_ms milliseconds. Results match the static HRVAnalyzer methods
+    for the intervals currently in the window.
+    """
+    def __init__(self, capacity=512, window_ms=None, step_ms=None, bin_width=50, bins=40):
+        """Parameters
+
+        capacity (int): Maximum number of intervals in the window
+        window_ms (int): Maximum total duration of the window, None for no limit
+        step_ms (int): Interval at which add() reports a completed window step, None to never report
+        bin_width (int): Width of the stress index histogram bins in ms, as in HRVAnalyzer
+        bins (int): Number of histogram bins, as in HRVAnalyzer
+        """
+        self.ring = array.array('H', [0] * capacity)
+        self.capacity = capacity
+        self.window_ms = window_ms
+        self.step_ms = step_ms
+        self.bin_width = bin_width
+        self.histogram = array.array('H', [0] * bins)
+        self.range = RunningMinMax(capacity)
+        self.reset()
+
+    def reset(self):
+        """Removes all intervals."""
+        self.head = 0
+        self.count = 0
+        self.total = 0
+        self.last = 0
+        self.m2 = 0.0
+        self.diff_sq_sum = 0
+        self.nn50 = 0
+        self.since_step = 0
+        histogram = self.histogram
+        for i in range(len(histogram)):
+            histogram[i] = 0
+        self.range.reset()
+
+    def add(self, ppi):
+        """Adds one interval in ms. Returns True when step_ms has elapsed since the last reported step."""
+        if self.count == self.capacity:
+            self.remove_oldest()
+        count = self.count
+        if count > 0:
+            diff = ppi - self.last
+            self.diff_sq_sum += diff * diff
+            if diff > 50 or diff < -50:
+                self.nn50 += 1
+            old_mean = self.total / count
+        else:
+            old_mean = 0
+        self.ring[(self.head + count) % self.capacity] = ppi
+        self.histogram[self._bin(ppi)] += 1
+        self.range.update(ppi)
+        self.last = ppi
+        self.count = count + 1
+        self.total += ppi
+        self.m2 += (ppi - old_mean) * (ppi - self.total / self.count)
+
+        window_ms = self.window_ms
+        if window_ms is not None:
+            while self.total > window_ms and self.count > 1:
+                self.remove_oldest()
+
+        if self.step_ms is not None:
+            self.since_step += ppi
+            if self.since_step >= self.step_ms:
+                self.since_step -= self.step_ms
+                return True
+        return False
+
+    def remove_oldest(self):
+        """Removes the oldest interval from the window."""
+        count = self.count
+        if count == 0:
+            return
+        ring = self.ring
+        ppi = ring[self.head]
+        self.head = (self.head + 1) % self.capacity
+        self.histogram[self._bin(ppi)] -= 1
+        self.range.drop_oldest()
+        old_mean = self.total / count
+        count -= 1
+        self.count = count
+        self.total -= ppi
+        if count == 0:
+            self.m2 = 0.0
+            self.diff_sq_sum = 0
+            self.nn50 = 0
+            return
+        diff = ring[self.head] - ppi
+        self.diff_sq_sum -= diff * diff
+        if diff > 50 or diff < -50:
+            self.nn50 -= 1
+        self.m2 -= (ppi - old_mean) * (ppi - self.total / count)
+        if self.m2 < 0:
+            self.m2 = 0.0
+
+    def mean_ppi(self):
+        """Returns the mean PPI in ms like HRVAnalyzer.meanPPI_calculator."""
+        return int(round(self.total / self.count, 0))
+
+    def mean_hr(self):
+        """Returns the mean heart rate like HRVAnalyzer.meanHR_calculator."""
+        return round(60 * 1000 / self.mean_ppi(), 0)
+
+    def sdnn(self):
+        """Returns SDNN in ms like HRVAnalyzer.SDNN_calculator with the rounded mean PPI."""
+        count = self.count
+        # SDNN_calculator measures deviations from the rounded mean PPI
+        offset = self.total / count - self.mean_ppi()
+        summary = self.m2 + count * offset * offset
+        return int(round((summary / (count - 1)) ** 0.5, 0))
+
+    def rmssd(self):
+        """Returns RMSSD in ms like HRVAnalyzer.RMSSD_calculator."""
+        return int(round((self.diff_sq_sum / (self.count - 1)) ** 0.5, 0))
+
+    def time_domain(self):
+        """
+        Returns the metrics of HRVAnalyzer.time_domain() for the intervals in the window from the
+        running sums. Costs one pass over the histogram bins, not over the intervals.
+        Raises ValueError if there are fewer than two intervals in the window.
+        """
+        count = self.count
+        if count < 2:
+            raise ValueError('Too few intervals for time-domain analysis')
+        diffs = count - 1
+        mean_ppi = self.mean_ppi()
+        ppi_min = self.range.min()
+        ppi_max = self.range.max()
+        var_ppi = self.m2 / diffs
+        if diffs > 1:
+            # The successive differences telescope, their sum is last - first
+            sum_diff = self.last - self.ring[self.head]
+            var_diff = (self.diff_sq_sum - sum_diff * sum_diff / diffs) / (diffs - 1)
+        else:
+            var_diff = 0.0
+        return _time_domain_result(count, mean_ppi, ppi_min, ppi_max, self.sdnn(), self.rmssd(), self.nn50,
+                                   var_ppi, var_diff, self.histogram, self.bin_width)
+
+    def _bin(self, ppi):
+        """Returns the histogram bin of an interval, the last bin collects the longer ones."""
+        b = ppi // self.bin_width
+        bins = len(self.histogram)
+        return b if b < bins else bins - 1
@@ -0,0 +1,196 @@
+import array
+import math
+
+
+class HRVSpectrum:
+    """On-device frequency-domain HRV analysis.
+
+    The PPI series is resampled to an even rate by linear interpolation and
+    its power spectrum is estimated with Welch's method: Hann windowed
+    segments of a fixed power-of-two size, 50 % overlap and an in-place
+    radix-2 FFT. A series shorter than one segment is windowed as a whole
+    and zero-padded. Window, twiddle and bit-reversal tables as well as all work
+    buffers are allocated once when the object is created.
+    """
+    VLF_BAND = (0.0, 0.04)
+    LF_BAND = (0.04, 0.15)
+    HF_BAND = (0.15, 0.4)
+
+    def __init__(self, size=256, rate=4, max_seconds=600):
+        """Parameters
+
+        size (int): FFT segment size, must be a power of two
+        rate (int): Resampling rate of the PPI series in Hz
+        max_seconds (int): Longest PPI series that can be analysed
+        """
+        if size < 4 or size & (size - 1):
+            raise ValueError('FFT size must be a power of two')
+        self.size = size
+        self.rate = rate
+        half = size // 2
+
+        self.window = array.array('f', [0.5 - 0.5 * math.cos(2 * math.pi * i / size) for i in range(size)])
+        self.cos_table = array.array('f', [math.cos(2 * math.pi * i / size) for i in range(half)])
+        self.sin_table = array.array('f', [-math.sin(2 * math.pi * i / size) for i in range(half)])
+        self.bitrev = array.array('H', [0] * size)
+        bits = 0
+        while (1 << bits) < size:
+            bits += 1
+        for i in range(size):
+            r = 0
+            for b in range(bits):
+                if i & (1 << b):
+                    r |= 1 << (bits - 1 - b)
+            self.bitrev[i] = r
+        self._window_power = sum(w * w for w in self.window)
+
+        self.series = array.array('f', [0] * (max_seconds * rate))
+        self.length = 0
+        self.re = array.array('f', [0] * size)
+        self.im = array.array('f', [0] * size)
+        self.psd = array.array('f', [0] * (half + 1))
+
+    def resample(self, data, count=None):
+        """Resamples count intervals (default all) of data to the even rate into self.series.
+
+        Each interval is placed at the time its beat ends. Returns the number of samples written.
+        """
+        if count is None:
+            count = len(data)
+        series = self.series
+        capacity = len(series)
+        step = 1000 / self.rate
+        # Time of the first beat end is the start of the resampled series
+        t_prev = 0.0
+        v_prev = data[0]
+        t_next = 0.0
+        t = 0.0
+        n = 0
+        for i in range(1, count):
+            v_next = data[i]
+            t_next += v_next
+            span = t_next - t_prev
+            while t <= t_next and n < capacity:
+                series[n] = v_prev + (v_next - v_prev) * (t - t_prev) / span
+                n += 1
+                t += step
+            t_prev = t_next
+            v_prev = v_next
+        self.length = n
+        return n
+
+    def fft(self, re, im):
+        """In-place radix-2 FFT of the size long arrays re and im."""
+        size = self.size
+        bitrev = self.bitrev
+        for i in range(size):
+            j = bitrev[i]
+            if j > i:
+                re[i], re[j] = re[j], re[i]
+                im[i], im[j] = im[j], im[i]
+        cos_table = self.cos_table
+        sin_table = self.sin_table
+        span = 1
+        step = size // 2
+        while span < size:
+            for start in range(0, size, span * 2):
+                k = 0
+                for a in range(start, start + span):
+                    b = a + span
+                    wr = cos_table[k]
+                    wi = sin_table[k]
+                    tr = wr * re[b] - wi * im[b]
+                    ti = wr * im[b] + wi * re[b]
+                    re[b] = re[a] - tr
+                    im[b] = im[a] - ti
+                    re[a] += tr
+                    im[a] += ti
+                    k += step
+            span *= 2
+            step //= 2
+
+    def welch(self):
+        """Estimates the one-sided power spectral density of self.series into self.psd in ms^2/Hz."""
+        size = self.size
+        half = size // 2
+        length = self.length
+        series = self.series
+        window = self.window
+        re = self.re
+        im = self.im
+        psd = self.psd
+        for k in range(half + 1):
+            psd[k] = 0
+
+        mean = 0.0
+        for i in range(length):
+            mean += series[i]
+        mean /= length
+
+        if length < size:
+            # A series shorter than one segment gets a Hann window spanning just
+            # the series, zero-padded to size. The full window would leave part
+            # of its power outside the data and underestimate the spectrum.
+            power = 0.0
+            for i in range(size):
+                if i < length:
+                    w = 0.5 - 0.5 * math.cos(2 * math.pi * i / length)
+                    re[i] = (series[i] - mean) * w
+                    power += w * w
+                else:
+                    re[i] = 0.0
+                im[i] = 0.0
+            self.fft(re, im)
+            for k in range(half + 1):
+                psd[k] = re[k] * re[k] + im[k] * im[k]
+        else:
+            segments = 0
+            start = 0
+            while start + size <= length:
+                for i in range(size):
+                    re[i] = (series[start + i] - mean) * window[i]
+                    im[i] = 0.0
+                self.fft(re, im)
+                for k in range(half + 1):
+                    psd[k] += re[k] * re[k] + im[k] * im[k]
+                segments += 1
+                start += half
+            power = self._window_power * segments
+
+        scale = 1 / (self.rate * power)
+        for k in range(half + 1):
+            # One-sided spectrum: double everything except DC and Nyquist
+            psd[k] *= scale if k == 0 or k == half else 2 * scale
+
+    def band_power(self, band):
+        """Returns the power in ms^2 of the frequency band (low, high) in Hz from self.psd."""
+        df = self.rate / self.size
+        low, high = band
+        power = 0.0
+        for k in range(len(self.psd)):
+            f = k * df
+            if low <= f < high:
+                power += self.psd[k]
+        return power * df
+
+    def analyze(self, data, count=None):
+        """
+        Calculates the frequency-domain HRV metrics of count intervals (default all) of data.
+        Returns a dict with vlf, lf and hf band powers in ms^2, lf_nu and hf_nu in normalized units and lf_hf.
+        """
+        self.resample(data, count)
+        if self.length < 2:
+            raise ValueError('Too few intervals for spectral analysis')
+        self.welch()
+        vlf = self.band_power(self.VLF_BAND)
+        lf = self.band_power(self.LF_BAND)
+        hf = self.band_power(self.HF_BAND)
+        lf_hf_sum = lf + hf
+        return {
+            'vlf': round(vlf, 1),
+            'lf': round(lf, 1),
+            'hf': round(hf, 1),
+            'lf_nu': round(100 * lf / lf_hf_sum, 1) if lf_hf_sum else 0.0,
+            'hf_nu': round(100 * hf / lf_hf_sum, 1) if lf_hf_sum else 0.0,
+            'lf_hf': round(lf / hf, 2) if hf else 0.0,
+        }
@@ -1,13 +1,22 @@
-import urequests as requests
 import ujson
-import network
 import time
-from umqtt.simple import MQTTClient
+from modules import async_http
+from modules.connection_manager import ConnectionManager
 
 class KubiosMQTT:
-    def __init__(self, ssid, password, mqtt_server, api_key, client_id, client_secret, token_url):
+    def __init__(self, ssid, password, mqtt_server, api_key, client_id, client_secret, token_url,
+                 token_file=None, token_margin=60, connection=None, outbox=None, device_id="pico",
+                 topic_prefix="group4"):
         """
         Initializes the KubiosMQTT class with WiFi, MQTT, and API credentials.
+        The access token is cached until token_margin seconds before it expires.
+        When token_file is given the token is also saved to flash so that it
+        survives a restart. The WLAN and MQTT sessions are kept open by
+        connection, a ConnectionManager that is created when not given.
+        Analyses and publishes that fail for lack of a connection are kept
+        in outbox, an Outbox, and sent later by flush(). Requests that the
+        cloud rejects (4xx) are not kept, they would fail again. Results are
+        published to <topic_prefix>/<device_id>/result.
         """
         self.ssid = ssid
         self.password = password
@@ -16,87 +25,109 @@ class KubiosMQTT:
         self.client_id = client_id
         self.client_secret = client_secret
         self.token_url = token_url
-        self.wlan = None
-        self.mqtt = None
+        self.token_file = token_file
+        self.token_margin = token_margin
+        if connection is None:
+            connection = ConnectionManager(ssid, password, mqtt_server)
+        self.connection = connection
+        self.outbox = outbox
+        self.result_topic = "{}/{}/result".format(topic_prefix, device_id)
+        self.queued = False
+        self.rejected = False
+        self.access_token = None
+        self.token_deadline = 0
+        if token_file:
+            self.load_token()
 
-    def connect_wifi(self):
-        """
-        Connects to the WiFi network using the provided SSID and password.
-        """
-        self.wlan = network.WLAN(network.STA_IF)
-        self.wlan.active(True)
-        if not self.wlan.isconnected():
-            print("Connecting to WiFi...")
-            self.wlan.connect(self.ssid, self.password)
-            while not self.wlan.isconnected():
-                time.sleep(0.1)
-        print("Network connected")
-
-    def disconnect_wifi(self):
+    def disconnect(self):
         """
-        Disconnects from the WiFi network.
+        Closes the MQTT session and the WiFi connection.
         """
-        if self.wlan:
-            try:
-                self.wlan.disconnect()
-                self.wlan.active(False)
-            except:
-                pass
+        self.connection.disconnect()
 
-    def connect_mqtt(self):
-        """
-        Connects to the MQTT server.
-        """
-        self.mqtt = MQTTClient("pico", self.mqtt_server)
-        self.mqtt.connect()
-
-    def disconnect_mqtt(self):
-        """
-        Disconnects from the MQTT server.
-        """
-        if self.mqtt:
-            try:
-                self.mqtt.disconnect()
-            except:
-                pass
-
-    def get_auth_token(self):
+    async def get_auth_token(self):
         """
         Requests an authentication token from the Kubios API.
+        Raises OSError when the service is unavailable (5xx) and RuntimeError when it
+        rejects the request (4xx), e.g. for wrong credentials.
         """
         print("\nRequesting auth token...")
-        auth_response = requests.post(
+        auth_response = await async_http.post(
             self.token_url,
             data='grant_type=client_credentials&client_id={}'.format(self.client_id),
             headers={'Content-Type': 'application/x-www-form-urlencoded'},
             auth=(self.client_id, self.client_secret)
         )
         print("Auth response:", auth_response.text)
-        access_token = auth_response.json()["access_token"]
+        if auth_response.status_code >= 500:
+            raise OSError("Token request failed: {}".format(auth_response.status_code))
+        if auth_response.status_code != 200:
+            raise RuntimeError("Token request rejected: {}".format(auth_response.status_code))
+        token = auth_response.json()
+        access_token = token["access_token"]
         print("Access token received")
+        self.cache_token(access_token, token.get("expires_in", 3600))
         return access_token
 
-    def analyze_data(self, ppi_data):
+    def cache_token(self, access_token, expires_in, issued=None):
         """
-        Analyzes PPI data using the Kubios API and publishes the results to the MQTT server.
+        Keeps the token until token_margin seconds before it expires and saves it to token_file.
+        issued is the time.time() the token was received, default now.
+        """
+        now = time.time()
+        if issued is None:
+            issued = now
+        valid_ms = (issued + expires_in - self.token_margin - now) * 1000
+        if valid_ms <= 0:
+            self.invalidate_token()
+            return
+        self.access_token = access_token
+        # The deadline is kept in ticks so that setting the RTC later does not move it
+        self.token_deadline = time.ticks_add(time.ticks_ms(), int(valid_ms))
+        if self.token_file and issued == now:
+            try:
+                with open(self.token_file, 'w') as f:
+                    ujson.dump({'access_token': access_token, 'issued': issued, 'expires_in': expires_in}, f)
+            except OSError as e:
+                print("Token not saved:", e)
+
+    def load_token(self):
+        """
+        Loads a token saved by cache_token(). A token issued later than the
+        current time is ignored, the RTC has been reset since it was saved.
         """
         try:
-            self.connect_wifi()
-            self.connect_mqtt()
+            with open(self.token_file) as f:
+                saved = ujson.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('issued', 0) <= time.time():
+            self.cache_token(saved['access_token'], saved['expires_in'], saved['issued'])
 
-            access_token = self.get_auth_token()
+    def invalidate_token(self):
+        """
+        Drops the cached token, the next analysis requests a new one.
+        """
+        self.access_token = None
+        self.token_deadline = 0
 
-            dataset = {
-                "id": 123,
-                "type": "RRI",
-                "data": ppi_data,
-                "analysis": {
-                    "type": "readiness"
-                }
-            }
+    async def get_token(self):
+        """
+        Returns the cached token or requests a new one when there is none or it is about to expire.
+        """
+        if self.access_token is not None and time.ticks_diff(self.token_deadline, time.ticks_ms()) > 0:
+            return self.access_token
+        self.invalidate_token()
+        return await self.get_auth_token()
 
-            print("Dataset:", dataset)
-            response = requests.post(
+    async def post_analysis(self, dataset):
+        """
+        Sends the dataset to the analysis API. A 401 response means the
+        token was revoked or expired early, it is then renewed once.
+        """
+        for attempt in range(2):
+            access_token = await self.get_token()
+            response = await async_http.post(
                 "https://analysis.kubioscloud.com/v2/analytics/analyze",
                 headers={
                     "Authorization": "Bearer {}".format(access_token),
@@ -104,34 +135,146 @@ class KubiosMQTT:
                 },
                 json=dataset
             )
+            if response.status_code != 401 or attempt:
+                return response
+            print("Token rejected")
+            response.close()
+            self.invalidate_token()
 
-            result = response.json()
-            print("\nAnalysis Results:")
-            print("-----------------")
-            print("Response status:", response.status_code)
-            print("Full response:", result)
-            print("\nExtracted values:")
-            sns = result['analysis'].get('sns_index', 'N/A')
-            pns = result['analysis'].get('pns_index', 'N/A')
-            print("SNS:", sns)
-            print("PNS:", pns)
-            print("=== Analysis Complete ===\n")
-
-            mqtt_message = ujson.dumps({
-                'sns': sns,
-                'pns': pns,
-                'timestamp': time.time()
-            })
-            self.mqtt.publish('test', mqtt_message)
-            print("Published to MQTT:", mqtt_message)
-
-            return sns, pns
-
+    async def analyze_data(self, ppi_data):
+        """
+        Analyzes PPI data using the Kubios API and publishes the results to the MQTT server.
+        Without a connection the dataset is queued in the outbox and (None, None) is returned,
+        self.queued tells whether that happened. self.rejected tells whether the cloud refused
+        the token or analysis request, such a dataset is not queued.
+        """
+        self.queued = False
+        self.rejected = False
+        dataset = {
+            "id": 123,
+            "type": "RRI",
+            "data": ppi_data,
+            "analysis": {
+                "type": "readiness"
+            }
+        }
+        try:
+            # The sessions stay open after the analysis, a repeat analysis skips the handshakes
+            if not await self.connection.connect():
+                raise OSError("No connection")
+            print("Dataset:", dataset)
+            sns, pns = await self.send_analysis(dataset)
+        except OSError as e:
+            print("\nKubios analysis error:", str(e))
+            self.queue({"kind": "analysis", "dataset": dataset, "timestamp": time.time()})
+            return None, None
+        except RuntimeError as e:
+            print("\nKubios analysis rejected:", str(e))
+            self.rejected = True
+            return None, None
         except Exception as e:
             print("\nKubios analysis error:", str(e))
             print("=== Analysis Failed ===\n")
             return None, None
 
-        finally:
-            self.disconnect_mqtt()
-            self.disconnect_wifi()
\ No newline at end of file
+        self.publish_result(sns, pns, time.time())
+        return sns, pns
+
+    async def send_analysis(self, dataset):
+        """
+        Posts one dataset to the analysis API and returns (sns, pns), None for an index missing from the result.
+        Raises OSError when the cloud is not reachable so that the dataset can be queued,
+        and RuntimeError when the cloud rejects the dataset (4xx).
+        """
+        response = await self.post_analysis(dataset)
+        if response.status_code >= 500:
+            raise OSError("Kubios Cloud error: {}".format(response.status_code))
+        if response.status_code != 200:
+            response.close()
+            raise RuntimeError("Kubios Cloud rejected the analysis: {}".format(response.status_code))
+        result = response.json()
+        print("\nAnalysis Results:")
+        print("-----------------")
+        print("Response status:", response.status_code)
+        print("Full response:", result)
+        print("\nExtracted values:")
+        # A value the cloud left out is None, not a result
+        sns = result['analysis'].get('sns_index')
+        pns = result['analysis'].get('pns_index')
+        print("SNS:", sns)
+        print("PNS:", pns)
+        print("=== Analysis Complete ===\n")
+        return sns, pns
+
+    def publish_result(self, sns, pns, timestamp, queue=True):
+        """
+        Publishes an analysis result. When the MQTT session is down the
+        message is queued, or returned as a record when queue is False.
+        A result without both indices is not published.
+        """
+        if sns is None or pns is None:
+            print("Result incomplete, not published")
+            return None
+        mqtt_message = ujson.dumps({
+            'sns': sns,
+            'pns': pns,
+            'timestamp': timestamp
+        })
+        try:
+            self.connection.publish(self.result_topic, mqtt_message)
+            print("Published to MQTT:", mqtt_message)
+        except OSError as e:
+            print("MQTT publish failed:", e)
+            record = {"kind": "publish", "topic": self.result_topic, "msg": mqtt_message}
+            if not queue:
+                return record
+            self.queue(record)
+        return None
+
+    def queue(self, record):
+        """
+        Keeps a record in the outbox for flush(). Without an outbox the record is lost.
+        """
+        if self.outbox is None:
+            print("No outbox, record dropped")
+            return
+        self.outbox.append(record)
+        self.queued = True
+        print("Queued for sending later,", len(self.outbox), "in outbox")
+
+    async def flush(self, batch=8):
+        """
+        Sends up to batch queued records over the open session: analyses are
+        posted with one token and all MQTT messages go over one connection.
+        Does nothing unless the session is already open. Returns the number
+        of records that were handled.
+        """
+        outbox = self.outbox
+        if outbox is None or len(outbox) == 0 or not self.connection.poll():
+            return 0
+        done = 0
+        retry = []
+        try:
+            for record in outbox.peek(batch):
+                if record is None:
+                    pass
+                elif record["kind"] == "analysis":
+                    sns, pns = await self.send_analysis(record["dataset"])
+                    # The analysis is done even if its result can't be published yet
+                    unsent = self.publish_result(sns, pns, record["timestamp"], queue=False)
+                    if unsent:
+                        retry.append(unsent)
+                elif record["kind"] == "publish":
+                    self.connection.publish(record["topic"], record["msg"])
+                done += 1
+        except OSError as e:
+            print("Outbox flush stopped:", e)
+        except RuntimeError as e:
+            # The record can never be sent, the cloud rejected the dataset
+            print("Outbox record dropped:", e)
+            done += 1
+        outbox.remove(done)
+        for record in retry:
+            outbox.append(record)
+        print("Outbox sent", done, "records,", len(outbox), "left")
+        return done
@@ -0,0 +1,94 @@
+import os
+import ujson
+
+
+class Outbox:
+    """Flash-backed queue of work that is waiting for a connection.
+
+    Records are dicts stored as one JSON line each and new records are
+    appended to the end of the file. Sent records are removed from the
+    start by rewriting the remaining lines once per batch. The queue holds
+    at most max_records records. When it is full the oldest quarter is
+    dropped in one rewrite, so that a long time offline rewrites the file
+    once every max_records // 4 appends rather than on every append.
+    """
+    def __init__(self, name="outbox.jsonl", max_records=50):
+        """Parameters
+
+        name (str): File the queue is stored in
+        max_records (int): Maximum number of queued records
+        """
+        self.name = name
+        self.max_records = max_records
+        self.evicted = 0
+        self.count = 0
+        try:
+            with open(name) as f:
+                for line in f:
+                    if line.strip():
+                        self.count += 1
+        except OSError:
+            pass
+
+    def __len__(self):
+        return self.count
+
+    def append(self, record):
+        """Adds a record to the end of the queue, dropping the oldest quarter when it is full."""
+        if self.count >= self.max_records:
+            dropped = self.count - self.max_records + max(1, self.max_records // 4)
+            self.evicted += dropped
+            self.remove(dropped)
+        with open(self.name, "a") as f:
+            f.write(ujson.dumps(record))
+            f.write("\n")
+        self.count += 1
+
+    def peek(self, n):
+        """
+        Returns up to n of the oldest records without removing them.
+        A line that was cut short by a power loss is returned as None.
+        """
+        records = []
+        if self.count == 0:
+            return records
+        with open(self.name) as f:
+            for line in f:
+                if len(records) >= n:
+                    break
+                if line.strip():
+                    try:
+                        records.append(ujson.loads(line))
+                    except ValueError:
+                        records.append(None)
+        return records
+
+    def remove(self, n):
+        """Removes the n oldest records."""
+        if n <= 0:
+            return
+        if n >= self.count:
+            self.clear()
+            return
+        temp = self.name + ".tmp"
+        kept = 0
+        with open(self.name) as src, open(temp, "w") as dst:
+            skipped = 0
+            for line in src:
+                if not line.strip():
+                    continue
+                if skipped < n:
+                    skipped += 1
+                    continue
+                dst.write(line)
+                kept += 1
+        os.rename(temp, self.name)
+        self.count = kept
+
+    def clear(self):
+        """Removes all records."""
+        try:
+            os.remove(self.name)
+        except OSError:
+            pass
+        self.count = 0
@@ -0,0 +1,130 @@
+import array
+
+from window import RunningSum
+
+
+class PeakDetector:
+    """Streaming beat detector for PPG samples.
+
+    Each sample is compared against a moving average of the last avg_size
+    samples. A peak is the largest sample above avg * threshold and a beat
+    interval is reported when the next peak is found within the allowed BPM
+    range. The moving average is a window.RunningSum. All state lives in
+    preallocated storage so feeding samples does not allocate memory and
+    costs the same amount of work per sample. An optional prefilter, e.g.
+    a BandPassFilter, is applied to the samples before detection.
+    """
+    def __init__(self, samplerate=250, avg_size=128, min_bpm=30, max_bpm=200, threshold=1.05, prefilter=None,
+                 block_size=64):
+        """Parameters
+
+        samplerate (int): Sample rate of the fed data in Hz
+        avg_size (int): Number of samples in the moving average window
+        min_bpm (int): Slowest accepted heart rate, longer gaps restart detection
+        max_bpm (int): Fastest accepted heart rate, shorter intervals are ignored
+        threshold (float): Multiplier of the moving average a peak must exceed
+        prefilter (BandPassFilter): Filter with process() and process_block() applied before detection
+        block_size (int): Largest block fed to feed_block() without allocating memory
+        """
+        self.samplerate = samplerate
+        self.prefilter = prefilter
+        self.avg_size = avg_size
+        self.window = RunningSum(avg_size)
+        # Moving sum after each sample of a block
+        self.sums = array.array('l', [0] * block_size)
+        # Threshold comparison is done with integers:
+        # x > sum / avg_size * threshold  <=>  x * th_den * avg_size > sum * th_num
+        self._th_num = int(round(threshold * 100))
+        self._th_den = 100 * avg_size
+        self._max_gap = 60 * samplerate // min_bpm
+        self._min_gap = 60 * samplerate // max_bpm
+        self.reset()
+
+    def reset(self):
+        """Clears the detector state. The moving average is refilled before peaks are detected again."""
+        if self.prefilter is not None:
+            self.prefilter.reset()
+        self.window.reset()
+        self.sample_peak = 0
+        self.sample_index = 0
+        self.previous_peak = 0
+        self.previous_index = 0
+        self.capture_count = 0
+
+    def feed(self, x):
+        """Feed one sample. Returns the beat interval in milliseconds or 0 if no beat was completed."""
+        if self.prefilter is not None:
+            x = self.prefilter.process(x)
+        interval_ms = 0
+        sample_sum = self.window.update(x)
+        # The window is full from the avg_size:th sample on
+        if self.capture_count >= self.avg_size:
+            if x * self._th_den > sample_sum * self._th_num:
+                if x > self.sample_peak:
+                    self.sample_peak = x
+                    self.sample_index = self.capture_count
+            elif self.sample_peak > 0:
+                interval_ms = self._end_peak()
+        self.capture_count += 1
+        return interval_ms
+
+    def feed_block(self, block, intervals, count=None):
+        """Feed count samples (default all) from block.
+
+        Detected beat intervals in milliseconds are written to the start of
+        intervals. Returns the number of intervals written. Intervals that
+        do not fit in the given array are dropped. With a prefilter the
+        samples in block are replaced by the filtered samples.
+        """
+        if count is None:
+            count = len(block)
+        if self.prefilter is not None:
+            self.prefilter.process_block(block, None, count)
+        if count > len(self.sums):
+            # Grown once for the largest block seen
+            self.sums = array.array('l', [0] * count)
+        sums = self.sums
+        self.window.update_block(block, count, sums)
+        n = 0
+        capacity = len(intervals)
+        # Keep the hot state in locals for the duration of the block
+        th_num = self._th_num
+        th_den = self._th_den
+        sample_peak = self.sample_peak
+        capture_count = self.capture_count
+        # Samples before the window is full only fill the moving sum
+        start = self.avg_size - capture_count
+        if start < 0:
+            start = 0
+        for i in range(start, count):
+            x = block[i]
+            if x * th_den > sums[i] * th_num:
+                if x > sample_peak:
+                    sample_peak = x
+                    self.sample_index = capture_count + i
+            elif sample_peak > 0:
+                self.sample_peak = sample_peak
+                interval_ms = self._end_peak()
+                sample_peak = 0
+                if interval_ms and n < capacity:
+                    intervals[n] = interval_ms
+                    n += 1
+        self.sample_peak = sample_peak
+        self.capture_count = capture_count + count
+        return n
+
+    def _end_peak(self):
+        """Called when the signal drops below the threshold after a peak. Returns the beat interval in ms or 0."""
+        interval_ms = 0
+        gap = self.sample_index - self.previous_index
+        if gap > self._max_gap:
+            self.previous_peak = 0
+            self.previous_index = self.sample_index
+        elif self.sample_peak * 10 >= self.previous_peak * 8:
+            if gap > self._min_gap:
+                if self.previous_peak > 0:
+                    interval_ms = gap * 1000 // self.samplerate
+                self.previous_peak = self.sample_peak
+                self.previous_index = self.sample_index
+        self.sample_peak = 0
+        return interval_ms
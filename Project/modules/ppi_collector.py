@@ -0,0 +1,79 @@
+import array
+
+
+class PPICollector:
+    """Collects beat-to-beat intervals from blocks of samples.
+
+    Samples passed to feed(), e.g. by an asyncio task that reads the sample
+    fifo, go through a PeakDetector and the detected intervals are written
+    in milliseconds into a preallocated array('H'). Collection stops after
+    a given duration of samples, after a given number of beats, when the
+    array is full or when stop() is called.
+    """
+    def __init__(self, detector, capacity=512):
+        """Parameters
+
+        detector (PeakDetector): Detector that turns samples into intervals
+        capacity (int): Maximum number of intervals stored per collection
+        """
+        self.detector = detector
+        self.intervals = array.array('H', [0] * capacity)
+        self.count = 0
+        self.limit = capacity
+        self.remaining = 0
+        self.done = True
+        self._found = array.array('H', [0] * 8)
+
+    def start(self, duration=None, beats=None):
+        """Starts a collection that is fed with feed().
+
+        duration (int): Seconds of signal to process, None for no time limit
+        beats (int): Number of intervals to collect, None for no beat limit
+        """
+        if duration is None and beats is None:
+            raise ValueError('Must specify duration or beats')
+        limit = len(self.intervals)
+        if beats is not None and beats < limit:
+            limit = beats
+        self.limit = limit
+        self.remaining = -1 if duration is None else duration * self.detector.samplerate
+        self.count = 0
+        self.done = False
+        self.detector.reset()
+
+    def feed(self, block, count):
+        """
+        Processes count samples of block. Returns the number of intervals added to
+        the end of data(). Sets done and ignores further samples when the collection is complete.
+        """
+        if self.done:
+            return 0
+        remaining = self.remaining
+        if 0 < remaining < count:
+            count = remaining
+        if remaining > 0:
+            remaining -= count
+            self.remaining = remaining
+        found = self._found
+        found_count = self.detector.feed_block(block, found, count)
+        intervals = self.intervals
+        limit = self.limit
+        n = self.count
+        for i in range(found_count):
+            if n >= limit:
+                break
+            intervals[n] = found[i]
+            n += 1
+        added = n - self.count
+        self.count = n
+        if remaining == 0 or n >= limit:
+            self.done = True
+        return added
+
+    def stop(self):
+        """Ends the collection early. The intervals collected so far stay in data()."""
+        self.done = True
+
+    def data(self):
+        """Returns the intervals of the last collection as an array('H')."""
+        return self.intervals[:self.count]
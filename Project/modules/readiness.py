@@ -0,0 +1,49 @@
+class ReadinessEstimator:
+    """Local estimate of the Kubios PNS and SNS indices.
+
+    Following the Kubios definitions, the PNS index combines mean RR, RMSSD
+    and Poincare SD1 and the SNS index combines mean HR, the stress index
+    and Poincare SD2. Each parameter is expressed as its deviation from
+    normal resting values in units of the normal standard deviation and
+    the index is the mean of the three deviations, with a larger SD2
+    lowering the SNS index. Zero means the parameters equal the population
+    average. SD1 and SD2 are normalized to the mean RR (%) and the stress
+    index is the square root of Baevsky's stress index as used by Kubios.
+    """
+    # (mean, standard deviation) of short-term resting values
+    NORMS = {
+        'mean_rr': (926, 90),
+        'rmssd': (42, 15),
+        'sd1': (3.2, 1.1),
+        'mean_hr': (66, 6),
+        'stress_index': (10, 3),
+        'sd2': (6.8, 2.2),
+    }
+
+    def __init__(self, norms=None):
+        """
+        Initializes the estimator. norms can override entries of NORMS.
+        """
+        self.norms = dict(self.NORMS)
+        if norms:
+            self.norms.update(norms)
+
+    def _deviation(self, name, value):
+        mean, sd = self.norms[name]
+        return (value - mean) / sd
+
+    def estimate(self, metrics):
+        """
+        Estimates the indices from a HRVAnalyzer.time_domain() result.
+        Returns (sns, pns) rounded to two decimals.
+        """
+        mean_rr = metrics['mean_ppi']
+        sd1 = 100 * metrics['sd1'] / mean_rr
+        sd2 = 100 * metrics['sd2'] / mean_rr
+        pns = (self._deviation('mean_rr', mean_rr)
+               + self._deviation('rmssd', metrics['rmssd'])
+               + self._deviation('sd1', sd1)) / 3
+        sns = (self._deviation('mean_hr', metrics['mean_hr'])
+               + self._deviation('stress_index', metrics['stress_index'] ** 0.5)
+               - self._deviation('sd2', sd2)) / 3
+        return round(sns, 2), round(pns, 2)
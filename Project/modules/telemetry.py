@@ -0,0 +1,100 @@
+import struct
+import time
+
+# Payload layout, all fields little-endian:
+#   version (B), flags (B), sequence (H), timestamp (I), bpm (B), count (B),
+#   followed by count beat intervals in ms (H).
+VERSION = 1
+HEADER = "<BBHIBB"
+HEADER_SIZE = struct.calcsize(HEADER)
+FLAG_END = 0x01  # last batch of a measurement
+
+
+class Telemetry:
+    """Streams beat intervals and BPM over MQTT in compact binary batches.
+
+    Intervals are packed into a preallocated buffer and published once batch
+    beats have been collected, so the radio sends one short message every few
+    seconds instead of one per beat. Messages go to the topic
+    <prefix>/<device_id>/ppi. The sequence number increases with every batch,
+    so the receiver can tell when batches were lost. Batches that can't be
+    published are dropped: live data is of no use later.
+    """
+    def __init__(self, connection, device_id, batch=8, qos=0, prefix="group4"):
+        """Parameters
+
+        connection (ConnectionManager): Open MQTT session used for publishing
+        device_id (str): Identifies the device in the topic
+        batch (int): Number of beats per message, at most 255
+        qos (int): MQTT QoS level of the messages, 0 or 1
+        prefix (str): First level of the topic
+        """
+        if not 0 < batch < 256:
+            raise ValueError("batch must be between 1 and 255")
+        self.connection = connection
+        self.topic = "{}/{}/ppi".format(prefix, device_id)
+        self.batch = batch
+        self.qos = qos
+        self.buffer = bytearray(HEADER_SIZE + 2 * batch)
+        self.count = 0
+        self.bpm = 0
+        self.timestamp = 0
+        self.sequence = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def add(self, interval, bpm=0):
+        """Adds a beat interval in ms and the current BPM, 0 if not known yet. Publishes full batches."""
+        if self.count == 0:
+            self.timestamp = int(time.time())
+        struct.pack_into("<H", self.buffer, HEADER_SIZE + 2 * self.count, interval)
+        self.count += 1
+        self.bpm = int(bpm)
+        if self.count >= self.batch:
+            self.flush()
+
+    def end(self):
+        """Publishes the beats left over at the end of a measurement and marks the batch as the last one."""
+        self.flush(FLAG_END)
+
+    def flush(self, flags=0):
+        """Publishes the collected beats. Returns True if the batch was sent."""
+        count = self.count
+        if count == 0 and not flags:
+            return False
+        bpm = self.bpm if 0 <= self.bpm < 256 else 255
+        struct.pack_into(HEADER, self.buffer, 0, VERSION, flags, self.sequence,
+                         self.timestamp, bpm, count)
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        self.count = 0
+        try:
+            self.connection.publish(self.topic, memoryview(self.buffer)[:HEADER_SIZE + 2 * count], qos=self.qos)
+        except OSError:
+            self.dropped += 1
+            return False
+        self.sent += 1
+        return True
+
+
+def decode(payload):
+    """
+    Decodes a telemetry message into a dict with the keys version, flags,
+    sequence, timestamp, bpm and intervals. Raises ValueError if the payload
+    is too short or has an unknown version.
+    """
+    if len(payload) < HEADER_SIZE:
+        raise ValueError("Payload too short")
+    version, flags, sequence, timestamp, bpm, count = struct.unpack_from(HEADER, payload, 0)
+    if version != VERSION:
+        raise ValueError("Unknown telemetry version {}".format(version))
+    if len(payload) < HEADER_SIZE + 2 * count:
+        raise ValueError("Payload too short")
+    intervals = list(struct.unpack_from("<{}H".format(count), payload, HEADER_SIZE))
+    return {
+        "version": version,
+        "flags": flags,
+        "sequence": sequence,
+        "timestamp": timestamp,
+        "bpm": bpm,
+        "intervals": intervals,
+    }
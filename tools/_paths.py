@@ -0,0 +1,11 @@
+"""Makes the firmware sources importable from the host-side tools."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT = os.path.join(ROOT, 'Project')
+LIB = os.path.join(PROJECT, 'lib')
+
+for path in (PROJECT, LIB):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,206 @@
+"""Measures the fixed-point BandPassFilter and its effect on beat detection on the host.
+
+Usage: python tools/bench_bandpass.py [capture_250Hz_01.txt ...] [--rate 250]
+                                      [--low 0.5] [--high 5] [--notch 50]
+
+For every input the filter output is compared with a floating point
+reference of the same cascade, the throughput of process() and
+process_block() is measured, and the beats found by PeakDetector with
+and without the filter are compared. Synthetic signals come with their
+true beat times, so sensitivity, false beats and the interval error are
+reported for them. Captures have no reference beats, for them the share
+of intervals within 20 % of the median of their neighbours is reported.
+"""
+import argparse
+import array
+import math
+import time
+
+import _paths  # noqa: F401
+from modules.bandpass import BandPassFilter, biquad
+from modules.peak_detector import PeakDetector
+from bench_peak_detector import load_capture
+import synth
+
+BLOCK_SIZE = 32
+TOLERANCE_S = 0.15
+
+
+def reference(samples, sections, offset=32768):
+    """Filters samples with the floating point cascade, primed like BandPassFilter."""
+    state = []
+    value = samples[0] - offset
+    for b0, b1, b2, a1, a2 in sections:
+        gain = (b0 + b1 + b2) / (1 + a1 + a2)
+        state.append([value, value, value * gain, value * gain])
+        value *= gain
+    out = []
+    for x in samples:
+        value = x - offset
+        for s, (b0, b1, b2, a1, a2) in zip(state, sections):
+            y = b0 * value + b1 * s[0] + b2 * s[1] - a1 * s[2] - a2 * s[3]
+            s[1] = s[0]
+            s[0] = value
+            s[3] = s[2]
+            s[2] = y
+            value = y
+        out.append(value + offset)
+    return out
+
+
+def new_filter(samplerate, args):
+    return BandPassFilter(samplerate, args.low, args.high, args.notch)
+
+
+def filter_accuracy(samples, samplerate, args):
+    """Returns (RMS error, max error, output RMS) of the fixed-point filter against the reference."""
+    sections = [biquad('highpass', args.low, samplerate), biquad('lowpass', args.high, samplerate)]
+    if args.notch:
+        sections.append(biquad('notch', args.notch, samplerate, 5))
+    ref = reference(samples, sections)
+    bandpass = new_filter(samplerate, args)
+    out = array.array('H', samples)
+    for pos in range(0, len(out), BLOCK_SIZE):
+        block = out[pos:pos + BLOCK_SIZE]
+        bandpass.process_block(block)
+        out[pos:pos + len(block)] = block
+    skip = samplerate * 4  # start-up of the reference
+    errors = [out[i] - ref[i] for i in range(skip, len(out))]
+    rms = math.sqrt(sum(e * e for e in errors) / len(errors))
+    signal = math.sqrt(sum((r - 32768) ** 2 for r in ref[skip:]) / len(errors))
+    return rms, max(abs(e) for e in errors), signal
+
+
+def throughput(samples, samplerate, args):
+    """Returns samples per second of process(), process_block() and of the detector without and with the filter."""
+    bandpass = new_filter(samplerate, args)
+    start = time.perf_counter()
+    for x in samples:
+        bandpass.process(x)
+    sample_s = time.perf_counter() - start
+
+    block = array.array('H', [0] * BLOCK_SIZE)
+    results = [len(samples) / sample_s]
+    for prefilter in (True, None, bandpass):
+        detector = None if prefilter is True else PeakDetector(samplerate, prefilter=prefilter)
+        found = array.array('H', [0] * 8)
+        bandpass.reset()
+        start = time.perf_counter()
+        for pos in range(0, len(samples), BLOCK_SIZE):
+            n = min(BLOCK_SIZE, len(samples) - pos)
+            block[:n] = samples[pos:pos + n]
+            if detector is None:
+                bandpass.process_block(block, None, n)
+            else:
+                detector.feed_block(block, found, n)
+        results.append(len(samples) / (time.perf_counter() - start))
+    return results
+
+
+def detect(samples, samplerate, prefilter=None):
+    """Returns the times in seconds of the peaks that PeakDetector reported beats for."""
+    detector = PeakDetector(samplerate, prefilter=prefilter)
+    peaks = []
+    for x in samples:
+        interval_ms = detector.feed(x)
+        if interval_ms:
+            if not peaks:
+                peaks.append(detector.previous_index / samplerate - interval_ms / 1000)
+            peaks.append(detector.previous_index / samplerate)
+    return peaks
+
+
+def true_peaks(beats, bpm):
+    """Returns the peak times of a synth.ppg() signal from its beat intervals."""
+    t = 60 / bpm
+    times = [0, t]
+    for interval_ms in beats:
+        t += interval_ms / 1000
+        times.append(t)
+    return [t + synth.PEAK_DELAY for t in times]
+
+
+def match(peaks, truth):
+    """
+    Pairs detected and true peaks within TOLERANCE_S after removing the median
+    delay. Returns (matched, false, delay, interval MAE in ms).
+    """
+    if not peaks:
+        return 0, 0, 0, 0
+    nearest = []
+    j = 0
+    for t in peaks:
+        while j + 1 < len(truth) and abs(truth[j + 1] - t) < abs(truth[j] - t):
+            j += 1
+        nearest.append(t - truth[j])
+    delay = sorted(nearest)[len(nearest) // 2]
+    pairs = {}
+    j = 0
+    for t in peaks:
+        t -= delay
+        while j + 1 < len(truth) and abs(truth[j + 1] - t) < abs(truth[j] - t):
+            j += 1
+        if abs(truth[j] - t) <= TOLERANCE_S and j not in pairs:
+            pairs[j] = t
+    errors = [abs((pairs[j + 1] - pairs[j]) - (truth[j + 1] - truth[j])) * 1000 for j in pairs if j + 1 in pairs]
+    mae = sum(errors) / len(errors) if errors else 0
+    return len(pairs), len(peaks) - len(pairs), delay, mae
+
+
+def plausible(peaks):
+    """Returns the share of intervals within 20 % of the median of the surrounding intervals."""
+    intervals = [b - a for a, b in zip(peaks, peaks[1:])]
+    good = 0
+    for i, interval in enumerate(intervals):
+        around = sorted(intervals[max(0, i - 4):i + 5])
+        median = around[len(around) // 2]
+        if abs(interval - median) <= 0.2 * median:
+            good += 1
+    return good / len(intervals) if intervals else 0
+
+
+def report(name, samples, samplerate, args, truth=None):
+    print(f'{name}: {len(samples)} samples')
+    rms, worst, signal = filter_accuracy(samples, samplerate, args)
+    print(f'  fixed point vs float: RMS error {rms:.1f}, max {worst:.0f} (output RMS {signal:.0f})')
+    sample_rate, block_rate, raw_rate, filtered_rate = throughput(samples, samplerate, args)
+    print(f'  process(): {sample_rate:.0f} samples/s, process_block(): {block_rate:.0f} samples/s')
+    print(f'  detector feed_block(): {raw_rate:.0f} samples/s raw, {filtered_rate:.0f} samples/s with the filter')
+    for label, prefilter in (('raw', None), ('filtered', new_filter(samplerate, args))):
+        peaks = detect(samples, samplerate, prefilter)
+        if truth is None:
+            print(f'  {label:8}: {len(peaks)} beats, {plausible(peaks) * 100:.1f} % plausible intervals')
+        else:
+            matched, false, delay, mae = match(peaks, truth)
+            print(f'  {label:8}: {matched}/{len(truth)} beats found, {false} false, '
+                  f'delay {delay * 1000:.0f} ms, interval error {mae:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='capture files (text or .bin)')
+    parser.add_argument('--rate', type=int, default=250, help='sample rate of text captures in Hz')
+    parser.add_argument('--low', type=float, default=0.5, help='high-pass corner frequency in Hz')
+    parser.add_argument('--high', type=float, default=5, help='low-pass corner frequency in Hz')
+    parser.add_argument('--notch', type=float, help='notch frequency in Hz, e.g. 50')
+    parser.add_argument('--seconds', type=float, default=120, help='length of the synthetic signals')
+    args = parser.parse_args()
+
+    if args.files:
+        for name in args.files:
+            rate = args.rate
+            if name.endswith('.bin'):
+                from filefifo import BinFilefifo
+                rate = BinFilefifo(10, name=name).rate
+            report(name, load_capture(name), rate, args)
+        return
+    for label, options in (('synthetic', {}),
+                           ('synthetic, strong wander', {'wander': 6000}),
+                           ('synthetic, noisy', {'noise': 2500}),
+                           ('synthetic, 120 bpm', {'bpm': 120})):
+        samples, beats = synth.ppg(args.seconds, args.rate, **options)
+        report(label, samples, args.rate, args, true_peaks(beats, options.get('bpm', 70)))
+
+
+if __name__ == '__main__':
+    main()
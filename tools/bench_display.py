@@ -0,0 +1,86 @@
+"""Measures the I2C traffic and frame time of the DisplayManager screens on the host.
+
+Usage: python tools/bench_display.py
+
+The display is driven through the stand-ins in tools/sim. For every
+screen the bytes and transactions sent per frame are counted, and the
+frame time is the host CPU time plus the time the traffic would take on
+a 400 kHz bus. A full-frame oled.show() is listed for comparison.
+"""
+import os
+import tempfile
+import time
+
+import _paths  # noqa: F401
+import sim
+import synth
+
+sim.install()
+
+from modules.display_manager import DisplayManager  # noqa: E402
+from modules.history import HistoryStore  # noqa: E402
+
+MENU = ["MEASURE HR", "HRV ANALYSIS", "KUBIOS", "HISTORY"]
+
+
+def measure(display, name, frame, frames=50):
+    """Runs frame() frames times and returns a dict of per-frame averages."""
+    i2c = display.oled.i2c
+    i2c.reset_counters()
+    start = time.perf_counter()
+    for n in range(frames):
+        frame(n)
+    cpu = (time.perf_counter() - start) / frames
+    bus = i2c.bus_time() / frames
+    return {
+        'screen': name,
+        'bytes': i2c.bytes / frames,
+        'transactions': i2c.transactions / frames,
+        'cpu_ms': cpu * 1000,
+        'bus_ms': bus * 1000,
+        'frame_ms': (cpu + bus) * 1000,
+    }
+
+
+def run(frames=50):
+    """Returns a list of per-screen results."""
+    display = DisplayManager()
+    results = []
+
+    results.append(measure(display, 'full show()', lambda n: display.oled.show(), frames))
+
+    display.display_menu(MENU, 0)
+    results.append(measure(display, 'menu step', lambda n: display.display_menu(MENU, n % len(MENU)), frames))
+
+    def message(n):
+        display.show_message(["Collecting data...", f"Beats: {n}", f"HR: {60 + n % 3} bpm", "RMSSD: 41 ms"])
+    display.show_message(["Collecting data..."])
+    results.append(measure(display, 'message switch', lambda n: display.show_message(["Collecting data..."]) if n % 2 else message(n), frames))
+    message(0)
+    results.append(measure(display, 'message update', message, frames))
+
+    with tempfile.TemporaryDirectory() as directory:
+        history = HistoryStore(os.path.join(directory, 'history.bin'), capacity=20)
+        for n in range(20):
+            history.append(800 + n, 75, 40 + n, 30 + n)
+        display.display_history(history)
+        results.append(measure(display, 'history step', lambda n: display.scroll_history(1 if n % 20 < 10 else -1), frames))
+
+    display.start_waveform(10, 53, header="BPM: --", footer="Timer: 0s", step=10)
+    samples, _ = synth.ppg(frames * 10 / 250)
+
+    def envelope(n):
+        display.feed_waveform(samples[n * 10:n * 10 + 10])
+        display.show()
+    results.append(measure(display, 'envelope column', envelope, frames))
+    return results
+
+
+def main():
+    for result in run():
+        print(f"{result['screen']:16} {result['bytes']:7.0f} B {result['transactions']:5.1f} tx "
+              f"cpu {result['cpu_ms']:6.2f} ms bus {result['bus_ms']:6.2f} ms frame {result['frame_ms']:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Compares per-item and block access to lib/fifo.Fifo on the host.
+
+Usage: python tools/bench_fifo.py [items]
+
+The producer mimics the sampling ISR putting one value at a time and the
+consumer drains either with empty()/get() like the main.py loops or with
+get_into() into a preallocated array. Producer side put() and put_many()
+are timed separately.
+"""
+import array
+import sys
+import time
+
+import _paths  # noqa: F401
+from fifo import Fifo
+
+
+def per_item(fifo, items, burst):
+    """ISR style put() bursts drained with empty()/get(). Returns seconds spent draining."""
+    total = 0
+    elapsed = 0.0
+    for _ in range(items // burst):
+        for i in range(burst):
+            fifo.put(i)
+        start = time.perf_counter()
+        while not fifo.empty():
+            total += fifo.get()
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def block_consumer(fifo, items, burst, block):
+    """ISR style put() bursts drained with get_into(). Returns seconds spent draining."""
+    buf = array.array('H', [0] * block)
+    total = 0
+    elapsed = 0.0
+    for _ in range(items // burst):
+        for i in range(burst):
+            fifo.put(i)
+        start = time.perf_counter()
+        n = fifo.get_into(buf)
+        while n:
+            for j in range(n):
+                total += buf[j]
+            n = fifo.get_into(buf)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def per_item_producer(fifo, items, burst):
+    """Bursts stored with put() and drained with get_into(). Returns seconds spent storing."""
+    buf = array.array('H', [0] * burst)
+    elapsed = 0.0
+    for _ in range(items // burst):
+        start = time.perf_counter()
+        for i in range(burst):
+            fifo.put(i)
+        elapsed += time.perf_counter() - start
+        fifo.get_into(buf)
+    return elapsed
+
+
+def block_producer(fifo, items, burst):
+    """Bursts stored with put_many() and drained with get_into(). Returns seconds spent storing."""
+    src = array.array('H', range(burst))
+    buf = array.array('H', [0] * burst)
+    elapsed = 0.0
+    for _ in range(items // burst):
+        start = time.perf_counter()
+        fifo.put_many(src)
+        elapsed += time.perf_counter() - start
+        fifo.get_into(buf)
+    return elapsed
+
+
+def run(items=250000, burst=25, block=32, repeat=5):
+    """Runs all patterns with a power-of-two and a non power-of-two fifo.
+
+    Each pattern is run repeat times and the fastest run is kept, the timed
+    sections are short and single runs vary by tens of percent.
+    Returns a dict of items per second.
+    """
+    result = {}
+    for size in (64, 50):
+        result[f'get_{size}'] = items / min(per_item(Fifo(size), items, burst) for _ in range(repeat))
+        result[f'get_into_{size}'] = items / min(block_consumer(Fifo(size), items, burst, block)
+                                                 for _ in range(repeat))
+        result[f'put_{size}'] = items / min(per_item_producer(Fifo(size), items, burst) for _ in range(repeat))
+        result[f'put_many_{size}'] = items / min(block_producer(Fifo(size), items, burst) for _ in range(repeat))
+    return result
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 250000
+    result = run(items)
+    for key, value in result.items():
+        print(f'{key}: {value:.0f} items/s')
+    for size in (64, 50):
+        print(f'get_into speedup (size {size}): {result[f"get_into_{size}"] / result[f"get_{size}"]:.2f}x')
+        print(f'put_many speedup (size {size}): {result[f"put_many_{size}"] / result[f"put_{size}"]:.2f}x')
+    for name in ('get_into', 'put_many'):
+        print(f'{name} mask vs wrap (size 64 vs 50): {result[f"{name}_64"] / result[f"{name}_50"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Times HRVSpectrum on the host and compares it against a NumPy reference.
+
+Usage: python tools/bench_hrv_spectrum.py [seconds]
+
+A synthetic PPI series with 0.1 Hz (LF) and 0.25 Hz (HF) oscillations of
+the given length (default 300 s) is analysed. The reference uses the same
+resampling, window and Welch averaging built from numpy.interp and
+numpy.fft.rfft. Without NumPy only the timing is reported.
+
+Because the reference follows the same estimator, the scaling is also
+checked against a known spectrum: evenly sampled sine waves of amplitude
+A, whose band power is A**2 / 2, at lengths below and above one segment.
+"""
+import array
+import math
+import sys
+import time
+
+import _paths  # noqa: F401
+from modules.hrv_spectrum import HRVSpectrum
+
+
+def synthetic_ppi(seconds, mean=900, lf=40, hf=20):
+    """Returns an array('H') of intervals modulated at 0.1 Hz and 0.25 Hz."""
+    data = array.array('H')
+    t = 0
+    while t < seconds * 1000:
+        ppi = mean + lf * math.sin(2 * math.pi * 0.1 * t / 1000) + hf * math.sin(2 * math.pi * 0.25 * t / 1000)
+        data.append(int(ppi))
+        t += ppi
+    return data
+
+
+def numpy_reference(data, size=256, rate=4):
+    """Band powers computed with NumPy using the HRVSpectrum conventions."""
+    import numpy as np
+    ppi = np.asarray(data, dtype=float)
+    beat_times = np.concatenate(([0.0], np.cumsum(ppi[1:])))
+    grid = np.arange(0, beat_times[-1] + 1e-9, 1000 / rate)
+    series = np.interp(grid, beat_times, ppi)
+    series -= series.mean()
+    window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(size) / size)
+    half = size // 2
+    psd = np.zeros(half + 1)
+    if len(series) < size:
+        # Short series: one Hann window spanning the data, zero-padded to size
+        window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(len(series)) / len(series))
+        psd += np.abs(np.fft.rfft(series * window, size)) ** 2
+        psd /= rate * np.sum(window ** 2)
+    else:
+        segments = 0
+        start = 0
+        while start + size <= len(series):
+            psd += np.abs(np.fft.rfft(series[start:start + size] * window)) ** 2
+            segments += 1
+            start += half
+        psd /= rate * np.sum(window ** 2) * segments
+    psd[1:-1] *= 2
+    freqs = np.arange(half + 1) * rate / size
+    df = rate / size
+    result = {}
+    for name, (low, high) in (('vlf', HRVSpectrum.VLF_BAND), ('lf', HRVSpectrum.LF_BAND), ('hf', HRVSpectrum.HF_BAND)):
+        result[name] = float(psd[(freqs >= low) & (freqs < high)].sum() * df)
+    result['lf_hf'] = result['lf'] / result['hf'] if result['hf'] else 0.0
+    return result
+
+
+def analytic_check(lf=40, hf=20):
+    """Prints LF and HF power of evenly sampled 0.1 Hz and 0.25 Hz sine waves against A**2 / 2."""
+    spectrum = HRVSpectrum()
+    print(f'known spectrum: LF {lf * lf / 2:.0f} ms2, HF {hf * hf / 2:.0f} ms2')
+    for seconds in (30, 45, 60, 120, 300):
+        spectrum.length = seconds * spectrum.rate
+        for i in range(spectrum.length):
+            t = i / spectrum.rate
+            spectrum.series[i] = 900 + lf * math.sin(2 * math.pi * 0.1 * t) + hf * math.sin(2 * math.pi * 0.25 * t)
+        spectrum.welch()
+        print(f'  {seconds:>3} s: LF {spectrum.band_power(HRVSpectrum.LF_BAND):.0f} ms2, '
+              f'HF {spectrum.band_power(HRVSpectrum.HF_BAND):.0f} ms2')
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    data = synthetic_ppi(seconds)
+    spectrum = HRVSpectrum()
+    rounds = 10
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = spectrum.analyze(data)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f'intervals: {len(data)}, resampled: {spectrum.length}')
+    print(f'HRVSpectrum: {elapsed * 1000:.1f} ms per analysis')
+    print('HRVSpectrum result:', result)
+    analytic_check()
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print('NumPy not installed, reference comparison skipped')
+        return
+    start = time.perf_counter()
+    for _ in range(rounds):
+        reference = numpy_reference(data)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f'NumPy reference: {elapsed * 1000:.1f} ms per analysis')
+    print('NumPy result:', {key: round(value, 2) for key, value in reference.items()})
+    for key in ('vlf', 'lf', 'hf'):
+        # Relative errors of near-zero bands only reflect rounding
+        if reference[key] >= 1:
+            print(f'{key} relative error: {abs(result[key] - reference[key]) / reference[key]:.2%}')
+
+
+if __name__ == '__main__':
+    main()
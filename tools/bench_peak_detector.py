@@ -0,0 +1,72 @@
+"""Measures PeakDetector throughput on the host.
+
+Usage: python tools/bench_peak_detector.py [capture_250Hz_01.txt | capture_250Hz_01.bin]
+
+Without a capture file a synthetic 10 minute signal is used.
+"""
+import array
+import sys
+import time
+
+import _paths  # noqa: F401
+from filefifo import BinFilefifo, Filefifo
+from modules.peak_detector import PeakDetector
+import synth
+
+
+def load_capture(name):
+    """Reads a whole text or binary capture into an array('H')."""
+    if name.endswith('.bin'):
+        data = BinFilefifo(10, name=name, repeat=False)
+        return data.read_block(data.length)
+    data = Filefifo(10, name=name, repeat=False)
+    samples = array.array('H')
+    try:
+        while True:
+            samples.append(data.get())
+    except RuntimeError:
+        pass
+    return samples
+
+
+def run(samples, samplerate=250):
+    """Runs feed() and feed_block() over samples. Returns a dict of results."""
+    detector = PeakDetector(samplerate)
+    start = time.perf_counter()
+    beats = 0
+    for x in samples:
+        if detector.feed(x):
+            beats += 1
+    feed_s = time.perf_counter() - start
+
+    detector = PeakDetector(samplerate)
+    intervals = array.array('H', [0] * 16)
+    # Blocks are cut before timing so that only feed_block() is measured
+    blocks = [array.array('H', samples[pos:pos + 64]) for pos in range(0, len(samples), 64)]
+    start = time.perf_counter()
+    block_beats = 0
+    for block in blocks:
+        block_beats += detector.feed_block(block, intervals)
+    block_s = time.perf_counter() - start
+
+    return {
+        'samples': len(samples),
+        'beats': beats,
+        'feed_samples_per_s': len(samples) / feed_s,
+        'block_beats': block_beats,
+        'block_samples_per_s': len(samples) / block_s,
+    }
+
+
+def main():
+    if len(sys.argv) > 1:
+        samples = load_capture(sys.argv[1])
+    else:
+        samples, _ = synth.ppg(600)
+    result = run(samples)
+    for key, value in result.items():
+        print(f'{key}: {value:.0f}' if isinstance(value, float) else f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""Measures every stage of the signal pipeline against the real-time budget.
+
+Usage: python tools/bench_suite.py [capture_250Hz_01.txt ...] [--seconds 120]
+                                   [--slowdown 1] [--json results.json]
+                                   [--compare old.json]
+
+Each capture file (text or binary) is one input, without files a
+synthetic signal is used. For every stage the host time per sample, the
+throughput and the memory allocated while the stage runs are reported.
+Work that happens once per beat, frame or measurement is spread over the
+samples it belongs to, so the stages add up to the time one sample costs
+in main.py. Headroom is the part of the 1 / samplerate budget that is
+left. The host is much faster than the RP2040, --slowdown multiplies the
+CPU times to estimate device timing; I2C bus time is not scaled.
+"""
+import argparse
+import array
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import _paths  # noqa: F401
+import sim
+
+sim.install()
+
+from fifo import Fifo  # noqa: E402
+from filefifo import BinFilefifo, Filefifo, write_capture  # noqa: E402
+from modules.bandpass import BandPassFilter  # noqa: E402
+from modules.display_manager import DisplayManager  # noqa: E402
+from modules.hrv_analyzer import HRVStream  # noqa: E402
+from modules.hrv_spectrum import HRVSpectrum  # noqa: E402
+from modules.peak_detector import PeakDetector  # noqa: E402
+import synth  # noqa: E402
+
+RESULT_VERSION = 1
+BLOCK_SIZE = 32
+
+
+def stage_fifo(samples, samplerate, options):
+    """Sampling timer put() per sample and consumer get_into() per block."""
+    fifo = Fifo(256)
+    block = array.array('H', [0] * BLOCK_SIZE)
+    count = len(samples)
+
+    def run():
+        put = fifo.put
+        for pos in range(0, count, BLOCK_SIZE):
+            end = min(pos + BLOCK_SIZE, count)
+            for i in range(pos, end):
+                put(samples[i])
+            fifo.get_into(block)
+    return run
+
+
+def stage_detector_feed(samples, samplerate, options):
+    """PeakDetector.feed() per sample, for comparison with feed_block()."""
+    detector = PeakDetector(samplerate)
+
+    def run():
+        detector.reset()
+        feed = detector.feed
+        for x in samples:
+            feed(x)
+    return run
+
+
+def stage_detector_block(samples, samplerate, options):
+    """PeakDetector.feed_block() per block as in acquisition_task and PPICollector."""
+    detector = PeakDetector(samplerate)
+    block = array.array('H', [0] * BLOCK_SIZE)
+    found = array.array('H', [0] * 8)
+    count = len(samples)
+
+    def run():
+        detector.reset()
+        for pos in range(0, count, BLOCK_SIZE):
+            n = min(BLOCK_SIZE, count - pos)
+            block[:n] = samples[pos:pos + n]
+            detector.feed_block(block, found, n)
+    return run
+
+
+def stage_bandpass(samples, samplerate, options):
+    """BandPassFilter.process_block() per block in front of the detector as in main.py."""
+    bandpass = BandPassFilter(samplerate)
+    block = array.array('H', [0] * BLOCK_SIZE)
+    count = len(samples)
+
+    def run():
+        bandpass.reset()
+        for pos in range(0, count, BLOCK_SIZE):
+            n = min(BLOCK_SIZE, count - pos)
+            block[:n] = samples[pos:pos + n]
+            bandpass.process_block(block, None, n)
+    return run
+
+
+def stage_hrv_stream(samples, samplerate, options):
+    """HRVStream.add() and the live readouts once per beat, HRVStream.time_domain() once per measurement."""
+    intervals = options['intervals']
+    beats_per_measurement = options['measurement_beats']
+    stream = HRVStream()
+
+    def run():
+        for start in range(0, len(intervals) - beats_per_measurement + 1, beats_per_measurement):
+            stream.reset()
+            for i in range(start, start + beats_per_measurement):
+                stream.add(intervals[i])
+                # main.py shows the readouts from the third beat on
+                if stream.count >= 3:
+                    stream.mean_hr()
+                    stream.rmssd()
+            # The result screen takes the extended metrics from the running sums
+            stream.time_domain()
+    return run
+
+
+def stage_hrv_analysis(samples, samplerate, options):
+    """HRVSpectrum.analyze() once per measurement."""
+    intervals = options['intervals']
+    beats_per_measurement = options['measurement_beats']
+    spectrum = HRVSpectrum()
+
+    def run():
+        for start in range(0, len(intervals) - beats_per_measurement + 1, beats_per_measurement):
+            spectrum.analyze(intervals[start:start + beats_per_measurement])
+    return run
+
+
+def stage_display(samples, samplerate, options):
+    """Envelope waveform columns of samplerate / 25 samples and a frame at the display rate."""
+    display = options['display']
+    i2c = display.oled.i2c
+    count = len(samples)
+    frame_every = samplerate // options['fps']
+    # Samples arrive in blocks no longer than a frame so every frame has new columns
+    chunk = min(BLOCK_SIZE, frame_every)
+    block = array.array('H', [0] * chunk)
+
+    def run():
+        display.start_waveform(10, 53, header="BPM: --", footer="Timer: 0s", step=samplerate // 25)
+        i2c.reset_counters()
+        for pos in range(0, count, chunk):
+            n = min(chunk, count - pos)
+            block[:n] = samples[pos:pos + n]
+            display.feed_waveform(block, n)
+            if (pos + n) // samplerate != pos // samplerate:
+                display.set_footer(f'Timer: {(pos + n) // samplerate}s')
+            if (pos + n) // frame_every != pos // frame_every:
+                display.show()
+    return run
+
+
+def stage_filefifo(samples, samplerate, options):
+    """Filefifo.get() per sample from a text capture."""
+    name = options['text_capture']
+
+    def run():
+        data = Filefifo(10, name=name, repeat=False)
+        get = data.get
+        for _ in range(len(samples)):
+            get()
+    return run
+
+
+def stage_binfilefifo(samples, samplerate, options):
+    """BinFilefifo.readinto() per block from a binary capture."""
+    name = options['bin_capture']
+    block = array.array('H', [0] * BLOCK_SIZE)
+
+    def run():
+        data = BinFilefifo(10, name=name, repeat=False)
+        while data.readinto(block, BLOCK_SIZE) == BLOCK_SIZE:
+            pass
+        data.close()
+    return run
+
+
+# (name, stage factory, part of the per-sample cost on the device)
+STAGES = (
+    ('fifo', stage_fifo, True),
+    ('detector_feed', stage_detector_feed, False),
+    ('detector_block', stage_detector_block, True),
+    ('bandpass', stage_bandpass, True),
+    ('hrv_stream', stage_hrv_stream, True),
+    ('hrv_analysis', stage_hrv_analysis, True),
+    ('display', stage_display, True),
+    ('filefifo', stage_filefifo, False),
+    ('binfilefifo', stage_binfilefifo, False),
+)
+
+
+def measure(run, repeat):
+    """Returns (best time in seconds, allocated peak bytes, retained bytes) of run()."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    run()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak - before, after - before
+
+
+def bench_input(name, samples, samplerate, args):
+    """Runs all stages over one input. Returns a dict of results."""
+    detector = PeakDetector(samplerate)
+    intervals = array.array('H')
+    for x in samples:
+        interval = detector.feed(x)
+        if interval:
+            intervals.append(interval)
+    beats = len(intervals)
+    measurement_beats = max(3, min(beats, int(args.measurement * samplerate * beats / len(samples))))
+
+    tmp = tempfile.mkdtemp()
+    text_capture = os.path.join(tmp, 'capture.txt')
+    bin_capture = os.path.join(tmp, 'capture.bin')
+    with open(text_capture, 'w') as f:
+        for x in samples:
+            f.write(f'{x}\n')
+    write_capture(bin_capture, samples, samplerate)
+
+    options = {
+        'intervals': intervals,
+        'measurement_beats': measurement_beats,
+        'display': DisplayManager(),
+        'fps': args.fps,
+        'text_capture': text_capture,
+        'bin_capture': bin_capture,
+    }
+    count = len(samples)
+    budget_us = 1000000 / samplerate
+    stages = {}
+    total_us = 0.0
+    for stage, factory, in_budget in STAGES:
+        run = factory(samples, samplerate, options)
+        elapsed, peak, retained = measure(run, args.repeat)
+        cpu_us = elapsed * 1000000 / count * args.slowdown
+        bus_us = 0.0
+        if stage == 'display':
+            # Counters were reset at the start of the last run
+            bus_us = options['display'].oled.i2c.bus_time() * 1000000 / count
+        us_per_sample = cpu_us + bus_us
+        stages[stage] = {
+            'in_budget': in_budget,
+            'us_per_sample': us_per_sample,
+            'cpu_us_per_sample': cpu_us,
+            'bus_us_per_sample': bus_us,
+            'samples_per_s': 1000000 / us_per_sample if us_per_sample else 0.0,
+            'alloc_peak_bytes': peak,
+            'alloc_retained_bytes': retained,
+        }
+        if in_budget:
+            total_us += us_per_sample
+    for path in (text_capture, bin_capture):
+        os.remove(path)
+    os.rmdir(tmp)
+
+    return {
+        'input': name,
+        'samplerate': samplerate,
+        'samples': count,
+        'beats': beats,
+        'stages': stages,
+        'total_us_per_sample': total_us,
+        'budget_us_per_sample': budget_us,
+        'headroom_pct': 100 * (budget_us - total_us) / budget_us,
+    }
+
+
+def load_inputs(args):
+    """Returns a list of (name, samples, samplerate)."""
+    from bench_peak_detector import load_capture
+    inputs = []
+    for name in args.captures:
+        rate = args.rate
+        if name.endswith('.bin'):
+            rate = BinFilefifo(10, name=name).rate
+        inputs.append((os.path.basename(name), load_capture(name), rate))
+    if not inputs:
+        samples, _ = synth.ppg(args.seconds, args.rate, bpm=args.bpm)
+        inputs.append((f'synthetic {args.bpm:g} bpm', samples, args.rate))
+    return inputs
+
+
+def print_run(result):
+    print(f"{result['input']}: {result['samples']} samples at {result['samplerate']} Hz, {result['beats']} beats")
+    for stage, values in result['stages'].items():
+        mark = '' if values['in_budget'] else ' (not in budget)'
+        if values['bus_us_per_sample']:
+            mark += f" (I2C {values['bus_us_per_sample']:.2f} us)"
+        print(f"  {stage:15} {values['us_per_sample']:8.2f} us/sample {values['samples_per_s']:11.0f} samples/s "
+              f"alloc peak {values['alloc_peak_bytes']:7d} B retained {values['alloc_retained_bytes']:6d} B{mark}")
+    print(f"  total {result['total_us_per_sample']:.2f} us of {result['budget_us_per_sample']:.0f} us per sample, "
+          f"headroom {result['headroom_pct']:.1f} %")
+
+
+def compare(results, name):
+    """Prints the change of every stage against an earlier JSON result file."""
+    with open(name) as f:
+        old = json.load(f)
+    old_runs = {run['input']: run for run in old['runs']}
+    for run in results['runs']:
+        previous = old_runs.get(run['input'])
+        if previous is None:
+            continue
+        print(f"{run['input']} compared to {name}:")
+        for stage, values in run['stages'].items():
+            before = previous['stages'].get(stage)
+            if before and before['us_per_sample']:
+                ratio = values['us_per_sample'] / before['us_per_sample']
+                print(f"  {stage:15} {before['us_per_sample']:8.2f} -> {values['us_per_sample']:8.2f} us/sample ({ratio:.2f}x)")
+        print(f"  headroom {previous['headroom_pct']:.1f} % -> {run['headroom_pct']:.1f} %")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('captures', nargs='*', help='capture files (text or .bin)')
+    parser.add_argument('--rate', type=int, default=250, help='sample rate of text captures and the synthetic signal')
+    parser.add_argument('--bpm', type=float, default=70, help='heart rate of the synthetic signal')
+    parser.add_argument('--seconds', type=int, default=120, help='length of the synthetic signal')
+    parser.add_argument('--measurement', type=int, default=60, help='seconds of signal per HRV analysis')
+    parser.add_argument('--fps', type=int, default=25, help='display refresh rate')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage, the fastest is reported')
+    parser.add_argument('--slowdown', type=float, default=1.0, help='device to host CPU time ratio')
+    parser.add_argument('--json', help='file to save the results to')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    results = {
+        'version': RESULT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'slowdown': args.slowdown,
+        'runs': [],
+    }
+    for name, samples, samplerate in load_inputs(args):
+        result = bench_input(name, samples, samplerate, args)
+        results['runs'].append(result)
+        print_run(result)
+    if args.compare:
+        compare(results, args.compare)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
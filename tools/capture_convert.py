@@ -0,0 +1,46 @@
+"""Converts text captures (one sample per line) to the binary capture format of lib/filefifo.
+
+Usage: python tools/capture_convert.py [--rate 250] capture_250Hz_01.txt [...]
+
+Each input file is written next to itself with a .bin extension. Read
+the result with filefifo.BinFilefifo.
+"""
+import argparse
+import array
+import os
+
+import _paths  # noqa: F401
+from filefifo import write_capture
+
+
+def read_text_capture(name):
+    """Returns the samples of a text capture as an array('H'). Empty lines are skipped."""
+    samples = array.array('H')
+    with open(name) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                samples.append(int(line))
+    return samples
+
+
+def convert(name, rate):
+    """Converts one text capture and returns the name of the binary file."""
+    samples = read_text_capture(name)
+    target = os.path.splitext(name)[0] + '.bin'
+    write_capture(target, samples, rate)
+    return target, len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=int, default=250, help='sample rate of the captures in Hz')
+    parser.add_argument('files', nargs='+', help='text capture files')
+    args = parser.parse_args()
+    for name in args.files:
+        target, count = convert(name, args.rate)
+        print(f'{name} -> {target} ({count} samples)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Analyses capture files with the NumPy reference toolkit in tools/ppgkit.
+
+Usage: python tools/ppg_analyze.py [capture_250Hz_01.txt ...] [--workers 4]
+                                   [--validate] [--no-prefilter]
+                                   [--synthetic 16] [--json results.json]
+
+Every file is loaded whole, band-passed with an FFT filter, and its beats
+and time-domain HRV are found with array operations. Files are analysed
+in parallel in a process pool. --validate also runs the firmware
+PeakDetector (with the BandPassFilter in front unless --no-prefilter is
+given) over each file and reports how many of the reference beats it
+found. --synthetic writes that many synthetic captures to a temporary
+directory and analyses them. Needs NumPy.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import _paths  # noqa: F401
+
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    sys.exit('ppg_analyze.py needs NumPy: pip install numpy')
+
+from filefifo import write_capture
+import ppgkit
+import synth
+
+
+def synthetic_files(directory, count, seconds, rate):
+    """Writes count synthetic binary captures of varying heart rate and noise. Returns their names."""
+    names = []
+    for i in range(count):
+        samples, _ = synth.ppg(seconds, rate, bpm=55 + 5 * (i % 10), noise=150 + 200 * (i % 4), seed=i + 1)
+        name = os.path.join(directory, f'synthetic_{i + 1:02d}.bin')
+        write_capture(name, samples, rate)
+        names.append(name)
+    return names
+
+
+def summary(result):
+    """Returns the result with the arrays dropped, for printing and JSON."""
+    summary = {key: value for key, value in result.items() if key not in ('peaks', 'ppi')}
+    summary['ppi_count'] = len(result['ppi'])
+    return summary
+
+
+def report(result):
+    """Prints one line per file and one more with the firmware comparison."""
+    hrv = result['hrv']
+    line = f"{os.path.basename(result['file'])}: {result['seconds']:.0f} s, {result['beats']} beats"
+    if hrv:
+        line += f", HR {hrv['mean_hr']:.0f} bpm, SDNN {hrv['sdnn']} ms, RMSSD {hrv['rmssd']} ms"
+    print(line)
+    firmware = result.get('firmware')
+    if firmware:
+        line = (f"  firmware: {firmware['beats']} beats, sensitivity {100 * firmware['sensitivity']:.1f}%,"
+                f" PPV {100 * firmware['ppv']:.1f}%, delay {firmware['delay_ms']:.0f} ms")
+        if hrv and firmware['hrv']:
+            line += (f", SDNN {firmware['hrv']['sdnn'] - hrv['sdnn']:+d} ms,"
+                     f" RMSSD {firmware['hrv']['rmssd'] - hrv['rmssd']:+d} ms")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', help='capture files (text or .bin)')
+    parser.add_argument('--rate', type=int, default=250, help='sample rate of text captures in Hz')
+    parser.add_argument('--low', type=float, default=0.5, help='high-pass corner frequency in Hz')
+    parser.add_argument('--high', type=float, default=5, help='low-pass corner frequency in Hz')
+    parser.add_argument('--notch', type=float, help='notch frequency in Hz, e.g. 50')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default one per CPU)')
+    parser.add_argument('--validate', action='store_true', help='compare the firmware detector with the reference')
+    parser.add_argument('--no-prefilter', action='store_true', help='validate the detector without the band-pass')
+    parser.add_argument('--synthetic', type=int, default=0, help='number of synthetic captures to analyse')
+    parser.add_argument('--seconds', type=float, default=300, help='length of the synthetic captures')
+    parser.add_argument('--json', help='file to save the results to')
+    args = parser.parse_args()
+    if not args.files and not args.synthetic:
+        parser.error('give capture files or --synthetic N')
+
+    options = {'rate': args.rate, 'low': args.low, 'high': args.high, 'notch': args.notch}
+    if args.validate:
+        options['prefilter'] = not args.no_prefilter
+    with tempfile.TemporaryDirectory() as directory:
+        names = args.files + synthetic_files(directory, args.synthetic, args.seconds, args.rate)
+        start = time.perf_counter()
+        results = ppgkit.analyze_files(names, args.workers, args.validate, **options)
+        elapsed = time.perf_counter() - start
+    for result in results:
+        report(result)
+    seconds = sum(result['seconds'] for result in results)
+    print(f'{len(results)} files, {seconds / 60:.1f} min of signal in {elapsed:.2f} s')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([summary(result) for result in results], f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
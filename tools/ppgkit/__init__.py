@@ -0,0 +1,23 @@
+"""Vectorised NumPy reference analysis of PPG capture files.
+
+Whole captures are loaded into NumPy arrays and filtered, detected and
+analysed with array operations instead of one sample at a time:
+
+    from ppgkit import analyze
+    result = analyze('capture_250Hz_01.txt')
+
+analyze_files() runs many captures in a process pool and validate()
+compares the beats found by the firmware PeakDetector with the reference
+beats. The package needs NumPy and the firmware sources on sys.path
+(import _paths first when used outside of tools/).
+"""
+from .capture import load
+from .filters import bandpass, moving_average, moving_rms
+from .peaks import detect_peaks, intervals
+from .hrv import time_domain
+from .corpus import analyze, analyze_files, validate
+
+__all__ = [
+    'load', 'bandpass', 'moving_average', 'moving_rms', 'detect_peaks', 'intervals', 'time_domain',
+    'analyze', 'analyze_files', 'validate',
+]
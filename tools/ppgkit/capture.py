@@ -0,0 +1,24 @@
+"""Loading of text and binary capture files into NumPy arrays."""
+import struct
+
+import numpy as np
+
+from filefifo import CAPTURE_HEADER, CAPTURE_HEADER_SIZE, CAPTURE_MAGIC, CAPTURE_VERSION
+
+
+def load(name, rate=250):
+    """
+    Returns (samples, rate) of a capture file as a float64 array and the
+    sample rate in Hz. Binary captures (.bin) carry their own rate, text
+    captures (one sample per line) use the given rate.
+    """
+    if name.endswith('.bin'):
+        with open(name, 'rb') as f:
+            magic, version, rate, count = struct.unpack(CAPTURE_HEADER, f.read(CAPTURE_HEADER_SIZE))
+            if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+                raise ValueError(f'{name} is not a binary capture')
+            samples = np.fromfile(f, dtype='<u2', count=count)
+    else:
+        with open(name) as f:
+            samples = np.array(f.read().split(), dtype=np.int64)
+    return samples.astype(np.float64), rate
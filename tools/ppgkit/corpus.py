@@ -0,0 +1,106 @@
+"""Analysis of whole capture files, validation of the firmware detector and process pool runs."""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .capture import load
+from .filters import bandpass
+from .hrv import time_domain
+from .peaks import detect_peaks, intervals
+
+
+def analyze(name, rate=250, low=0.5, high=5.0, notch=None):
+    """
+    Band-passes, detects and analyses one capture file. Returns a dict with
+    the file name, sample rate, duration, beat count, the peak indices, the
+    intervals in ms and their time-domain HRV (None with fewer than 3 intervals).
+    """
+    samples, rate = load(name, rate)
+    filtered = bandpass(samples, rate, low, high, notch)
+    peaks = detect_peaks(filtered, rate)
+    ppi = intervals(peaks, rate)
+    return {
+        'file': name,
+        'rate': rate,
+        'seconds': len(samples) / rate,
+        'beats': len(peaks),
+        'peaks': peaks,
+        'ppi': ppi,
+        'hrv': time_domain(ppi) if len(ppi) >= 3 else None,
+    }
+
+
+def firmware_peaks(samples, rate, prefilter=True):
+    """
+    Feeds samples one at a time to the firmware PeakDetector, with the
+    BandPassFilter in front when prefilter is True. Returns the sample
+    indices of the peaks it reported beats for.
+    """
+    from modules.bandpass import BandPassFilter
+    from modules.peak_detector import PeakDetector
+    detector = PeakDetector(rate, prefilter=BandPassFilter(rate) if prefilter else None)
+    peaks = []
+    for x in np.clip(samples, 0, 65535).astype(np.int64).tolist():
+        interval_ms = detector.feed(x)
+        if interval_ms:
+            # Only intervals are reported, the peak that ended one is previous_index
+            if not peaks:
+                peaks.append(detector.previous_index - interval_ms * rate // 1000)
+            peaks.append(detector.previous_index)
+    return np.array(peaks, dtype=np.int64)
+
+
+def match(peaks, reference, rate, tolerance_s=0.15):
+    """
+    Pairs peaks with reference peaks within tolerance_s after removing the
+    median delay between them. Returns (matched, delay in s).
+    """
+    if len(peaks) == 0 or len(reference) == 0:
+        return 0, 0.0
+    times = peaks / rate
+    ref = reference / rate
+
+    def nearest(t):
+        j = np.clip(np.searchsorted(ref, t), 1, len(ref) - 1)
+        j -= (t - ref[j - 1]) < (ref[j] - t)
+        return j
+    delay = float(np.median(times - ref[nearest(times)]))
+    times = times - delay
+    j = nearest(times)
+    close = np.abs(times - ref[j]) <= tolerance_s
+    return len(np.unique(j[close])), delay
+
+
+def validate(name, rate=250, prefilter=True, **options):
+    """
+    Compares the firmware detector with the reference analysis of one
+    capture file. Returns the reference result with a 'firmware' dict of
+    beat count, sensitivity, positive predictive value, delay and HRV.
+    """
+    result = analyze(name, rate, **options)
+    samples, rate = load(name, rate)
+    peaks = firmware_peaks(samples, rate, prefilter)
+    matched, delay = match(peaks, result['peaks'], rate)
+    ppi = intervals(peaks, rate)
+    result['firmware'] = {
+        'beats': len(peaks),
+        'sensitivity': matched / result['beats'] if result['beats'] else 0.0,
+        'ppv': matched / len(peaks) if len(peaks) else 0.0,
+        'delay_ms': delay * 1000,
+        'hrv': time_domain(ppi) if len(ppi) >= 3 else None,
+    }
+    return result
+
+
+def analyze_files(names, workers=None, check=False, **options):
+    """
+    Analyses (or with check=True validates) many capture files in a process
+    pool of workers processes (default one per CPU). Returns the results in
+    the order of names.
+    """
+    task = partial(validate if check else analyze, **options)
+    if workers == 1 or len(names) == 1:
+        return [task(name) for name in names]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(task, names))
@@ -0,0 +1,50 @@
+"""Whole-signal filters built from cumulative sums and the FFT."""
+import numpy as np
+
+
+def moving_average(x, window, centered=True):
+    """
+    Returns the mean of each window of samples in O(n) from a cumulative
+    sum. Centred windows are cut at the ends of the signal, trailing
+    windows (centered=False) cover the window samples up to and including
+    each sample, like the firmware ring.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    index = np.arange(n)
+    if centered:
+        start = np.maximum(index - window // 2, 0)
+        end = np.minimum(index + window - window // 2, n)
+    else:
+        start = np.maximum(index - window + 1, 0)
+        end = index + 1
+    return (csum[end] - csum[start]) / (end - start)
+
+
+def moving_rms(x, window):
+    """Returns the centred moving root mean square of x."""
+    x = np.asarray(x, dtype=np.float64)
+    return np.sqrt(moving_average(x * x, window))
+
+
+def bandpass(x, rate, low=0.5, high=5.0, notch=None, notch_width=1.0, taper=0.25):
+    """
+    Returns x band-passed between low and high Hz by zeroing FFT bins.
+    The edges are tapered over taper Hz with a raised cosine to limit
+    ringing. The result has no phase shift, unlike the firmware biquads.
+    An optional notch removes notch_width Hz around notch Hz.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    spectrum = np.fft.rfft(x - x.mean())
+    freqs = np.fft.rfftfreq(n, 1 / rate)
+    gain = np.ones_like(freqs)
+    if low:
+        gain *= np.clip((freqs - (low - taper / 2)) / taper, 0, 1)
+    if high:
+        gain *= np.clip(((high + taper / 2) - freqs) / taper, 0, 1)
+    gain = 0.5 - 0.5 * np.cos(np.pi * gain)
+    if notch:
+        gain[np.abs(freqs - notch) <= notch_width / 2] = 0
+    return np.fft.irfft(spectrum * gain, n)
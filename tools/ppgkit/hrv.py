@@ -0,0 +1,43 @@
+"""Time-domain HRV of whole interval series."""
+import numpy as np
+
+
+def time_domain(ppi, bin_width=50, bins=40):
+    """
+    Returns the time-domain HRV of the intervals ppi (ms) as a dict with the
+    keys and conventions of HRVAnalyzer.time_domain(): SDNN from the rounded
+    mean PPI, RMSSD over the successive differences and the Baevsky stress
+    index from a bin_width ms histogram.
+    """
+    ppi = np.asarray(ppi, dtype=np.float64)
+    count = len(ppi)
+    if count < 3:
+        raise ValueError('At least 3 intervals are needed')
+    diffs = np.diff(ppi)
+    mean_ppi = int(round(ppi.mean()))
+    sdnn = np.sqrt(np.sum((ppi - mean_ppi) ** 2) / (count - 1))
+    rmssd = np.sqrt(np.mean(diffs ** 2))
+    nn50 = int(np.count_nonzero(np.abs(diffs) > 50))
+    sd1_sq = 0.5 * np.var(diffs, ddof=1)
+    sd2_sq = 2 * np.var(ppi, ddof=1) - sd1_sq
+
+    histogram = np.bincount(np.minimum(ppi.astype(np.int64) // bin_width, bins - 1), minlength=bins)
+    mode_bin = int(np.argmax(histogram))
+    amo = 100 * histogram[mode_bin] / count
+    mo = (mode_bin + 0.5) * bin_width / 1000
+    mxdmn = (ppi.max() - ppi.min()) / 1000
+    stress_index = amo / (2 * mo * mxdmn) if mxdmn > 0 else 0.0
+
+    return {
+        'mean_ppi': mean_ppi,
+        'mean_hr': round(60 * 1000 / mean_ppi, 0),
+        'min_hr': round(60 * 1000 / float(ppi.max()), 0),
+        'max_hr': round(60 * 1000 / float(ppi.min()), 0),
+        'sdnn': int(round(sdnn)),
+        'rmssd': int(round(rmssd)),
+        'nn50': nn50,
+        'pnn50': round(100 * nn50 / (count - 1), 1),
+        'sd1': round(float(np.sqrt(sd1_sq)), 1),
+        'sd2': round(float(np.sqrt(max(0.0, sd2_sq))), 1),
+        'stress_index': round(float(stress_index), 1),
+    }
@@ -0,0 +1,49 @@
+"""Vectorised beat detection on band-passed PPG signals."""
+import numpy as np
+
+from .filters import moving_rms
+
+
+def detect_peaks(x, rate, max_bpm=200, threshold=0.5, window_s=2.0):
+    """
+    Returns the sample indices of the beats in x, a band-passed signal
+    centred on zero. The signal is cut into segments where it rises above
+    threshold times its moving RMS over window_s seconds, and the highest
+    sample of each segment is a peak, as in the firmware detector. Of two
+    peaks closer than 60 / max_bpm seconds the lower one is dropped.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    above = x > threshold * moving_rms(x, max(1, int(window_s * rate)))
+    edges = np.diff(above.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Highest sample of every segment: compare each sample with its segment maximum
+    index = np.flatnonzero(above)
+    segment = np.repeat(np.arange(len(starts)), ends - starts)
+    segment_max = np.maximum.reduceat(x[index], np.concatenate(([0], np.cumsum(ends - starts)[:-1])))
+    hits = x[index] == segment_max[segment]
+    _, first = np.unique(segment[hits], return_index=True)
+    peaks = index[hits][first]
+
+    min_gap = int(rate * 60 / max_bpm)
+    if len(peaks) > 1 and np.any(np.diff(peaks) <= min_gap):
+        kept = [peaks[0]]
+        for p in peaks[1:]:
+            if p - kept[-1] > min_gap:
+                kept.append(p)
+            elif x[p] > x[kept[-1]]:
+                kept[-1] = p
+        peaks = np.array(kept, dtype=np.int64)
+    return peaks
+
+
+def intervals(peaks, rate, min_bpm=30, max_bpm=200):
+    """
+    Returns the beat intervals in ms between consecutive peaks. Intervals
+    outside the min_bpm - max_bpm range (missed beats, artefacts) are dropped.
+    """
+    ppi = np.diff(np.asarray(peaks)) * 1000.0 / rate
+    return ppi[(ppi >= 60000 / max_bpm) & (ppi <= 60000 / min_bpm)]
@@ -0,0 +1,57 @@
+"""Host-side stand-ins for the MicroPython modules used by the firmware.
+
+Call install() before importing firmware modules. The stand-ins are
+registered in sys.modules under the MicroPython module names and the
+MicroPython functions of the time module (ticks_ms(), sleep_ms(), ...)
+as well as time.sleep() and time.time() run on the virtual clock in
+sim.clock.
+"""
+import binascii
+import json
+import sys
+import time
+
+from . import cloud, fifo, framebuf, machine, network, piotimer, rp2, ssd1306, uasyncio, urequests
+from .clock import SimulationEnd, clock  # noqa: F401
+from .umqtt import simple as umqtt_simple
+from . import umqtt
+
+MODULES = {
+    'framebuf': framebuf,
+    'machine': machine,
+    'ssd1306': ssd1306,
+    'rp2': rp2,
+    'piotimer': piotimer,
+    'fifo': fifo,
+    'network': network,
+    'umqtt': umqtt,
+    'umqtt.simple': umqtt_simple,
+    'urequests': urequests,
+    'uasyncio': uasyncio,
+    'ujson': json,
+    'ubinascii': binascii,
+}
+
+TIME_FUNCTIONS = ('ticks_ms', 'ticks_us', 'ticks_cpu', 'ticks_add', 'ticks_diff', 'sleep', 'sleep_ms', 'sleep_us', 'time')
+
+_original_time = {}
+
+
+def install():
+    """Registers the stand-in modules and moves the time module onto the virtual clock."""
+    for name, module in MODULES.items():
+        sys.modules[name] = module
+    for name in TIME_FUNCTIONS:
+        if name not in _original_time:
+            _original_time[name] = getattr(time, name, None)
+        setattr(time, name, getattr(clock, name))
+
+
+def uninstall():
+    """Restores the time module. The stand-in modules stay registered."""
+    for name, function in _original_time.items():
+        if function is None:
+            delattr(time, name)
+        else:
+            setattr(time, name, function)
+    _original_time.clear()
@@ -0,0 +1,111 @@
+"""Virtual clock shared by all stand-ins.
+
+Time only moves when the firmware sleeps, when it polls an empty fifo
+(the CPU would just wait for the next interrupt) or when a script
+advances it. Timer callbacks scheduled on the clock fire in order as it
+moves, so a long measurement replays as fast as the host can process it.
+"""
+import heapq
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+EPOCH_START = 1609459200
+
+
+class SimulationEnd(BaseException):
+    """Raised when the clock reaches its end time. Derived from BaseException so
+    that the firmware's error handlers don't swallow it."""
+
+
+class Clock:
+    def __init__(self):
+        self.reset()
+
+    def reset(self, end_us=None):
+        """Restarts time from zero and drops all scheduled events."""
+        self.now_us = 0
+        self.end_us = end_us
+        self._events = []
+        self._seq = 0
+
+    def schedule(self, delay_us, callback, period_us=None):
+        """Calls callback() after delay_us and then every period_us if given. Returns a handle for cancel()."""
+        handle = [self.now_us + delay_us, self._seq, callback, period_us, True]
+        self._seq += 1
+        heapq.heappush(self._events, handle)
+        return handle
+
+    def cancel(self, handle):
+        """Stops a scheduled event."""
+        handle[4] = False
+
+    def advance_to(self, t_us):
+        """Moves time to t_us and fires all events due until then."""
+        events = self._events
+        while events and events[0][0] <= t_us:
+            handle = heapq.heappop(events)
+            if not handle[4]:
+                continue
+            self._set_time(handle[0])
+            if handle[3]:
+                handle[0] += handle[3]
+                handle[1] = self._seq
+                self._seq += 1
+                heapq.heappush(events, handle)
+            handle[2]()
+        self._set_time(max(self.now_us, t_us))
+
+    def advance(self, us):
+        """Moves time forward by us microseconds."""
+        self.advance_to(self.now_us + int(us))
+
+    def idle(self, quantum_us=1000):
+        """Skips to the next scheduled event, but at most by quantum_us."""
+        events = self._events
+        while events and not events[0][4]:
+            heapq.heappop(events)
+        t_us = self.now_us + quantum_us
+        if events and events[0][0] < t_us:
+            t_us = events[0][0]
+        self.advance_to(t_us)
+
+    def _set_time(self, t_us):
+        if self.end_us is not None and t_us > self.end_us:
+            self.now_us = self.end_us
+            raise SimulationEnd()
+        self.now_us = t_us
+
+    # MicroPython time functions
+
+    def ticks_us(self):
+        return self.now_us & TICKS_MAX
+
+    def ticks_ms(self):
+        return (self.now_us // 1000) & TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.ticks_us()
+
+    def ticks_add(self, ticks, delta):
+        return (ticks + delta) & TICKS_MAX
+
+    def ticks_diff(self, ticks1, ticks2):
+        diff = (ticks1 - ticks2) & TICKS_MAX
+        return diff - TICKS_PERIOD if diff >= TICKS_HALFPERIOD else diff
+
+    def sleep(self, seconds):
+        self.advance(seconds * 1000000)
+
+    def sleep_ms(self, ms):
+        self.advance(ms * 1000)
+
+    def sleep_us(self, us):
+        self.advance(us)
+
+    def time(self):
+        # The Pico RTC starts at 2021-01-01 when it has not been set
+        return EPOCH_START + self.now_us // 1000000
+
+
+clock = Clock()
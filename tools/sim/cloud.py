@@ -0,0 +1,110 @@
+"""Local stand-ins for the network services the firmware talks to.
+
+broker records MQTT traffic and kubios answers the Kubios Cloud token and
+analysis requests made through urequests. Latencies are charged to the
+virtual clock so that network waits show up in the simulated timeline.
+"""
+import json
+
+from .clock import clock
+
+
+class Broker:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.messages = []
+        self.connections = 0
+        self.pings = 0
+        self.available = True
+        self.connect_latency_ms = 50
+        self.connect_timeout_ms = 30000  # an unreachable broker with no socket timeout set
+        self.publish_latency_ms = 5
+
+
+class KubiosCloud:
+    """Answers token and analysis requests. The analysis result is computed
+    locally with the firmware's ReadinessEstimator when it can be imported."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.token_requests = 0
+        self.analysis_requests = 0
+        self.available = True
+        self.token_latency_ms = 400
+        self.analysis_latency_ms = 800
+        self.tls_handshake_ms = 600
+        self.tcp_connect_ms = 20
+        self.expires_in = 3600
+        self.reject_tokens = set()
+        self.reject_credentials = False
+        self._token_count = 0
+
+    def token(self):
+        self.token_requests += 1
+        self._token_count += 1
+        return {'access_token': f'token-{self._token_count}', 'expires_in': self.expires_in, 'token_type': 'Bearer'}
+
+    def analyze(self, dataset):
+        self.analysis_requests += 1
+        data = dataset.get('data') or []
+        sns, pns = 0.0, 0.0
+        try:
+            from modules.hrv_analyzer import HRVAnalyzer
+            from modules.readiness import ReadinessEstimator
+            if len(data) >= 3:
+                sns, pns = ReadinessEstimator().estimate(HRVAnalyzer().time_domain(data))
+        except ImportError:
+            pass
+        return {'status': 'ok', 'analysis': {'sns_index': sns, 'pns_index': pns, 'type': 'readiness'}}
+
+
+class Network:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.available = True
+        self.associate_ms = 2000
+        self.associations = 0
+
+
+broker = Broker()
+kubios = KubiosCloud()
+network = Network()
+
+
+def http(method, url, headers, body):
+    """
+    Answers an HTTP request to Kubios Cloud. body is the raw request body.
+    Returns (status code, JSON payload as bytes, latency in ms).
+    """
+    if 'oauth2/token' in url:
+        if not kubios.available:
+            return 503, b'{"error": "unavailable"}', kubios.token_latency_ms
+        if kubios.reject_credentials:
+            return 400, b'{"error": "invalid_client"}', kubios.token_latency_ms
+        return 200, json.dumps(kubios.token()).encode(), kubios.token_latency_ms
+    if 'analytics/analyze' in url:
+        if not kubios.available:
+            return 503, b'{"error": "unavailable"}', kubios.analysis_latency_ms
+        token = headers.get('Authorization', '').replace('Bearer ', '')
+        if not token or token in kubios.reject_tokens:
+            return 401, b'{"message": "Unauthorized"}', kubios.analysis_latency_ms
+        dataset = json.loads(body) if body else {}
+        return 200, json.dumps(kubios.analyze(dataset)).encode(), kubios.analysis_latency_ms
+    return 404, b'{"error": "not found"}', 0
+
+
+def reset():
+    """Restores the default state of all services."""
+    broker.reset()
+    kubios.reset()
+    network.reset()
+
+
+def wait(ms):
+    """Charges a network latency to the virtual clock."""
+    clock.advance(ms * 1000)
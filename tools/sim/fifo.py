@@ -0,0 +1,30 @@
+"""Wrapper of lib/fifo.Fifo for the simulation.
+
+On the device an empty fifo is polled until an interrupt adds data. Here
+polling an empty fifo moves the virtual clock to the next scheduled event
+instead, so busy-wait loops make progress. The step is limited to 1 ms so
+that a single check of an empty fifo does not skip ahead to a scripted
+event.
+"""
+import importlib.util
+import os
+
+from .clock import clock
+
+_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'Project', 'lib', 'fifo.py')
+_spec = importlib.util.spec_from_file_location('_lib_fifo', _path)
+_lib_fifo = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_lib_fifo)
+
+
+class Fifo(_lib_fifo.Fifo):
+    def get_into(self, buf, count=None):
+        n = super().get_into(buf, count)
+        if n == 0:
+            clock.idle()
+        return n
+
+    def empty(self):
+        if self.head == self.tail:
+            clock.idle()
+        return self.head == self.tail
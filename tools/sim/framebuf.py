@@ -0,0 +1,132 @@
+"""Pure Python subset of the MicroPython framebuf module (MONO_VLSB only).
+
+Text is drawn with a made-up 8x8 pattern derived from the character code
+instead of the MicroPython font. Pixel positions of text are therefore
+not exact, but the drawn area is.
+"""
+MONO_VLSB = 0
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format=MONO_VLSB, stride=None):
+        if format != MONO_VLSB:
+            raise ValueError('only MONO_VLSB is supported')
+        self.buf = buffer
+        self.width = width
+        self.height = height
+        self.stride = width if stride is None else stride
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        index = (y >> 3) * self.stride + x
+        bit = 1 << (y & 7)
+        if c is None:
+            return 1 if self.buf[index] & bit else 0
+        if c:
+            self.buf[index] |= bit
+        else:
+            self.buf[index] &= ~bit & 0xFF
+
+    def fill(self, c):
+        value = 0xFF if c else 0
+        for i in range((self.height + 7) // 8 * self.stride):
+            self.buf[i] = value
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + w)
+        y1 = min(self.height, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        buf = self.buf
+        for page in range(y0 >> 3, ((y1 - 1) >> 3) + 1):
+            top = max(y0, page * 8) - page * 8
+            bottom = min(y1, page * 8 + 8) - page * 8
+            mask = ((1 << bottom) - 1) & ~((1 << top) - 1)
+            row = page * self.stride
+            if c:
+                for i in range(row + x0, row + x1):
+                    buf[i] |= mask
+            else:
+                keep = ~mask & 0xFF
+                for i in range(row + x0, row + x1):
+                    buf[i] &= keep
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def text(self, s, x, y, c=1):
+        for n, ch in enumerate(s):
+            code = ord(ch)
+            if code == 32:
+                continue
+            for col in range(8):
+                bits = ((code * 37 + col * 11) ^ (code >> 1)) & 0x7E if col < 7 else 0
+                for row in range(8):
+                    if bits & (1 << row):
+                        self.pixel(x + n * 8 + col, y + row, c)
+
+    def scroll(self, xstep, ystep):
+        # Like MicroPython, the vacated area keeps its previous content
+        width = self.width
+        height = self.height
+        if ystep == 0:
+            if xstep == 0 or abs(xstep) >= width:
+                return
+            buf = self.buf
+            for page in range((height + 7) // 8):
+                row = page * self.stride
+                if xstep > 0:
+                    buf[row + xstep:row + width] = buf[row:row + width - xstep]
+                else:
+                    buf[row:row + width + xstep] = buf[row - xstep:row + width]
+            return
+        xs = range(width - 1, -1, -1) if xstep > 0 else range(width)
+        ys = range(height - 1, -1, -1) if ystep > 0 else range(height)
+        for y in ys:
+            sy = y - ystep
+            if not 0 <= sy < height:
+                continue
+            for x in xs:
+                sx = x - xstep
+                if 0 <= sx < width:
+                    self.pixel(x, y, self.pixel(sx, sy))
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf.height):
+            for xx in range(fbuf.width):
+                c = fbuf.pixel(xx, yy)
+                if c != key:
+                    self.pixel(x + xx, y + yy, c)
@@ -0,0 +1,169 @@
+"""Stand-in for the MicroPython machine module."""
+from .clock import clock
+
+_pins = {}
+_signal = {'samples': None, 'rate': 250, 'function': None}
+
+
+def set_signal(samples=None, rate=250, function=None):
+    """Sets what ADC.read_u16() returns.
+
+    samples (sequence): Values sampled at rate Hz, the reading is the sample at the current virtual time
+    function (callable): Called with the virtual time in seconds instead of using samples
+    The samples repeat when the virtual time runs past their end.
+    """
+    _signal['samples'] = samples
+    _signal['rate'] = rate
+    _signal['function'] = function
+
+
+def pin(id):
+    """Returns the Pin object created by the firmware for id, e.g. to trigger its interrupt."""
+    return _pins[id]
+
+
+def reset():
+    raise SystemExit('machine.reset()')
+
+
+def unique_id():
+    return b'\xe6\x61\x41\x04\x03\x2f\x5a\x2c'
+
+
+class ADC:
+    def __init__(self, pin):
+        self.pin = pin
+
+    def read_u16(self):
+        if _signal['function'] is not None:
+            return int(_signal['function'](clock.now_us / 1000000)) & 0xFFFF
+        samples = _signal['samples']
+        if not samples:
+            return 0
+        index = clock.now_us * _signal['rate'] // 1000000
+        return samples[index % len(samples)]
+
+
+class PWM:
+    def __init__(self, pin, freq=1000, duty_u16=0):
+        self.pin = pin
+        self._freq = freq
+        self._duty = duty_u16
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = value
+
+    def deinit(self):
+        self._duty = 0
+
+
+class Timer:
+    PERIODIC = 1
+    ONE_SHOT = 0
+
+    def __init__(self, id=-1, **kwargs):
+        self._handle = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, freq=-1, period=-1, callback=None):
+        self.deinit()
+        period_us = int(1000000 / freq) if freq > 0 else int(period * 1000)
+        self._handle = clock.schedule(period_us, lambda: callback(self), period_us if mode == self.PERIODIC else None)
+
+    def deinit(self):
+        if self._handle is not None:
+            clock.cancel(self._handle)
+            self._handle = None
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self.pull = pull
+        self._value = 1 if pull == self.PULL_UP else 0
+        if value is not None:
+            self._value = value
+        self.handler = None
+        self.trigger = 0
+        _pins[id] = self
+
+    def value(self, *args):
+        if args:
+            self._value = 1 if args[0] else 0
+            return None
+        return self._value
+
+    def __call__(self, *args):
+        return self.value(*args)
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self.handler = handler
+        self.trigger = trigger
+
+    def drive(self, value):
+        """Simulates an external level change and calls the interrupt handler on a matching edge."""
+        value = 1 if value else 0
+        old = self._value
+        self._value = value
+        edge = self.IRQ_RISING if value > old else self.IRQ_FALLING if value < old else 0
+        if edge & self.trigger and self.handler is not None:
+            self.handler(self)
+
+
+class I2C:
+    """Records the traffic of the bus. Each writeto/writevto is one transaction
+    and the byte count includes the address byte of every transaction.
+    Devices attached with attach() receive the written bytes."""
+    def __init__(self, id, scl=None, sda=None, freq=400000):
+        self.id = id
+        self.freq = freq
+        self.devices = {}
+        self.reset_counters()
+
+    def attach(self, addr, device):
+        """Attaches a device model with a write(data) method at addr."""
+        self.devices[addr] = device
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes = 0
+
+    def bus_time(self):
+        """Returns the time in seconds the recorded traffic takes on the bus (9 clocks per byte)."""
+        return self.bytes * 9 / self.freq
+
+    def writeto(self, addr, buf, stop=True):
+        return self.writevto(addr, (buf,), stop)
+
+    def writevto(self, addr, vector, stop=True):
+        self.transactions += 1
+        self.bytes += 1 + sum(len(buf) for buf in vector)
+        device = self.devices.get(addr)
+        if device is not None:
+            device.write(b''.join(bytes(buf) for buf in vector))
+        return 1
+
+    def scan(self):
+        return [0x3C]
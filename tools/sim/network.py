@@ -0,0 +1,50 @@
+"""Stand-in for the MicroPython network module."""
+from . import cloud
+from .clock import clock
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 3
+STAT_CONNECT_FAIL = -1
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._active = False
+        self._connected_at = None
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = bool(value)
+        if not self._active:
+            self._connected_at = None
+
+    def connect(self, ssid=None, key=None):
+        if not self._active:
+            raise OSError('WLAN not active')
+        if cloud.network.available:
+            cloud.network.associations += 1
+            self._connected_at = clock.now_us + cloud.network.associate_ms * 1000
+
+    def disconnect(self):
+        self._connected_at = None
+
+    def isconnected(self):
+        if not cloud.network.available:
+            self._connected_at = None
+        return self._connected_at is not None and clock.now_us >= self._connected_at
+
+    def status(self, param=None):
+        if self.isconnected():
+            return STAT_GOT_IP
+        if self._connected_at is not None:
+            return STAT_CONNECTING
+        return STAT_IDLE if cloud.network.available else STAT_CONNECT_FAIL
+
+    def ifconfig(self):
+        return ('192.168.4.100', '255.255.255.0', '192.168.4.1', '192.168.4.1')
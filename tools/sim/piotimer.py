@@ -0,0 +1,31 @@
+"""Stand-in for lib/piotimer.py. Calls the callback from the virtual clock."""
+from .clock import clock
+
+
+class Piotimer:
+    PERIODIC = 1
+    ONE_SHOT = 0
+
+    _available = [0, 1, 2, 3]
+
+    def __init__(self, *args, mode=PERIODIC, freq=-1, period=-1, callback=None):
+        if freq > 0:
+            interval = int(1000000 / freq)
+        elif period > 0:
+            interval = int(period * 1000)
+        else:
+            raise RuntimeError('Must specify \'freq\' or \'period\'')
+        if interval < 100:
+            raise RuntimeError('Too high timer frequency')
+        if mode != self.PERIODIC:
+            raise RuntimeError('Piotimer supports only PERIODIC operation')
+        if not self._available:
+            raise RuntimeError('Out of timer instances')
+        self.id = self._available.pop(0)
+        self._handle = clock.schedule(interval, lambda: callback(self), interval)
+
+    def deinit(self):
+        if self._handle is not None:
+            clock.cancel(self._handle)
+            self._handle = None
+            self._available.append(self.id)
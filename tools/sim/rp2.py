@@ -0,0 +1,21 @@
+"""Minimal stand-in for the MicroPython rp2 module."""
+
+
+def asm_pio(*args, **kwargs):
+    def decorator(program):
+        return program
+    return decorator
+
+
+class StateMachine:
+    def __init__(self, id, program=None, freq=-1, **kwargs):
+        self.id = id
+
+    def active(self, value=None):
+        return 0
+
+    def put(self, value, shift=0):
+        pass
+
+    def irq(self, handler=None, trigger=0, hard=False):
+        pass
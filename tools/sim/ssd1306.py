@@ -0,0 +1,140 @@
+"""Stand-in for the MicroPython ssd1306 driver.
+
+Mirrors the command and data transfers of the real SSD1306_I2C so that an
+I2C stand-in sees the same traffic as the display would.
+"""
+from . import framebuf
+
+# Every display created, so that tools can inspect what the firmware drew
+displays = []
+
+SET_CONTRAST = 0x81
+SET_ENTIRE_ON = 0xA4
+SET_NORM_INV = 0xA6
+SET_DISP = 0xAE
+SET_MEM_ADDR = 0x20
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
+SET_DISP_START_LINE = 0x40
+SET_SEG_REMAP = 0xA0
+SET_MUX_RATIO = 0xA8
+SET_COM_OUT_DIR = 0xC0
+SET_DISP_OFFSET = 0xD3
+SET_COM_PIN_CFG = 0xDA
+SET_DISP_CLK_DIV = 0xD5
+SET_PRECHARGE = 0xD9
+SET_VCOM_DESEL = 0xDB
+SET_CHARGE_PUMP = 0x8D
+
+
+class SSD1306(framebuf.FrameBuffer):
+    def __init__(self, width, height, external_vcc):
+        self.width = width
+        self.height = height
+        self.external_vcc = external_vcc
+        self.pages = self.height // 8
+        self.buffer = bytearray(self.pages * self.width)
+        super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
+        self.init_display()
+        displays.append(self)
+
+    def init_display(self):
+        for cmd in (
+            SET_DISP, SET_MEM_ADDR, 0x00, SET_DISP_START_LINE, SET_SEG_REMAP | 0x01,
+            SET_MUX_RATIO, self.height - 1, SET_COM_OUT_DIR | 0x08, SET_DISP_OFFSET, 0x00,
+            SET_COM_PIN_CFG, 0x02 if self.width > 2 * self.height else 0x12,
+            SET_DISP_CLK_DIV, 0x80, SET_PRECHARGE, 0x22 if self.external_vcc else 0xF1,
+            SET_VCOM_DESEL, 0x30, SET_CONTRAST, 0xFF, SET_ENTIRE_ON, SET_NORM_INV,
+            SET_CHARGE_PUMP, 0x10 if self.external_vcc else 0x14, SET_DISP | 0x01,
+        ):
+            self.write_cmd(cmd)
+        self.fill(0)
+        self.show()
+
+    def poweroff(self):
+        self.write_cmd(SET_DISP)
+
+    def poweron(self):
+        self.write_cmd(SET_DISP | 0x01)
+
+    def contrast(self, contrast):
+        self.write_cmd(SET_CONTRAST)
+        self.write_cmd(contrast)
+
+    def invert(self, invert):
+        self.write_cmd(SET_NORM_INV | (invert & 1))
+
+    def show(self):
+        self.write_cmd(SET_COL_ADDR)
+        self.write_cmd(0)
+        self.write_cmd(self.width - 1)
+        self.write_cmd(SET_PAGE_ADDR)
+        self.write_cmd(0)
+        self.write_cmd(self.pages - 1)
+        self.write_data(self.buffer)
+
+
+class SSD1306_I2C(SSD1306):
+    def __init__(self, width, height, i2c, addr=0x3C, external_vcc=False):
+        self.i2c = i2c
+        self.addr = addr
+        self.temp = bytearray(2)
+        self.write_list = [b'\x40', None]
+        super().__init__(width, height, external_vcc)
+
+    def write_cmd(self, cmd):
+        self.temp[0] = 0x80
+        self.temp[1] = cmd
+        self.i2c.writeto(self.addr, self.temp)
+
+    def write_data(self, buf):
+        self.write_list[1] = buf
+        self.i2c.writevto(self.addr, self.write_list)
+
+
+class Panel:
+    """Model of the SSD1306 display RAM in horizontal addressing mode.
+
+    Attach it to the I2C stand-in to check what actually reaches the
+    display: ram holds the bytes in the same layout as the frame buffer.
+    """
+    def __init__(self, width=128, height=64):
+        self.width = width
+        self.pages = height // 8
+        self.ram = bytearray(self.width * self.pages)
+        self.col_start = 0
+        self.col_end = width - 1
+        self.page_start = 0
+        self.page_end = self.pages - 1
+        self.col = 0
+        self.page = 0
+        self._args = []
+
+    def write(self, data):
+        if data[0] == 0x40:
+            for value in data[1:]:
+                self.ram[self.page * self.width + self.col] = value
+                self.col += 1
+                if self.col > self.col_end:
+                    self.col = self.col_start
+                    self.page += 1
+                    if self.page > self.page_end:
+                        self.page = self.page_start
+        elif data[0] == 0x80:
+            self._command(data[1])
+
+    def _command(self, cmd):
+        args = self._args
+        args.append(cmd)
+        if args[0] == SET_COL_ADDR:
+            if len(args) == 3:
+                self.col_start, self.col_end = args[1], args[2]
+                self.col = self.col_start
+                args.clear()
+        elif args[0] == SET_PAGE_ADDR:
+            if len(args) == 3:
+                self.page_start, self.page_end = args[1], args[2]
+                self.page = self.page_start
+                args.clear()
+        else:
+            args.clear()
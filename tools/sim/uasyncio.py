@@ -0,0 +1,275 @@
+"""Stand-in for the MicroPython uasyncio module on the virtual clock.
+
+Tasks are plain coroutines. They are stepped in order from a ready queue
+and sleeping tasks are woken by events on sim.clock, so task wake-ups
+and timer interrupts interleave in virtual time. When no task is ready
+the clock moves to the next scheduled event. open_connection() returns
+streams that answer HTTP requests from the services in sim.cloud.
+"""
+from collections import deque
+import traceback
+
+from . import cloud
+from .clock import SimulationEnd, clock
+
+
+class CancelledError(BaseException):
+    pass
+
+
+class TimeoutError(Exception):
+    pass
+
+
+_ready = deque()
+
+
+class _Trap:
+    """Awaitable that hands a request to the scheduler."""
+    def __init__(self, *request):
+        self.request = request
+
+    def __await__(self):
+        yield self.request
+
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.state = None
+        self.data = None
+        self.finished = False
+        self.waiters = []
+        self._value = None
+        self._throw = None
+        self._timer = None
+        self._waiting_on = None
+
+    def done(self):
+        return self.finished
+
+    def cancel(self):
+        if self.finished:
+            return False
+        self._throw = CancelledError()
+        self._unwait()
+        # A task that was already woken is stepped once, with the exception
+        if self not in _ready:
+            _ready.append(self)
+        return True
+
+    def __await__(self):
+        if not self.finished:
+            yield ('join', self)
+        if isinstance(self.data, BaseException):
+            raise self.data
+        return self.data
+
+    def _unwait(self):
+        if self._timer is not None:
+            clock.cancel(self._timer)
+            self._timer = None
+        if self._waiting_on is not None:
+            if self in self._waiting_on.waiters:
+                self._waiting_on.waiters.remove(self)
+            self._waiting_on = None
+
+    def _wake(self):
+        self._timer = None
+        self._waiting_on = None
+        _ready.append(self)
+
+    def _step(self):
+        try:
+            if self._throw is not None:
+                exc, self._throw = self._throw, None
+                request = self.coro.throw(exc)
+            else:
+                request = self.coro.send(None)
+        except StopIteration as e:
+            self._finish(e.value)
+            return
+        except SimulationEnd:
+            raise
+        except BaseException as e:
+            self._finish(e)
+            return
+        kind = request[0]
+        if kind == 'sleep':
+            self._timer = clock.schedule(request[1], self._wake)
+        elif kind == 'yield':
+            _ready.append(self)
+        else:
+            # 'wait' on an Event/ThreadSafeFlag or 'join' another task
+            target = request[1]
+            target.waiters.append(self)
+            self._waiting_on = target
+
+    def _finish(self, value):
+        self.finished = True
+        self.data = value
+        if isinstance(value, BaseException) and not isinstance(value, CancelledError) and not self.waiters:
+            print('Task exception wasn\'t retrieved')
+            traceback.print_exception(type(value), value, value.__traceback__)
+        for task in self.waiters:
+            task._wake()
+        self.waiters = []
+
+
+def create_task(coro):
+    task = Task(coro)
+    _ready.append(task)
+    return task
+
+
+def run(coro):
+    """Runs coro until it returns. Raises SimulationEnd when the clock reaches its end time."""
+    _ready.clear()
+    main = create_task(coro)
+    while not main.finished:
+        if _ready:
+            _ready.popleft()._step()
+        else:
+            clock.idle(1000000)
+    if isinstance(main.data, BaseException):
+        raise main.data
+    return main.data
+
+
+def sleep_ms(ms):
+    if ms <= 0:
+        return _Trap('yield')
+    return _Trap('sleep', int(ms * 1000))
+
+
+def sleep(seconds):
+    return sleep_ms(seconds * 1000)
+
+
+class Event:
+    def __init__(self):
+        self.state = False
+        self.waiters = []
+
+    def is_set(self):
+        return self.state
+
+    def set(self):
+        self.state = True
+        for task in self.waiters:
+            task._wake()
+        self.waiters = []
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        while not self.state:
+            await _Trap('wait', self)
+        return True
+
+
+class ThreadSafeFlag(Event):
+    """Like Event, but wait() clears the flag. set() may be called from an interrupt handler."""
+    async def wait(self):
+        while not self.state:
+            await _Trap('wait', self)
+        self.state = False
+
+
+async def wait_for(aw, timeout):
+    task = aw if isinstance(aw, Task) else create_task(aw)
+    if timeout is None:
+        return await task
+    expired = []
+
+    def expire():
+        if not task.finished:
+            expired.append(True)
+            task.cancel()
+    timer = clock.schedule(int(timeout * 1000000), expire)
+    try:
+        return await task
+    except CancelledError:
+        if expired:
+            raise TimeoutError()
+        task.cancel()
+        raise
+    finally:
+        clock.cancel(timer)
+
+
+def wait_for_ms(aw, timeout):
+    return wait_for(aw, None if timeout is None else timeout / 1000)
+
+
+async def gather(*aws):
+    tasks = [aw if isinstance(aw, Task) else create_task(aw) for aw in aws]
+    return [await task for task in tasks]
+
+
+class Stream:
+    """Client side of a connection to a simulated HTTP(S) server.
+
+    The request written to the stream is answered by sim.cloud.http() when
+    drain() is awaited after the complete request has been written.
+    """
+    def __init__(self, host, port, ssl):
+        self.host = host
+        self.scheme = 'https' if ssl else 'http'
+        self.out = b''
+        self.inbuf = b''
+        self.closed = False
+
+    def write(self, data):
+        self.out += bytes(data)
+
+    async def drain(self):
+        head, sep, body = self.out.partition(b'\r\n\r\n')
+        if not sep:
+            return
+        lines = head.decode().split('\r\n')
+        method, path, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip()] = value.strip()
+        length = int(headers.get('Content-Length', 0))
+        if len(body) < length:
+            return
+        self.out = b''
+        url = f'{self.scheme}://{self.host}{path}'
+        status, payload, latency_ms = cloud.http(method, url, headers, body[:length])
+        await sleep_ms(latency_ms)
+        if not cloud.network.available:
+            raise OSError('Connection reset')
+        self.inbuf += (f'HTTP/1.0 {status} OK\r\nContent-Type: application/json\r\n'
+                       f'Content-Length: {len(payload)}\r\n\r\n').encode() + payload
+
+    async def readline(self):
+        line, sep, rest = self.inbuf.partition(b'\n')
+        self.inbuf = rest
+        return line + sep
+
+    async def read(self, n=-1):
+        if n < 0:
+            n = len(self.inbuf)
+        data, self.inbuf = self.inbuf[:n], self.inbuf[n:]
+        return data
+
+    async def readexactly(self, n):
+        return await self.read(n)
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+async def open_connection(host, port, ssl=None, server_hostname=None):
+    if not cloud.network.available:
+        raise OSError('Host unreachable')
+    await sleep_ms(cloud.kubios.tls_handshake_ms if ssl else cloud.kubios.tcp_connect_ms)
+    stream = Stream(host, port, ssl)
+    return stream, stream
@@ -0,0 +1,60 @@
+"""Stand-in for umqtt.simple that talks to the local broker in sim.cloud."""
+from .. import cloud
+
+
+class MQTTException(Exception):
+    pass
+
+
+class MQTTClient:
+    def __init__(self, client_id, server, port=0, user=None, password=None, keepalive=0, ssl=False, ssl_params={}):
+        self.client_id = client_id
+        self.server = server
+        self.keepalive = keepalive
+        self.connected = False
+        self.cb = None
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def connect(self, clean_session=True, timeout=None):
+        if not cloud.network.available:
+            raise OSError('MQTT broker unreachable')
+        if not cloud.broker.available:
+            # The connect to an unreachable broker blocks until the socket times out
+            cloud.wait(cloud.broker.connect_timeout_ms if timeout is None else timeout * 1000)
+            raise OSError('MQTT connect timed out')
+        cloud.wait(cloud.broker.connect_latency_ms)
+        cloud.broker.connections += 1
+        self.connected = True
+        return 0
+
+    def disconnect(self):
+        self.connected = False
+
+    def ping(self):
+        self._check()
+        cloud.broker.pings += 1
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        self._check()
+        cloud.wait(cloud.broker.publish_latency_ms)
+        if isinstance(topic, str):
+            topic = topic.encode()
+        if isinstance(msg, str):
+            msg = msg.encode()
+        cloud.broker.messages.append((topic, bytes(msg), qos, retain))
+
+    def subscribe(self, topic, qos=0):
+        self._check()
+
+    def check_msg(self):
+        self._check()
+
+    def wait_msg(self):
+        self._check()
+
+    def _check(self):
+        if not self.connected or not cloud.broker.available or not cloud.network.available:
+            self.connected = False
+            raise OSError('MQTT connection lost')
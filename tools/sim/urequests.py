@@ -0,0 +1,42 @@
+"""Stand-in for urequests that answers Kubios Cloud requests from sim.cloud."""
+import json as _json
+
+from . import cloud
+
+
+class Response:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = _json.dumps(payload)
+        self.content = self.text.encode()
+
+    def json(self):
+        return _json.loads(self.text)
+
+    def close(self):
+        pass
+
+
+def _check_network():
+    if not cloud.network.available:
+        raise OSError('Network unreachable')
+
+
+def request(method, url, data=None, json=None, headers=None, auth=None, timeout=None):
+    _check_network()
+    if json is not None:
+        data = _json.dumps(json)
+    if isinstance(data, str):
+        data = data.encode()
+    status, payload, latency_ms = cloud.http(method, url, headers or {}, data or b'')
+    cloud.wait(latency_ms)
+    return Response(status, _json.loads(payload))
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
@@ -0,0 +1,150 @@
+"""Runs Project/main.py on the host against the simulation stand-ins in tools/sim.
+
+Usage: python tools/simulate.py [--capture FILE | --bpm 70] [--seconds 60]
+                                [--script "1:press,20:press"] [--flash DIR] [--screen]
+
+The ADC is fed from a capture file (text or binary) or a synthetic PPG
+signal and the firmware runs on a virtual clock until --seconds of
+simulated time have passed. The script is a comma separated list of
+time:action pairs with the actions next, prev and press (rotary encoder),
+wifi-down, wifi-up, cloud-down, cloud-up, broker-down and broker-up
+(services) and cloud-reject (token requests fail with 400, like wrong
+credentials). A down broker is unreachable: connecting to it blocks
+until the socket times out. Files the
+firmware writes (token cache, outbox) go to the --flash directory, a new
+temporary directory by default. Timing and counters are printed at the
+end.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import _paths
+import sim
+from sim import cloud, machine, ssd1306
+from sim.clock import SimulationEnd, clock
+from modules.telemetry import decode
+import synth
+
+ENCODER_A = 10
+ENCODER_B = 11
+BUTTON = 12
+
+
+def load_signal(args):
+    """Returns (samples, rate) for the ADC."""
+    if args.capture:
+        from bench_peak_detector import load_capture
+        rate = args.rate
+        if args.capture.endswith('.bin'):
+            from filefifo import BinFilefifo
+            rate = BinFilefifo(10, name=args.capture).rate
+        return load_capture(args.capture), rate
+    samples, _ = synth.ppg(min(args.seconds, 600), args.rate, bpm=args.bpm)
+    return samples, args.rate
+
+
+def action(name):
+    """Returns a function that performs a script action on the simulated hardware."""
+    def turn(direction):
+        # The inputs idle high through their pull-ups, a detent is a pulse on A
+        machine.pin(ENCODER_A).drive(0)
+        machine.pin(ENCODER_B).drive(direction)
+        machine.pin(ENCODER_A).drive(1)
+
+    def press():
+        machine.pin(BUTTON).drive(0)
+        clock.schedule(100000, lambda: machine.pin(BUTTON).drive(1))
+
+    actions = {
+        'next': lambda: turn(1),
+        'prev': lambda: turn(0),
+        'press': press,
+        'wifi-down': lambda: setattr(cloud.network, 'available', False),
+        'wifi-up': lambda: setattr(cloud.network, 'available', True),
+        'cloud-down': lambda: setattr(cloud.kubios, 'available', False),
+        'cloud-up': lambda: setattr(cloud.kubios, 'available', True),
+        'broker-down': lambda: setattr(cloud.broker, 'available', False),
+        'broker-up': lambda: setattr(cloud.broker, 'available', True),
+        'cloud-reject': lambda: setattr(cloud.kubios, 'reject_credentials', True),
+    }
+    return actions[name]
+
+
+def schedule_script(script):
+    for item in filter(None, script.split(',')):
+        at, name = item.split(':')
+        clock.schedule(int(float(at) * 1000000), action(name.strip()))
+
+
+def screen_text(oled):
+    """Returns the frame buffer as text, two pixel rows per line."""
+    lines = []
+    for y in range(0, oled.height, 2):
+        lines.append(''.join('#' if oled.pixel(x, y) or oled.pixel(x, y + 1) else '.' for x in range(oled.width)))
+    return '\n'.join(lines)
+
+
+def run(samples, rate, seconds, script='', flash=None):
+    """
+    Runs main.py for the given virtual time with flash (default a new
+    temporary directory) as the working directory. Returns (globals of
+    main.py, wall time in seconds).
+    """
+    if flash is None:
+        flash = tempfile.mkdtemp(prefix='flash-')
+    os.makedirs(flash, exist_ok=True)
+    sim.install()
+    cloud.reset()
+    clock.reset(end_us=int(seconds * 1000000))
+    machine.set_signal(samples, rate)
+    schedule_script(script)
+    path = os.path.join(_paths.PROJECT, 'main.py')
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+    main_globals = {'__name__': '__main__', '__file__': path}
+    cwd = os.getcwd()
+    os.chdir(flash)
+    start = time.perf_counter()
+    try:
+        exec(code, main_globals)
+    except SimulationEnd:
+        pass
+    finally:
+        wall = time.perf_counter() - start
+        os.chdir(cwd)
+    return main_globals, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--capture', help='capture file for the ADC (text or .bin)')
+    parser.add_argument('--rate', type=int, default=250, help='sample rate of a text capture or the synthetic signal')
+    parser.add_argument('--bpm', type=float, default=70, help='heart rate of the synthetic signal')
+    parser.add_argument('--seconds', type=float, default=60, help='virtual time to run')
+    parser.add_argument('--script', default='', help='comma separated time:action list')
+    parser.add_argument('--flash', help='directory that stands in for the flash file system')
+    parser.add_argument('--screen', action='store_true', help='print the final screen')
+    args = parser.parse_args()
+
+    samples, rate = load_signal(args)
+    main_globals, wall = run(samples, rate, args.seconds, args.script, args.flash)
+    virtual = clock.now_us / 1000000
+    print(f'virtual time: {virtual:.1f} s, wall time: {wall:.2f} s, speed: {virtual / wall:.1f}x real time')
+    fifo = main_globals.get('samples')
+    if fifo is not None:
+        print(f'samples (last measurement): {fifo.dropped()} dropped, high water {fifo.high_water()} / {fifo.size - 1}')
+    print(f'MQTT: {cloud.broker.connections} connections, {len(cloud.broker.messages)} messages; '
+          f'Kubios: {cloud.kubios.token_requests} token and {cloud.kubios.analysis_requests} analysis requests; '
+          f'WLAN associations: {cloud.network.associations}')
+    telemetry = [msg for topic, msg, qos, retain in cloud.broker.messages if topic.endswith(b'/ppi')]
+    if telemetry:
+        beats = sum(len(decode(msg)['intervals']) for msg in telemetry)
+        print(f'telemetry: {len(telemetry)} messages, {beats} beats, {sum(len(msg) for msg in telemetry)} bytes')
+    if args.screen and ssd1306.displays:
+        print(screen_text(ssd1306.displays[-1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Synthetic PPG signals for host-side benchmarks when no capture file is at hand."""
+import array
+import math
+import random
+
+PEAK_DELAY = 0.12  # seconds from the start of a beat to the top of its pulse
+
+
+def ppg(seconds, samplerate=250, bpm=70, rsa=0.05, noise=150, wander=1500, seed=1):
+    """Returns (samples, beats) where samples is an array('H') of ADC style values
+    and beats is a list of the true beat-to-beat intervals in ms.
+
+    bpm (float): Mean heart rate
+    rsa (float): Relative beat interval modulation by a 0.25 Hz breathing cycle
+    noise (int): Amplitude of uniform sample noise
+    wander (int): Amplitude of a 0.1 Hz baseline wander
+    """
+    rnd = random.Random(seed)
+    count = int(seconds * samplerate)
+    samples = array.array('H', bytes(2 * count))
+    beats = []
+    mean_rr = 60.0 / bpm
+    t_beat = 0.0
+    next_beat = mean_rr
+    for i in range(count):
+        t = i / samplerate
+        if t >= next_beat:
+            rr = mean_rr * (1 + rsa * math.sin(2 * math.pi * 0.25 * next_beat)) + rnd.gauss(0, 0.01)
+            beats.append(int(round((next_beat - t_beat) * 1000)))
+            t_beat = next_beat
+            next_beat += rr
+        phase = t - t_beat
+        pulse = 8000 * math.exp(-((phase - PEAK_DELAY) / 0.05) ** 2) + 2500 * math.exp(-((phase - 0.35) / 0.07) ** 2)
+        value = 30000 + pulse + wander * math.sin(2 * math.pi * 0.1 * t) + rnd.uniform(-noise, noise)
+        samples[i] = max(0, min(65535, int(value)))
+    return samples, beats[1:]
@@ -0,0 +1,74 @@
+"""Decodes the binary beat telemetry that the device publishes to group4/<device id>/ppi.
+
+Usage: python tools/telemetry_decode.py [hex payload ...]
+       python tools/telemetry_decode.py --subscribe BROKER [--topic "group4/+/ppi"]
+
+Payloads are given as hex strings on the command line or one per line on
+stdin. With --subscribe the messages are read from an MQTT broker, which
+needs the paho-mqtt package. Each batch is printed with its sequence
+number and gaps in the sequence are reported as lost batches.
+"""
+import argparse
+import binascii
+import sys
+
+import _paths  # noqa: F401
+from modules.telemetry import FLAG_END, decode
+
+
+class Printer:
+    """Prints decoded batches and keeps track of the sequence numbers per topic."""
+    def __init__(self):
+        self.sequences = {}
+
+    def __call__(self, payload, topic=''):
+        try:
+            batch = decode(payload)
+        except ValueError as e:
+            print(f'{topic} invalid payload: {e}'.strip())
+            return
+        previous = self.sequences.get(topic)
+        if previous is not None:
+            lost = (batch['sequence'] - previous - 1) & 0xFFFF
+            if lost:
+                print(f'{topic} {lost} batches lost'.strip())
+        self.sequences[topic] = batch['sequence']
+        end = ' end' if batch['flags'] & FLAG_END else ''
+        intervals = ' '.join(str(i) for i in batch['intervals'])
+        print(f"{topic} #{batch['sequence']} t={batch['timestamp']} bpm={batch['bpm']} ppi=[{intervals}]{end}".strip())
+
+
+def subscribe(broker, topic, printer):
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError:
+        sys.exit('--subscribe needs the paho-mqtt package')
+    client = mqtt.Client()
+    client.on_connect = lambda client, userdata, flags, rc: client.subscribe(topic)
+    client.on_message = lambda client, userdata, msg: printer(msg.payload, msg.topic)
+    client.connect(broker)
+    client.loop_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('payloads', nargs='*', help='hex encoded payloads, read from stdin if not given')
+    parser.add_argument('--subscribe', metavar='BROKER', help='read the messages from an MQTT broker')
+    parser.add_argument('--topic', default='group4/+/ppi', help='topic filter for --subscribe')
+    args = parser.parse_args()
+
+    printer = Printer()
+    if args.subscribe:
+        subscribe(args.subscribe, args.topic, printer)
+        return
+    for line in args.payloads or sys.stdin:
+        line = line.strip()
+        if line:
+            try:
+                printer(binascii.unhexlify(line))
+            except binascii.Error:
+                print(f'not a hex payload: {line}')
+
+
+if __name__ == '__main__':
+    main()